@@ -0,0 +1,269 @@
+"""Benchmarks of the db_mock context lifecycle.
+
+Each case builds a schema of `tables` tables, then enters `depth` nested from_orm
+contexts of `rows` rows per table and exits them again, with DBMock or AsyncDBMock.
+The first context also pays for init_database, so it is reported on its own.
+
+Run it standalone from the repository root, and compare against an earlier run:
+
+    python -m benchmarks.bench_db_mock --output results.json
+    python -m benchmarks.bench_db_mock --compare results.json
+
+or through pytest-benchmark, see test_bench_db_mock.py.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from contextlib import AsyncExitStack, ExitStack
+from importlib import metadata
+from typing import TYPE_CHECKING
+
+import sqlalchemy
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import DeclarativeBase, mapped_column
+
+from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# results slower than the baseline by more than this factor are regressions
+DEFAULT_THRESHOLD = 1.25
+
+
+def make_base(tables: int) -> tuple[type[DeclarativeBase], list[type]]:
+    """Build a declarative base with the given number of tables.
+
+    Args:
+        tables (int): How many tables to map.
+
+    Returns:
+        tuple[type[DeclarativeBase], list[type]]: The new declarative base, and its
+                                                  models. The registry only holds
+                                                  weak references to them.
+    """
+
+    class Base(DeclarativeBase):
+        pass
+
+    models = [
+        type(
+            f"Table{index}",
+            (Base,),
+            {
+                "__tablename__": f"table_{index}",
+                "id": mapped_column(Integer, primary_key=True),
+                "name": mapped_column(String),
+                "value": mapped_column(Integer),
+            },
+        )
+        for index in range(tables)
+    ]
+    return Base, models
+
+
+def make_instances(models: list[type], rows: int) -> list[DeclarativeBase]:
+    return [
+        model(name=f"row {index}", value=index)
+        for model in models
+        for index in range(rows)
+    ]
+
+
+def time_ms(function: "Callable[[], object]") -> float:
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+async def async_time_ms(function: "Callable[[], object]") -> float:
+    start = time.perf_counter()
+    await function()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_sync(tables: int, rows: int, depth: int, repeat: int) -> dict:
+    """Time nested DBMock.from_orm contexts.
+
+    Args:
+        tables (int): How many tables the schema has.
+        rows (int): How many rows each context inserts per table.
+        depth (int): How many contexts are nested.
+        repeat (int): How many times the contexts are entered and exited.
+
+    Returns:
+        dict: The median durations of the case, in milliseconds.
+    """
+    base, models = make_base(tables)
+    provider = MockConnectionProvider()
+    db_mock = DBMock(base, provider, Patches(), schema_template=False)
+
+    init_ms = time_ms(db_mock.init_database)
+    enter_ms, exit_ms = [], []
+    for _ in range(repeat):
+        stack = ExitStack()
+
+        def enter(stack=stack):
+            for _ in range(depth):
+                stack.enter_context(db_mock.from_orm(make_instances(models, rows)))
+
+        enter_ms.append(time_ms(enter))
+        exit_ms.append(time_ms(stack.close))
+
+    provider.reset()
+    return summary(init_ms, enter_ms, exit_ms)
+
+
+async def bench_async(tables: int, rows: int, depth: int, repeat: int) -> dict:
+    """Time nested AsyncDBMock.from_orm contexts, see bench_sync."""
+    base, models = make_base(tables)
+    provider = MockAsyncConnectionProvider()
+    db_mock = AsyncDBMock(base, provider, Patches(), schema_template=False)
+
+    init_ms = await async_time_ms(db_mock.init_database)
+    enter_ms, exit_ms = [], []
+    for _ in range(repeat):
+        stack = AsyncExitStack()
+
+        async def enter(stack=stack):
+            for _ in range(depth):
+                await stack.enter_async_context(
+                    db_mock.from_orm(make_instances(models, rows))
+                )
+
+        enter_ms.append(await async_time_ms(enter))
+        exit_ms.append(await async_time_ms(stack.aclose))
+
+    await provider.async_reset()
+    return summary(init_ms, enter_ms, exit_ms)
+
+
+def summary(init_ms: float, enter_ms: list[float], exit_ms: list[float]) -> dict:
+    return {
+        "init_ms": round(init_ms, 3),
+        "enter_ms": round(statistics.median(enter_ms), 3),
+        "exit_ms": round(statistics.median(exit_ms), 3),
+        "total_ms": round(
+            statistics.median(map(sum, zip(enter_ms, exit_ms, strict=True))), 3
+        ),
+    }
+
+
+def run(
+    modes: list[str],
+    tables: list[int],
+    rows: list[int],
+    depths: list[int],
+    repeat: int,
+) -> dict:
+    """Run every combination of the given parameters.
+
+    Returns:
+        dict: The environment and the results, ready to be dumped as JSON.
+    """
+    results = []
+    for mode, table_count, row_count, depth in itertools.product(
+        modes, tables, rows, depths
+    ):
+        if mode == "async":
+            timings = asyncio.run(bench_async(table_count, row_count, depth, repeat))
+        else:
+            timings = bench_sync(table_count, row_count, depth, repeat)
+        case = {"mode": mode, "tables": table_count, "rows": row_count, "depth": depth}
+        results.append({**case, **timings})
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "sqlalchemy": sqlalchemy.__version__,
+            "sqlamock": package_version(),
+            "platform": platform.platform(),
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def package_version() -> str:
+    try:
+        return metadata.version("sqlamock")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def case_key(result: dict) -> tuple:
+    return result["mode"], result["tables"], result["rows"], result["depth"]
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """List the cases that got slower than the baseline by more than the threshold.
+
+    Args:
+        baseline (dict): Earlier results, as written by run().
+        current (dict): The new results.
+        threshold (float): The tolerated slowdown factor.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    baseline_results = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = baseline_results.get(case_key(result))
+        if before is None:
+            continue
+        for metric in ("init_ms", "enter_ms", "exit_ms", "total_ms"):
+            if before[metric] and result[metric] > before[metric] * threshold:
+                regressions.append(
+                    "{} tables={} rows={} depth={}: {} {} -> {}".format(
+                        *case_key(result), metric, before[metric], result[metric]
+                    )
+                )
+    return regressions
+
+
+def main(argv: "list[str] | None" = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", nargs="+", default=["sync", "async"])
+    parser.add_argument("--tables", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--rows", nargs="+", type=int, default=[1, 100])
+    parser.add_argument("--depth", nargs="+", type=int, default=[1, 3])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    parser.add_argument(
+        "--compare", help="Earlier JSON results to check for regressions."
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    current = run(args.mode, args.tables, args.rows, args.depth, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), current, args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
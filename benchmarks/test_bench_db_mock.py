@@ -0,0 +1,72 @@
+"""pytest-benchmark version of bench_db_mock.py:
+
+pytest benchmarks --benchmark-json results.json
+pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:25%
+"""
+
+import asyncio
+from contextlib import AsyncExitStack, ExitStack
+
+import pytest
+
+from benchmarks.bench_db_mock import make_base, make_instances
+from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+
+pytest.importorskip("pytest_benchmark")
+
+CASES = pytest.mark.parametrize(
+    "tables, rows, depth",
+    [(1, 1, 1), (10, 1, 1), (10, 100, 1), (10, 1, 3), (50, 10, 1)],
+)
+
+
+@CASES
+def test_sync_contexts(benchmark, tables: int, rows: int, depth: int):
+    base, models = make_base(tables)
+    provider = MockConnectionProvider()
+    db_mock = DBMock(base, provider, Patches(), schema_template=False)
+    db_mock.init_database()
+
+    def contexts():
+        with ExitStack() as stack:
+            for _ in range(depth):
+                stack.enter_context(db_mock.from_orm(make_instances(models, rows)))
+
+    benchmark(contexts)
+    provider.reset()
+
+
+@CASES
+def test_async_contexts(benchmark, tables: int, rows: int, depth: int):
+    base, models = make_base(tables)
+    provider = MockAsyncConnectionProvider()
+    db_mock = AsyncDBMock(base, provider, Patches(), schema_template=False)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(db_mock.init_database())
+
+    async def contexts():
+        async with AsyncExitStack() as stack:
+            for _ in range(depth):
+                await stack.enter_async_context(
+                    db_mock.from_orm(make_instances(models, rows))
+                )
+
+    benchmark(lambda: loop.run_until_complete(contexts()))
+    loop.run_until_complete(provider.async_reset())
+    loop.close()
+
+
+@pytest.mark.parametrize("tables", [1, 10, 50])
+def test_init_database(benchmark, tables: int):
+    base, _ = make_base(tables)
+
+    def init_database():
+        provider = MockConnectionProvider()
+        DBMock(base, provider, Patches(), schema_template=False).init_database()
+        provider.reset()
+
+    benchmark(init_database)
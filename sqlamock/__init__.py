@@ -69,10 +69,12 @@ from .connection_provider import MockConnectionProvider
 from .data_interface import MockDataInterface
 from .db_mock import DBMock
 from .patches import Patches
+from .pooled_connection_provider import PooledConnectionProvider
 
 __all__ = [
     "DBMock",
     "MockConnectionProvider",
     "MockDataInterface",
     "Patches",
+    "PooledConnectionProvider",
 ]
@@ -1,10 +1,56 @@
 import asyncio
-from functools import lru_cache
+import os
+import sqlite3
+from threading import Thread
 from typing import TYPE_CHECKING
+from weakref import WeakSet
 
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.connection_provider import (
+    WATCHER_TIMEOUT,
+    MockConnectionProvider,
+    apply_query_only,
+    use_explicit_begin,
+    use_pragmas,
+    use_query_only,
+)
+
+from .copy_on_write import use_copy_on_write
+from .queries import use_query_recorders
+from .revert import use_insert_watch
+
+if TYPE_CHECKING:
+    import aiosqlite
+
+    from .types import IsolationMode, PragmaProfile, SnapshotStrategy
+
+# the async providers of the process, see forget_async_connections()
+providers: "WeakSet[MockAsyncConnectionProvider]" = WeakSet()
+
+
+def forget_async_connections():
+    """Drop the pooled aiosqlite connections of every async provider, in a forked
+    child process, e.g. with the pytest plugin's --sqlamock-fork.
+
+    Each aiosqlite connection runs its queries in a thread of its own, which the child
+    does not inherit, so they would never answer. The connections are left open for
+    the parent, and the child opens its own. So is the async watcher connection.
+    """
+    for provider in list(providers):
+        if provider.async_engine is not None:
+            provider.async_engine.sync_engine.dispose(close=False)
+        provider.async_watcher_connection = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=forget_async_connections)
 
 
 class MockAsyncConnectionProvider(MockConnectionProvider):
@@ -15,50 +61,235 @@ class MockAsyncConnectionProvider(MockConnectionProvider):
 
     Attributes:
         engine_kwargs (dict): Additional keyword arguments to pass to create_engine.
+        snapshot_strategy (str): How AsyncSnapshot captures and restores the database state.
+        isolation (str): How db_mock contexts are isolated from each other.
+        in_memory (bool): Whether databases live in memory rather than in a temp file.
+        pragmas (dict[str, str | int]): The PRAGMAs applied to every new connection.
+        async_engine (AsyncEngine | None): The engine returned by get_async_engine(),
+                                           until async_reset().
+        pinned_async_connection (AsyncConnection | None): The connection every async session
+                                                          joins in "savepoint" isolation.
+        async_watcher_connection (aiosqlite.Connection | None): The aiosqlite
+            counterpart of the watcher connection, see get_async_watcher_connection().
     """
 
     if TYPE_CHECKING:
         engine_kwargs: dict
+        snapshot_strategy: SnapshotStrategy
+        isolation: IsolationMode
+        in_memory: bool
+        pragmas: dict[str, str | int]
+        async_engine: AsyncEngine | None
+        pinned_async_connection: AsyncConnection | None
+        async_watcher_connection: aiosqlite.Connection | None
 
-    def __init__(self, engine_kwargs: dict | None = None):
+    def __init__(
+        self,
+        engine_kwargs: dict | None = None,
+        snapshot_strategy: "SnapshotStrategy" = "backup",
+        isolation: "IsolationMode" = "snapshot",
+        in_memory: bool = False,
+        pragmas: "PragmaProfile | dict[str, str | int] | None" = "fast",
+    ):
         """Initialize a new MockAsyncConnectionProvider instance.
 
         Args:
             engine_kwargs (dict | None): Additional keyword arguments to pass to create_async_engine.
                                          If None, an empty dict will be used.
+            snapshot_strategy (str): "backup" (default), "dump", "copy_on_write" or
+                                     "swap", see MockConnectionProvider.
+            isolation (str): "snapshot" (default) or "savepoint", see MockConnectionProvider.
+                             In "savepoint" isolation get_async_session() joins the pinned
+                             async connection.
+            in_memory (bool): Whether to keep databases in memory, see
+                              MockConnectionProvider. The async engine opens the same
+                              named in-memory database as the sync one.
+            pragmas (str | dict | None): "fast" (default), a dict of PRAGMA values by
+                                         name, or None, see MockConnectionProvider.
         """
-        self.engine_kwargs = engine_kwargs or {}
+        super().__init__(
+            engine_kwargs, snapshot_strategy, isolation, in_memory, pragmas
+        )
+        self.async_engine = None
+        self.pinned_async_connection = None
+        self.async_watcher_connection = None
+        providers.add(self)
 
-    @lru_cache  # noqa: B019
     def get_async_engine(self) -> AsyncEngine:
-        """Get or create a SQLAlchemy async engine instance.
+        """Get or create a SQLAlchemy async engine instance, on the same database as
+        get_engine(). It is kept on the provider until async_reset().
+
+        Returns:
+            AsyncEngine: A SQLAlchemy async engine instance.
+        """
+        if self.async_engine is None:
+            self.async_engine = self.new_async_engine()
+        return self.async_engine
+
+    def new_async_engine(self) -> AsyncEngine:
+        """Create an async engine on the database of get_engine().
 
         Returns:
             AsyncEngine: A SQLAlchemy async engine instance.
         """
         engine = self.get_engine()
-        return create_async_engine(
+        engine_kwargs = self.engine_kwargs
+        if self.in_memory:
+            # the dialect would pick a StaticPool for in-memory databases, sharing a
+            # single connection between every session
+            engine_kwargs = {"poolclass": AsyncAdaptedQueuePool, **engine_kwargs}
+        async_engine = create_async_engine(
             engine.url.set(drivername="sqlite+aiosqlite"),
-            **self.engine_kwargs,
+            **engine_kwargs,
         )
 
+        if self.pragmas:
+            use_pragmas(async_engine.sync_engine, self.pragmas)
+        if self.isolation == "savepoint":
+            use_explicit_begin(async_engine.sync_engine)
+        use_query_recorders(async_engine.sync_engine, self.recorders)
+        use_insert_watch(async_engine.sync_engine, self.watched)
+        use_query_only(async_engine.sync_engine, self)
+        if self.snapshot_strategy == "copy_on_write":
+            use_copy_on_write(async_engine.sync_engine, self.copy_on_write_database())
+        return async_engine
+
+    async def get_async_connection(self) -> AsyncConnection:
+        """Get the async connection pinned for "savepoint" isolation.
+
+        Returns:
+            AsyncConnection: The pinned SQLAlchemy async connection.
+        """
+        if self.pinned_async_connection is None or self.pinned_async_connection.closed:
+            self.pinned_async_connection = await self.get_async_engine().connect()
+            await self.pinned_async_connection.begin()
+        return self.pinned_async_connection
+
+    async def async_set_query_only(self, enabled: bool) -> bool:
+        """Make the database read-only, or writable again, see
+        MockConnectionProvider.set_query_only(). In "savepoint" isolation the pinned
+        async connection is switched right away too.
+
+        Args:
+            enabled (bool): Whether writes must fail.
+
+        Returns:
+            bool: Whether they failed before, to switch back to.
+        """
+        previous = self.set_query_only(enabled)
+        if self.isolation == "savepoint":
+            connection = await self.get_async_connection()
+            await connection.run_sync(
+                lambda conn: apply_query_only(
+                    conn.connection.dbapi_connection, conn.connection.info, enabled
+                )
+            )
+        return previous
+
+    async def get_async_watcher_connection(self) -> "aiosqlite.Connection":
+        """Get an aiosqlite connection to the database, that neither the code under
+        test nor SQLAlchemy events see, see get_watcher_connection(). Async snapshots
+        use it so as not to leave the event loop.
+
+        Returns:
+            aiosqlite.Connection: The async watcher connection, kept until
+                                  async_drop_engine().
+        """
+        if self.async_watcher_connection is None:
+            # aiosqlite is an optional dependency, only needed by async engines
+            import aiosqlite
+
+            engine = self.get_engine()
+            args, kwargs = engine.dialect.create_connect_args(engine.url)
+            connection = aiosqlite.connect(
+                *args, **{**kwargs, "timeout": WATCHER_TIMEOUT}
+            )
+            # like the engine's connections, see SQLAlchemy's aiosqlite dialect, so
+            # that watchers left open do not keep the process from exiting. Before
+            # aiosqlite 0.22 the connection was the thread itself
+            thread = (
+                connection if isinstance(connection, Thread) else connection._thread
+            )
+            thread.daemon = True
+            self.async_watcher_connection = await connection
+            self.watchers += 1
+        return self.async_watcher_connection
+
+    async def async_locked(self, writes_only: bool = False) -> bool:
+        """Tell whether another connection holds a lock on the database, on the async
+        watcher connection, see MockConnectionProvider.locked().
+
+        Args:
+            writes_only (bool): Only tell about pending writes.
+
+        Returns:
+            bool: Whether the lock was still held after WATCHER_TIMEOUT.
+        """
+        conn = await self.get_async_watcher_connection()
+        try:
+            await conn.execute("BEGIN IMMEDIATE" if writes_only else "BEGIN EXCLUSIVE")
+        except sqlite3.OperationalError:
+            return True
+        await conn.execute("ROLLBACK")
+        return False
+
+    async def async_data_version(self) -> tuple[int, int]:
+        """Read the database's PRAGMA data_version, on the async watcher connection,
+        see MockConnectionProvider.data_version().
+
+        Returns:
+            tuple[int, int]: The watcher connection's number and the data version.
+        """
+        conn = await self.get_async_watcher_connection()
+        [(version,)] = await conn.execute_fetchall("PRAGMA data_version")
+        return self.watchers, version
+
     def get_async_session(self) -> AsyncSession:
         """Create a new SQLAlchemy async session.
 
+        In "savepoint" isolation, once a db_mock context has pinned the async connection,
+        the session joins it and its commits only release a nested SAVEPOINT.
+
         Returns:
             AsyncSession: A new SQLAlchemy async session instance.
         """
+        if self.isolation == "savepoint" and self.pinned_async_connection is not None:
+            return AsyncSession(
+                bind=self.pinned_async_connection,
+                join_transaction_mode="create_savepoint",
+            )
         return AsyncSession(bind=self.get_async_engine())
 
+    def reset(self):
+        """Reset the connection provider, see MockConnectionProvider.reset(). The
+        async watcher connection is closed too, in its own thread.
+        """
+        if self.async_watcher_connection is not None:
+            self.async_watcher_connection.stop()
+            self.async_watcher_connection = None
+        super().reset()
+
     async def async_reset(self):
         """Reset the connection provider.
 
-        This method disposes of the current engine and clears the engine cache,
-        ensuring that a new engine will be created on the next call to get_engine().
-
-        This is used in conjunction with the Snapshot context manager to reset the
-        database state between db_mock contexts (especially nested ones).
+        This method disposes of both engines, ensuring that new engines, on a new
+        empty database, will be created on the next call to get_engine() and
+        get_async_engine(). Other providers keep their engines.
         """
+        if self.pinned_async_connection is not None:
+            await self.pinned_async_connection.close()
+            self.pinned_async_connection = None
+        await self.async_drop_engine()
         await asyncio.to_thread(self.reset)
-        await self.get_async_engine().dispose()
-        self.get_async_engine.cache_clear()
+
+    async def async_drop_engine(self):
+        """Dispose of the async engine, for get_async_engine() to create one on the
+        current database of get_engine(), e.g. after replace_database(). The async
+        watcher connection is closed too.
+        """
+        if self.async_watcher_connection is not None:
+            await self.async_watcher_connection.close()
+            self.async_watcher_connection = None
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+            self.async_engine = None
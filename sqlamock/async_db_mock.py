@@ -1,31 +1,51 @@
-import json
+import asyncio
+from collections import defaultdict
 from contextlib import asynccontextmanager
-from functools import cached_property
-from typing import TYPE_CHECKING, Generic
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-from sqlalchemy import Index, Integer, inspect
+from sqlalchemy import Index, inspect, text
 from sqlalchemy.schema import CreateIndex, CreateTable
 
-from sqlamock.patches import Patches
-
+from . import columnar, profiling, queries, revert
+from .async_savepoint import AsyncSavepoint
 from .async_snapshot import AsyncSnapshot
-from .data_interface import MockDataInterface
+from .data_interface import (
+    LazyMockDataInterface,
+    MockDataInterface,
+    instance_keys,
+    load_instances,
+)
+from .db_mock import STREAM_BATCH_SIZE, DBMockBase
+from .json_stream import batched_rows, iter_rows
+from .template import SeedTemplate, detach
 from .types import BaseType
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
-    from contextlib import AbstractAsyncContextManager
-    from pathlib import Path
+    from collections.abc import Awaitable, Callable, Iterable, Mapping
+    from contextlib import AbstractAsyncContextManager, AbstractContextManager
     from typing import AsyncIterator
 
-    from sqlalchemy import MetaData
     from sqlalchemy.ext.asyncio import AsyncEngine
 
     from .async_connection_provider import MockAsyncConnectionProvider
     from .data_interface import MockDataInterface
 
 
-class AsyncDBMock(Generic[BaseType]):
+@asynccontextmanager
+async def acquire(lock: "AbstractContextManager[None]") -> "AsyncIterator[None]":
+    """Hold a blocking file lock, waiting for it in a worker thread rather than on
+    the event loop, where it would deadlock with another task holding it."""
+    await asyncio.to_thread(lock.__enter__)
+    try:
+        yield
+    finally:
+        lock.__exit__(None, None, None)
+
+
+class AsyncDBMock(
+    DBMockBase[BaseType, "AbstractAsyncContextManager[MockDataInterface]"]
+):
     """A class that provides a mock interface for simulating interactions with
     multiple database tables in unit tests.
 
@@ -62,7 +82,8 @@ class AsyncDBMock(Generic[BaseType]):
 
     Methods:
     --------
-    from_dict(data: dict[str, list[dict]]):
+    from_dict(data: dict[str, list[dict]], bulk: bool = False,
+              read_only: bool = False, cached: bool = False):
         Mocks multiple tables and their rows using a dictionary format, ensuring
         data consistency with SQLAlchemy schemas.
 
@@ -70,115 +91,380 @@ class AsyncDBMock(Generic[BaseType]):
         Mocks multiple database tables using SQLAlchemy ORM model instances,
         supporting relationships between tables and foreign keys.
 
-    from_file(file_path: Path | str):
+    from_file(file_path: Path | str, cached: bool = False, bulk: bool = False,
+              stream: bool = False, read_only: bool = False):
         Loads mock data for multiple tables from a JSON file, simulating tables
         with relationships, and bulk operations.
     """
 
     if TYPE_CHECKING:
-        base: type[BaseType]
         connection_provider: "MockAsyncConnectionProvider"
-        database_initialized: bool
-        patches: Patches
 
-    def __init__(
+    @asynccontextmanager
+    async def from_orm(
         self,
-        base: "type[BaseType]",
-        connection_provider: "MockAsyncConnectionProvider",
-        patches: "Patches",
-    ):
-        self.base = base
-        self.connection_provider = connection_provider
-        self.database_initialized = False
-        self.patches = patches
-
-    @property
-    def metadata(self) -> "MetaData":
-        return self.base.metadata
-
-    @cached_property
-    def orm_classes(self) -> dict[str, "type[BaseType]"]:
-        return {
-            mapper.entity.__tablename__: mapper.entity
-            for mapper in self.base.registry.mappers
-        }
-
-    def from_dict(
-        self, data: dict[str, list[dict]]
-    ) -> "AbstractAsyncContextManager[MockDataInterface]":
-        """Mock multiple tables and their rows using a dictionary.
+        instances: "Iterable[BaseType]",
+        n_plus_one: "int | None" = None,
+        read_only: bool = False,
+    ) -> "AsyncIterator[MockDataInterface]":
+        """Mock multiple database tables using SQLAlchemy ORM model instances.
 
         Args:
         -----
-        data (dict): Dictionary where the key is the table name and the value is
-                     a list of rows (each row being a dictionary of column data).
+        instances (list): List of SQLAlchemy ORM model instances representing
+                          rows in the database tables.
+        n_plus_one (int | None): How many executions of a SELECT from the same call
+                                 site the context tolerates, overriding
+                                 Patches.detect_n_plus_one().
+        read_only (bool): Whether to make the database read-only once seeded, see
+                          DBMock.from_orm.
 
         Returns:
         -------
-        ContextManager[MockedDataInterface]: Mocked data interface containing
-                                             created data by table and rows.
+        Generator[MockedDataInterface, None, None]: A generator yielding a mocked
+                                                    data interface containing
+                                                    created data by table and rows.
         """
-        instances = [
-            self.orm_classes[table_name](**row)
-            for table_name, rows in data.items()
-            for row in rows
-        ]
-        return self.from_orm(instances)
-
-    def from_file(
-        self, file_path: "Path | str"
-    ) -> "AbstractAsyncContextManager[MockDataInterface]":
-        """Load mock data for multiple tables from a JSON file and simulate
-        relationships between tables.
+        with (
+            self.patches.route(self.connection_provider),
+            profiling.profiled("from_orm", self.on_profile),
+            queries.suspend(),
+        ):
+            with profiling.phase("init"):
+                await self.init_database()
+            # a read-only context cannot revert a seed updating existing rows
+            inserts_only = not (read_only and revert.updates_rows(instances))
+            async with self.isolate(read_only, inserts_only) as isolation:
+                with profiling.phase("seed"):
+                    await self.seed(instances)
+                await isolation.async_seeded()
+
+                db_mock_context: MockDataInterface = MockDataInterface(
+                    instances=instances
+                )
+                profiling.record_rows(db_mock_context)
+                with self.recorded(db_mock_context, n_plus_one):
+                    yield db_mock_context
+
+    @asynccontextmanager
+    async def _from_seed(
+        self,
+        seed: "Callable[[], Awaitable[MockDataInterface]]",
+        label: str,
+        read_only: bool = False,
+    ) -> "AsyncIterator[MockDataInterface]":
+        with (
+            self.patches.route(self.connection_provider),
+            profiling.profiled(label, self.on_profile),
+            queries.suspend(),
+        ):
+            with profiling.phase("init"):
+                await self.init_database()
+            async with self.isolate(read_only) as isolation:
+                with profiling.phase("seed"):
+                    db_mock_context: MockDataInterface = await seed()
+                await isolation.async_seeded()
+                profiling.record_rows(db_mock_context)
+                with self.recorded(db_mock_context):
+                    yield db_mock_context
+
+    async def build_and_seed(self, data: dict[str, list[dict]]) -> list[BaseType]:
+        instances = self.build_instances(data)
+        await self.seed(instances)
+        return instances
+
+    async def seed(self, instances: "Iterable[BaseType]"):
+        async with self.connection_provider.get_async_session() as session:
+            session.add_all(instances)
+            await session.commit()
+            # reload generated and server side values with a SELECT per table, in a
+            # single hop to the driver thread
+            with profiling.phase("refresh"):
+                await session.run_sync(
+                    load_instances, self.orm_classes, instance_keys(instances)
+                )
+
+    async def bulk_seed(self, data: dict[str, list[dict]]) -> list[BaseType]:
+        """Insert the rows with one bulk INSERT ... RETURNING per table, see
+        DBMock.bulk_seed.
 
         Args:
-        -----
-        file_path (str): Path to the JSON file containing mock data for multiple tables.
+            data (dict): The rows of each table, by table name.
 
         Returns:
-        -------
-        ContextManager[MockedDataInterface]: Mocked data interface containing
-                                             created data by table and rows.
+            list[BaseType]: The inserted instances, with their generated values.
         """
-        with open(file_path) as f:
-            data = json.load(f)
-        return self.from_dict(data)
+        instances: list[BaseType] = []
+        async with self.connection_provider.get_async_session() as session:
+            # the instances keep the values returned by the inserts
+            session.sync_session.expire_on_commit = False
+            for statement, rows in self.bulk_statements(data):
+                instances.extend(await session.scalars(statement, rows))
+            await session.commit()
+        return instances
+
+    async def bulk_seed_interface(
+        self, data: dict[str, list[dict]]
+    ) -> MockDataInterface:
+        return MockDataInterface(instances=await self.bulk_seed(data))
 
-    @asynccontextmanager
-    async def from_orm(
-        self, instances: "Iterable[BaseType]"
-    ) -> "AsyncIterator[MockDataInterface, None]":
-        """Mock multiple database tables using SQLAlchemy ORM model instances.
+    async def stream_seed(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        """Insert the rows of a JSON file while it is parsed, in batches, see
+        DBMock.stream_seed.
 
         Args:
-        -----
-        instances (list): List of SQLAlchemy ORM model instances representing
-                          rows in the database tables.
+            file_path (Path | str): Path to the JSON file containing the mock data.
 
         Returns:
-        -------
-        Generator[MockedDataInterface, None, None]: A generator yielding a mocked
-                                                    data interface containing
-                                                    created data by table and rows.
+            dict[str, list[tuple]]: The primary keys of the inserted rows, by table name.
         """
-        with self.patches:
-            await self.init_database()
-            async with AsyncSnapshot(self.connection_provider):
-                async with self.connection_provider.get_async_session() as session:
-                    session.add_all(instances)
-                    await session.commit()
-                    for instance in instances:
-                        await session.refresh(instance)
+        keys: defaultdict[str, list[tuple]] = defaultdict(list)
+        batches = batched_rows(iter_rows(file_path), STREAM_BATCH_SIZE)
+        async with self.connection_provider.get_async_session() as session:
+            # rows come in file order, so foreign keys are only checked on commit
+            await session.execute(text("PRAGMA defer_foreign_keys = ON"))
+            # the file is read and parsed off the event loop, one batch at a time
+            while batch := await asyncio.to_thread(next, batches, None):
+                table_name, rows = batch
+                statement = self.stream_statement(table_name)
+                result = await session.execute(statement, rows)
+                keys[table_name].extend(map(tuple, result))
+            await session.commit()
+        return dict(keys)
+
+    async def columnar_seed(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        """Insert the rows of a columnar fixture file, see columnar.py.
 
-                db_mock_context: MockDataInterface = MockDataInterface(
-                    instances=instances
+        Args:
+            file_path (Path | str): Path to the columnar fixture file.
+
+        Returns:
+            dict[str, list[tuple]]: The primary keys of the inserted rows, by table name.
+        """
+        async with self.connection_provider.get_async_session() as session:
+            keys = await session.run_sync(
+                lambda sync_session: columnar.load(
+                    sync_session.connection(), file_path, self.metadata
                 )
-                yield db_mock_context
+            )
+            await session.commit()
+        return keys
+
+    async def seed_keys(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        if columnar.is_columnar(file_path):
+            return await self.columnar_seed(file_path)
+        return await self.stream_seed(file_path)
+
+    async def seed_file(
+        self, file_path: "Path | str", bulk: bool, stream: bool
+    ) -> MockDataInterface:
+        if stream:
+            return await self.lazy_interface(await self.seed_keys(file_path))
+        return MockDataInterface(instances=await self.seed_instances(file_path, bulk))
+
+    async def seed_instances(
+        self, file_path: "Path | str", bulk: bool
+    ) -> list[BaseType]:
+        data = await asyncio.to_thread(self.read_file, file_path)
+        if bulk:
+            return await self.bulk_seed(data)
+        instances = self.build_instances(data)
+        await self.seed(instances)
+        return instances
+
+    async def lazy_interface(self, keys: dict[str, list[tuple]]) -> MockDataInterface:
+        if self.connection_provider.isolation == "savepoint":
+            return MockDataInterface(instances=await self.load_instances(keys))
+        return LazyMockDataInterface(
+            keys, self.orm_classes, self.connection_provider.get_session
+        )
+
+    async def load_instances(self, keys: dict[str, list[tuple]]) -> list[BaseType]:
+        with profiling.phase("refresh"):
+            async with self.connection_provider.get_async_session() as session:
+                return await session.run_sync(load_instances, self.orm_classes, keys)
+
+    async def seed_from_template(
+        self, file_path: "Path | str", bulk: bool = False, stream: bool = False
+    ) -> MockDataInterface:
+        """Seed the database from a JSON file through its seed template, see
+        DBMock.from_file.
+
+        Args:
+            file_path (Path | str): Path to the JSON file containing the mock data.
+            bulk (bool): Whether to insert the rows in bulk when the template is built.
+            stream (bool): Whether to stream the file when the template is built, and
+                           to load the instances lazily.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        engine = self.connection_provider.get_engine()
+        if not await asyncio.to_thread(self.accepts_seed_template, engine):
+            return await self.seed_from_fixture(file_path, bulk, stream)
+
+        seed_template = self.seed_template(file_path)
+        state = self.seed_cache.get(seed_template.key)
+        if state is not None:
+            await asyncio.to_thread(state.load, engine)
+            keys = state.keys
+        else:
+            # the first pytest-xdist worker seeds the template, the others wait and
+            # copy it
+            async with acquire(seed_template.lock()):
+                template_keys = await asyncio.to_thread(seed_template.load, engine)
+                if template_keys is None and not stream:
+                    instances = await self.seed_instances(file_path, bulk)
+                    keys = instance_keys(instances)
+                    await asyncio.to_thread(seed_template.save, engine, keys)
+                    await asyncio.to_thread(
+                        self.seed_cache.save, seed_template.key, engine, keys
+                    )
+                    return MockDataInterface(instances=instances)
+                if template_keys is None:
+                    keys = await self.seed_keys(file_path)
+                    await asyncio.to_thread(seed_template.save, engine, keys)
+                else:
+                    keys = template_keys
+            await asyncio.to_thread(
+                self.seed_cache.save, seed_template.key, engine, keys
+            )
+
+        if stream:
+            return await self.lazy_interface(keys)
+        return MockDataInterface(instances=await self.load_instances(keys))
+
+    async def seed_from_cache(
+        self, key: str, seed: "Callable[[], Awaitable[list[BaseType]]]"
+    ) -> MockDataInterface:
+        """Seed the database from the seed cache, see DBMock.from_dict.
+
+        Args:
+            key (str): The seed hash, see seed_hash.
+            seed (Callable[[], Awaitable[list[BaseType]]]): Seeds the data, when it is
+                                                            not cached or cannot be
+                                                            copied.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        engine = self.connection_provider.get_engine()
+        if self.seed_cache.budget <= 0 or not await asyncio.to_thread(
+            self.accepts_seed_template, engine
+        ):
+            return MockDataInterface(instances=await seed())
+
+        state = self.seed_cache.get(key)
+        if state is None:
+            instances = await seed()
+            await asyncio.to_thread(
+                self.seed_cache.save, key, engine, instance_keys(instances)
+            )
+            return MockDataInterface(instances=instances)
+
+        await asyncio.to_thread(state.load, engine)
+        return MockDataInterface(instances=await self.load_instances(state.keys))
+
+    async def seed_from_fixture(
+        self, file_path: "Path | str", bulk: bool = False, stream: bool = False
+    ) -> MockDataInterface:
+        """Seed the database by copying the rows of the JSON file's seed template,
+        compiled first if needed, see DBMock.from_file.
+
+        Args:
+            file_path (Path | str): Path to the JSON file containing the mock data.
+            bulk (bool): Whether to insert the rows in bulk when the template is built.
+            stream (bool): Whether to stream the file when the template is built, and
+                           to load the instances lazily.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        seed_template = self.seed_template(file_path)
+        if await asyncio.to_thread(seed_template.read_keys) is None:
+            await asyncio.to_thread(
+                self.compile_fixture, seed_template, file_path, bulk, stream
+            )
+
+        keys = await self.copy_fixture(seed_template)
+        if keys is None:
+            return await self.seed_file(file_path, bulk, stream)
+        if stream:
+            return await self.lazy_interface(keys)
+        return MockDataInterface(instances=await self.load_instances(keys))
+
+    async def copy_fixture(
+        self, seed_template: SeedTemplate
+    ) -> "dict[str, list[tuple]] | None":
+        """Copy the rows of a seed template into the database, see
+        SeedTemplate.copy_rows.
+
+        Args:
+            seed_template (SeedTemplate): The compiled fixture file.
+
+        Returns:
+            dict[str, list[tuple]] | None: The primary keys of the copied rows by table
+                                           name, or None when nothing was copied.
+        """
+        if self.connection_provider.isolation == "savepoint":
+            # the AsyncSavepoint of the db_mock context covers the copy
+            conn = await self.connection_provider.get_async_connection()
+            return await conn.run_sync(seed_template.copy_rows, self.metadata)
+
+        async with self.connection_provider.get_async_engine().connect() as conn:
+            keys = await conn.run_sync(seed_template.copy_rows, self.metadata)
+            await conn.commit()
+            await conn.run_sync(detach, seed_template.alias)
+        return keys
+
+    def isolate(
+        self, read_only: bool = False, inserts_only: bool = True
+    ) -> "AbstractAsyncContextManager":
+        """Create the context manager that isolates a db_mock context, according to
+        the connection provider's isolation mode.
+
+        Args:
+        -----
+        read_only (bool): Whether to make the database read-only once seeded.
+        inserts_only (bool): Whether the seed is expected to only run INSERTs, see
+                             Snapshot.
+
+        Returns:
+        -------
+        AsyncContextManager: AsyncSavepoint in "savepoint" isolation, AsyncSnapshot otherwise.
+        """
+        if self.connection_provider.isolation == "savepoint":
+            return AsyncSavepoint(self.connection_provider, read_only)
+        return AsyncSnapshot(self.connection_provider, read_only, inserts_only)
 
     async def init_database(self):
-        if self.database_initialized:
+        # see DBMock.init_database
+        engine = self.connection_provider.get_engine()
+        if engine in self.initialized_engines:
             return
 
+        self.adapt_primary_keys()
+
+        if self.schema_template is None:
+            await self.create_tables()
+        else:
+            # the first pytest-xdist worker builds the template, the others wait and
+            # copy it
+            async with acquire(self.schema_template.lock()):
+                if (
+                    not await asyncio.to_thread(self.schema_template.load, engine)
+                    and await self.create_tables()
+                ):
+                    await asyncio.to_thread(self.schema_template.save, engine)
+
+        self.initialized_engines.add(engine)
+
+    async def create_tables(self) -> bool:
+        """Create the missing tables and their indexes.
+
+        Returns:
+            bool: Whether the whole schema was built from scratch.
+        """
         tables_to_create = set()
 
         engine: "AsyncEngine" = self.connection_provider.get_async_engine()
@@ -188,24 +474,13 @@ class AsyncDBMock(Generic[BaseType]):
             for table in self.base.metadata.sorted_tables:
                 # Check if the table exists
                 table_exists = await conn.run_sync(
-                    lambda sync_conn, t=table: inspection.has_table(
-                        t.name, schema=t.schema
-                    )
+                    lambda _, name, schema: inspection.has_table(name, schema=schema),
+                    table.name,
+                    table.schema,
                 )
                 if not table_exists:
                     tables_to_create.add(table)
 
-                pk_columns = [c for c in table.columns if c.primary_key]
-                has_composite_pk = len(pk_columns) > 1
-
-                # Address SQLite's limitation with Identity columns
-                for column in table.columns:
-                    if column.primary_key and column.type.python_type is int:
-                        # only set autoincrement=True if not a composite PK
-                        # sqlite does not support composite primary keys
-                        column.autoincrement = not has_composite_pk
-                        column.type = Integer()
-
             # Create tables asynchronously
             for table_to_create in tables_to_create:
                 create_table_stmt = CreateTable(table_to_create)
@@ -215,9 +490,9 @@ class AsyncDBMock(Generic[BaseType]):
             # CreateTable doesn't automatically create indexes, so we need to create them all manually
             for table in self.base.metadata.sorted_tables:
                 existing_indexes = await conn.run_sync(
-                    lambda sync_conn, t=table: inspection.get_indexes(
-                        t.name, schema=t.schema
-                    )
+                    lambda _, name, schema: inspection.get_indexes(name, schema=schema),
+                    table.name,
+                    table.schema,
                 )
                 existing_index_names = {
                     idx_dict["name"] for idx_dict in existing_indexes
@@ -229,8 +504,8 @@ class AsyncDBMock(Generic[BaseType]):
                         try:
                             index_to_create = index
                             if hasattr(index, "dialect_options"):
-                                postgresql_opts = index.dialect_options.get(
-                                    "postgresql", {}
+                                postgresql_opts: Mapping[str, Any] = (
+                                    index.dialect_options.get("postgresql", {})
                                 )
                                 postgresql_where = postgresql_opts.get("where")
                                 if postgresql_where is not None:
@@ -245,4 +520,7 @@ class AsyncDBMock(Generic[BaseType]):
                         except Exception:
                             pass
 
-        self.database_initialized = True
+            await conn.commit()
+
+        # only a schema built from scratch is a valid template
+        return len(tables_to_create) == len(self.base.metadata.sorted_tables)
@@ -0,0 +1,68 @@
+from typing import TYPE_CHECKING, cast
+
+from .async_connection_provider import MockAsyncConnectionProvider
+from .pooled_connection_provider import PooledConnectionProvider
+
+if TYPE_CHECKING:
+    import aiosqlite
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+
+class PooledAsyncConnectionProvider(
+    PooledConnectionProvider, MockAsyncConnectionProvider
+):
+    """Async counterpart of PooledConnectionProvider, handing each asyncio task, or
+    thread, its own database.
+
+    Within worker(), the async engine, sessions and pinned connection are those of the
+    current worker's database as well.
+    """
+
+    def new_worker(self) -> MockAsyncConnectionProvider:
+        return MockAsyncConnectionProvider(
+            self.engine_kwargs,
+            self.snapshot_strategy,
+            self.isolation,
+            self.in_memory,
+            self.pragmas,
+        )
+
+    def _target(self) -> MockAsyncConnectionProvider:
+        # the workers are created by new_worker()
+        return cast(MockAsyncConnectionProvider, super()._target())
+
+    def get_async_engine(self) -> "AsyncEngine":
+        return self._target().get_async_engine()
+
+    async def get_async_connection(self) -> "AsyncConnection":
+        return await self._target().get_async_connection()
+
+    def get_async_session(self) -> "AsyncSession":
+        return self._target().get_async_session()
+
+    async def get_async_watcher_connection(self) -> "aiosqlite.Connection":
+        return await self._target().get_async_watcher_connection()
+
+    async def async_locked(self, writes_only: bool = False) -> bool:
+        return await self._target().async_locked(writes_only)
+
+    async def async_data_version(self) -> tuple[int, int]:
+        return await self._target().async_data_version()
+
+    async def async_drop_engine(self):
+        await self._target().async_drop_engine()
+
+    async def async_reset(self):
+        """Reset the current worker's database, or the template and every pooled
+        database.
+        """
+        if self.current.get() is not None:
+            await self._target().async_reset()
+            return
+
+        with self._lock:
+            idle, self.idle = self.idle, []
+            self.cloned.clear()
+        await super().async_reset()
+        for provider in idle:
+            await cast(MockAsyncConnectionProvider, provider).async_reset()
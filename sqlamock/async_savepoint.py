@@ -0,0 +1,75 @@
+from typing import TYPE_CHECKING
+
+from . import profiling
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncTransaction
+
+    from .async_connection_provider import MockAsyncConnectionProvider
+
+
+class AsyncSavepoint:
+    """Async counterpart of Savepoint, working on the pinned async connection.
+
+    Not meant for public use.
+
+    Attributes:
+        connection_provider (MockAsyncConnectionProvider): The connection provider for the database.
+        transaction (AsyncTransaction): The SAVEPOINT opened for the context.
+        read_only (bool): Whether the context is read-only once seeded.
+        query_only (bool): Whether the database was read-only when the context was
+                           entered, i.e. within a read-only context.
+    """
+
+    if TYPE_CHECKING:
+        connection_provider: "MockAsyncConnectionProvider"
+        transaction: AsyncTransaction
+        read_only: bool
+        query_only: bool
+
+    def __init__(
+        self,
+        connection_provider: "MockAsyncConnectionProvider",
+        read_only: bool = False,
+    ):
+        """Initialize a new AsyncSavepoint instance.
+
+        Args:
+            connection_provider (MockAsyncConnectionProvider): The connection provider for the database.
+            read_only (bool): Whether to make the database read-only once seeded.
+        """
+        self.connection_provider = connection_provider
+        self.read_only = read_only
+        self.query_only = False
+
+    async def __aenter__(self):
+        """Enter the context manager, opening a SAVEPOINT on the pinned async connection.
+
+        Returns:
+            AsyncSavepoint: The AsyncSavepoint instance.
+        """
+        self.query_only = await self.connection_provider.async_set_query_only(False)
+        with profiling.phase("snapshot"):
+            connection = await self.connection_provider.get_async_connection()
+            self.transaction = await connection.begin_nested()
+        return self
+
+    async def async_seeded(self):
+        """Make the database read-only if the context is. There is nothing to mark,
+        the SAVEPOINT is rolled back in any case."""
+        if self.read_only:
+            await self.connection_provider.async_set_query_only(True)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Exit the context manager, rolling back to the SAVEPOINT.
+
+        Args:
+            exc_type: The type of the exception that caused the context to be exited.
+            exc_value: The instance of the exception that caused the context to be exited.
+            traceback: A traceback object encoding the stack trace.
+        """
+        await self.connection_provider.async_set_query_only(False)
+        with profiling.phase("restore"):
+            if self.transaction.is_active:
+                await self.transaction.rollback()
+        await self.connection_provider.async_set_query_only(self.query_only)
@@ -1,49 +1,229 @@
 import asyncio
+import sqlite3
 from typing import TYPE_CHECKING
 
+from . import copy_on_write, profiling, revert
 from .snapshot import Snapshot
 
 if TYPE_CHECKING:
+    import aiosqlite
     from sqlalchemy import Engine
 
     from .async_connection_provider import MockAsyncConnectionProvider
 
 
 class AsyncSnapshot(Snapshot):
+    """Async counterpart of Snapshot, honouring the same snapshot_strategy.
+
+    The "backup" and "copy_on_write" strategies work on the connections of the async
+    engine itself: the backup is copied to and from a spare aiosqlite in-memory
+    database, and restored in place over the mocked database, so the thread pool is
+    not involved. A "dump" is taken and replayed by the sync Snapshot, in a thread, and
+    so is a "swap", after which the async engine's pool is disposed of too. So is the
+    async engine itself, when the snapshot is restored into a new database.
+
+    The data versions, marks, lock probes and reverts run on the provider's async
+    watcher connection, an aiosqlite one, see
+    MockAsyncConnectionProvider.get_async_watcher_connection().
+
+    Attributes:
+        async_backup (aiosqlite.Connection): The in-memory database holding the
+                                             "backup" snapshot.
+    """
+
     if TYPE_CHECKING:
         engine: "Engine"
         tmpfile_name: str
+        backup: sqlite3.Connection
+        async_backup: aiosqlite.Connection
         connection_provider: "MockAsyncConnectionProvider"
+        version: tuple[int, int] | None
+        seeded_version: tuple[int, int] | None
+        marks: revert.Marks | None
+        read_only: bool
+        inserts_only: bool
+        query_only: bool
 
-    def __init__(self, connection_provider: "MockAsyncConnectionProvider"):
+    def __init__(
+        self,
+        connection_provider: "MockAsyncConnectionProvider",
+        read_only: bool = False,
+        inserts_only: bool = True,
+    ):
         """Initialize a new Snapshot instance.
 
         Args:
             connection_provider (MockConnectionProvider): The connection provider for the database.
+            read_only (bool): Whether to make the database read-only once seeded.
+            inserts_only (bool): Whether the seed is expected to only run INSERTs, see
+                                 Snapshot.
         """
         self.connection_provider = connection_provider
-        super().__init__(connection_provider)
+        super().__init__(connection_provider, read_only, inserts_only)
 
     async def __aenter__(self):
         """Enter the context manager, creating a snapshot of the current database state.
 
-        This method creates a temporary file and dumps the current database state into it.
-
         Returns:
             Snapshot: The Snapshot instance.
         """
-        return await asyncio.to_thread(self.__enter__)
+        strategy = self.connection_provider.snapshot_strategy
+        if strategy in ("dump", "swap"):
+            # both work on files, the SQL script of a "dump" and the standby database
+            # of a "swap", which the sync Snapshot writes and reads in a single thread
+            # hop on entry and on exit
+            return await asyncio.to_thread(self.__enter__)
+
+        self.query_only = self.connection_provider.set_query_only(False)
+        with profiling.phase("snapshot"):
+            if self.reverts:
+                await self._async_mark()
+                return self
+            async with self.connection_provider.get_async_engine().connect() as conn:
+                if strategy == "copy_on_write":
+                    await conn.run_sync(copy_on_write.push)
+                else:
+                    # aiosqlite is an optional dependency, only needed by async engines
+                    import aiosqlite
+
+                    self.async_backup = await aiosqlite.connect(":memory:")
+                    raw_connection = await conn.get_raw_connection()
+                    await raw_connection.driver_connection.backup(self.async_backup)
+                    await self._async_mark()
+            if strategy != "copy_on_write" and profiling.active():
+                [(page_count,)] = await self.async_backup.execute_fetchall(
+                    "PRAGMA page_count"
+                )
+                [(page_size,)] = await self.async_backup.execute_fetchall(
+                    "PRAGMA page_size"
+                )
+                profiling.add_snapshot_bytes(page_count * page_size)
+        return self
 
     async def __aexit__(self, exc_type, exc_value, traceback):
         """Exit the context manager, restoring the database to the snapshotted state.
 
-        This method resets the connection provider and restores the database state
-        from the temporary file created in __enter__.
+        This method restores the database state captured in __aenter__, in place.
 
         Args:
             exc_type: The type of the exception that caused the context to be exited.
             exc_value: The instance of the exception that caused the context to be exited.
             traceback: A traceback object encoding the stack trace.
         """
-        await self.connection_provider.async_reset()
-        return await asyncio.to_thread(self.__exit__, exc_type, exc_value, traceback)
+        strategy = self.connection_provider.snapshot_strategy
+        if strategy in ("dump", "swap"):
+            suppressed = await asyncio.to_thread(
+                self.__exit__, exc_type, exc_value, traceback
+            )
+            if self.recreated:
+                await self.connection_provider.async_drop_engine()
+            elif self.swapped:
+                await self.connection_provider.get_async_engine().dispose()
+            return suppressed
+
+        self.connection_provider.set_query_only(False)
+        try:
+            with profiling.phase("restore"):
+                if await self.connection_provider.async_locked():
+                    await self._async_recreate()
+                    return False
+                if self.reverts:
+                    await self._async_revert_seed()
+                    return False
+                async with (
+                    self.connection_provider.get_async_engine().connect() as conn
+                ):
+                    if strategy == "copy_on_write":
+                        await conn.run_sync(copy_on_write.pop)
+                        return False
+                    try:
+                        if not await self._async_reverted():
+                            raw_connection = await conn.get_raw_connection()
+                            await self.async_backup.backup(
+                                raw_connection.driver_connection
+                            )
+                    finally:
+                        await self.async_backup.close()
+        finally:
+            self._unwatch()
+            self.connection_provider.set_query_only(self.query_only)
+        return False
+
+    async def _async_recreate(self):
+        """Restore the snapshot into a new database, as another connection holds a lock
+        on the current one, see Snapshot._recreate()."""
+        strategy = self.connection_provider.snapshot_strategy
+        if self.reverts or strategy == "copy_on_write":
+            await asyncio.to_thread(self._recreate)
+            await self.connection_provider.async_drop_engine()
+            return
+
+        try:
+            await asyncio.to_thread(self.connection_provider.replace_database)
+            self.recreated = True
+            await self.connection_provider.async_drop_engine()
+            async with self.connection_provider.get_async_engine().connect() as conn:
+                raw_connection = await conn.get_raw_connection()
+                await self.async_backup.backup(raw_connection.driver_connection)
+        finally:
+            await self.async_backup.close()
+
+    async def async_seeded(self):
+        """Mark the end of the context's seed, see Snapshot.seeded()."""
+        if self.connection_provider.snapshot_strategy in ("dump", "swap"):
+            await asyncio.to_thread(self.seeded)
+            return
+
+        if self.version is not None:
+            self.seeded_version = await self.connection_provider.async_data_version()
+        self._unwatch()
+        if self.read_only:
+            self.connection_provider.set_query_only(True)
+
+    async def _async_mark(self):
+        """Mark the data version and the tables, see Snapshot._mark()."""
+        provider = self.connection_provider
+        self.version = await provider.async_data_version()
+        self.marks = await revert.async_mark(
+            await provider.get_async_watcher_connection()
+        )
+        provider.watch_inserts(self.marks)
+
+    async def _async_reverted(self) -> bool:
+        """Skip the restore if nothing was committed within the context, or revert the
+        seed's inserts if nothing else was, see Snapshot._reverted().
+
+        Returns:
+            bool: Whether the database is back to the snapshotted state.
+        """
+        provider = self.connection_provider
+        version = await provider.async_data_version()
+        if version == self.version:
+            return True
+        if (
+            self.marks is None
+            or self.seeded_version is None
+            or version != self.seeded_version
+        ):
+            return False
+        return await revert.async_revert(
+            await provider.get_async_watcher_connection(), self.marks
+        )
+
+    async def _async_revert_seed(self):
+        """Revert the seed of a read-only context, see Snapshot._revert_seed().
+
+        Raises:
+            RuntimeError: If the database was written other than by INSERTs appending
+                          rows.
+        """
+        provider = self.connection_provider
+        if await provider.async_data_version() == self.version:
+            return
+        if not await revert.async_revert(
+            await provider.get_async_watcher_connection(), self.marks
+        ):
+            raise RuntimeError(
+                "The database was written within a read_only db_mock context, and "
+                "cannot be restored"
+            )
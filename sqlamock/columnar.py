@@ -0,0 +1,601 @@
+"""Binary columnar fixture files.
+
+A columnar fixture stores each table column by column, with the values already
+processed by the SQLAlchemy column types into what the SQLite driver expects.
+Loading one memory-maps the file and feeds the columns to executemany batches: no
+JSON parsing, no ORM instance and no per-value type processing. Each column is
+only checked once, against the type affinity of the current schema.
+
+Layout:
+
+- MAGIC, then the byte length of the header as a little endian unsigned 64-bit int.
+- The header, as UTF-8 JSON: the tables in foreign key order, their row counts,
+  and the type, kind and byte ranges of each column in the data section.
+- The data section. Blocks are aligned on 8 bytes, numbers are little endian.
+
+  - "q" (64-bit integer) and "d" (double) columns are packed arrays.
+  - "s" (text) and "y" (blob) columns are an array of n + 1 offsets into a block
+    holding the concatenated UTF-8 or raw bytes.
+  - Columns holding NULLs also have a mask of n bytes, 1 for NULL.
+  - Columns some rows omit, without a Python default, also have a mask of n bytes,
+    1 for omitted. Those rows are inserted without the column, like by the other
+    loaders, so that its server default applies or its key is generated.
+
+convert() writes a columnar fixture from a JSON one, and so does the command line::
+
+    python -m sqlamock.columnar fixture.json fixture.sqlamock myapp.models:Base
+"""
+
+import argparse
+import importlib
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from typing import TYPE_CHECKING, TypedDict
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import ColumnDefault
+
+from .copy_on_write import quote
+from .json_stream import iter_rows
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+    from pathlib import Path
+
+    from sqlalchemy import Column, Connection, MetaData, Table
+    from sqlalchemy.orm import DeclarativeBase
+
+MAGIC = b"SQLAMOCK"
+FORMAT_VERSION = 2
+ALIGNMENT = 8
+# rows per executemany batch
+BATCH_SIZE = 1000
+
+HEADER_LENGTH = struct.Struct("<Q")
+BIG_ENDIAN = sys.byteorder == "big"
+
+
+class ColumnHeader(TypedDict):
+    """The header of a column, see pack_column(). Blocks are the offset and length of
+    a block of the data section."""
+
+    name: str
+    type: str
+    kind: str
+    data: list[int]
+    # the block of the n + 1 offsets of "s" and "y" columns
+    offsets: list[int] | None
+    nulls: list[int] | None
+    omitted: list[int] | None
+
+
+class TableHeader(TypedDict):
+    name: str
+    rows: int
+    columns: list[ColumnHeader]
+
+
+class FixtureHeader(TypedDict):
+    version: int
+    tables: list[TableHeader]
+
+
+def is_columnar(file_path: "Path | str") -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def type_affinity(column: "Column") -> str:
+    """Get the SQLite type affinity of a column, following the rules of
+    https://www.sqlite.org/datatype3.html#determination_of_column_affinity.
+
+    Args:
+        column (Column): The column.
+
+    Returns:
+        str: "INTEGER", "TEXT", "BLOB", "REAL" or "NUMERIC".
+    """
+    declared = str(column.type.compile(dialect=sqlite.dialect())).upper()
+    if "INT" in declared:
+        return "INTEGER"
+    if "CHAR" in declared or "CLOB" in declared or "TEXT" in declared:
+        return "TEXT"
+    if "BLOB" in declared or not declared:
+        return "BLOB"
+    if "REAL" in declared or "FLOA" in declared or "DOUB" in declared:
+        return "REAL"
+    return "NUMERIC"
+
+
+def column_kind(table_name: str, column_name: str, values: list) -> str:
+    kinds = {type(value) for value in values if value is not None}
+    if kinds <= {int}:
+        return "q"
+    if kinds <= {int, float}:
+        return "d"
+    if kinds == {str}:
+        return "s"
+    if kinds <= {bytes, bytearray, memoryview}:
+        return "y"
+    names = ", ".join(sorted(kind.__name__ for kind in kinds))
+    raise ValueError(f"Column {table_name}.{column_name} mixes {names} values")
+
+
+class DataSection:
+    """The data section of a columnar fixture being written."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.size = 0
+
+    def add(self, data: bytes) -> list[int]:
+        """Append an aligned block.
+
+        Args:
+            data (bytes): The content of the block.
+
+        Returns:
+            list[int]: The offset and length of the block.
+        """
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.chunks.append(bytes(padding))
+            self.size += padding
+        offset = self.size
+        self.chunks.append(data)
+        self.size += len(data)
+        return [offset, len(data)]
+
+    def add_array(self, values: array) -> list[int]:
+        if BIG_ENDIAN:  # pragma: no cover
+            values.byteswap()
+        return self.add(values.tobytes())
+
+
+def pack_column(
+    section: DataSection,
+    table_name: str,
+    column: "Column",
+    values: list,
+    omitted: "list[bool] | None" = None,
+) -> ColumnHeader:
+    """Write a column to the data section.
+
+    Args:
+        section (DataSection): The data section.
+        table_name (str): The name of the column's table, for error messages.
+        column (Column): The column.
+        values (list): The processed values of the column.
+        omitted (list[bool] | None): Whether each row omits the column, None when
+                                     none does.
+
+    Returns:
+        ColumnHeader: The header of the column.
+    """
+    kind = column_kind(table_name, column.name, values)
+    offsets = None
+    if kind in ("q", "d"):
+        zero = 0 if kind == "q" else 0.0
+        try:
+            packed = array(kind, (zero if value is None else value for value in values))
+        except OverflowError as e:
+            raise ValueError(
+                f"Column {table_name}.{column.name} holds an integer out of range"
+            ) from e
+        data = section.add_array(packed)
+    else:
+        encoded = [
+            b"" if value is None else value.encode() if kind == "s" else bytes(value)
+            for value in values
+        ]
+        ends = array("q", [0])
+        for value in encoded:
+            ends.append(ends[-1] + len(value))
+        offsets = section.add_array(ends)
+        data = section.add(b"".join(encoded))
+
+    return {
+        "name": column.name,
+        "type": type_affinity(column),
+        "kind": kind,
+        "data": data,
+        "offsets": offsets,
+        "nulls": (
+            section.add(bytes(value is None for value in values))
+            if None in values
+            else None
+        ),
+        "omitted": None if omitted is None else section.add(bytes(omitted)),
+    }
+
+
+def convert(
+    json_path: "Path | str", output_path: "Path | str", base: "type[DeclarativeBase]"
+):
+    """Convert a JSON fixture file to a columnar fixture file.
+
+    Values are processed by the SQLAlchemy column types once, here. Missing values
+    take the column's Python default, evaluated now (e.g. a timestamp default is
+    frozen at conversion time), or are left out of the row's INSERT, for the server
+    default or a generated key.
+
+    Args:
+        json_path (Path | str): The JSON fixture file, see DBMock.from_file.
+        output_path (Path | str): The columnar fixture file to write.
+        base (type[DeclarativeBase]): The declarative base of the mocked schemas.
+    """
+    dialect = sqlite.dialect()
+    orm_classes = {
+        mapper.entity.__tablename__: mapper for mapper in base.registry.mappers
+    }
+    missing = object()
+    # column name -> values, with `missing` for rows without the column
+    tables: dict[str, dict[str, list]] = defaultdict(dict)
+    row_counts: dict[str, int] = defaultdict(int)
+    processors: dict[tuple[str, str], object] = {}
+
+    def get_processor(table_name: str, column: "Column"):
+        if (table_name, column.name) not in processors:
+            processors[(table_name, column.name)] = column.type.bind_processor(dialect)
+        return processors[(table_name, column.name)]
+
+    for table_name, row in iter_rows(json_path):
+        mapper = orm_classes[table_name]
+        columns = tables[table_name]
+        for key, value in row.items():
+            column = mapper.columns[key]
+            if column.name not in columns:
+                columns[column.name] = [missing] * row_counts[table_name]
+            processor = get_processor(table_name, column)
+            columns[column.name].append(processor(value) if processor else value)
+        row_counts[table_name] += 1
+        for values in columns.values():
+            if len(values) < row_counts[table_name]:
+                values.append(missing)
+
+    section = DataSection()
+    header: FixtureHeader = {"version": FORMAT_VERSION, "tables": []}
+    for table in base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        columns = tables[table.name]
+        # columns no row sets still take their Python default
+        for column in table.columns:
+            if column.name not in columns and has_default(column):
+                columns[column.name] = [missing] * row_counts[table.name]
+        column_headers = []
+        for column_name, values in columns.items():
+            column = table.c[column_name]
+            omitted = None
+            if missing in values and has_default(column):
+                default = default_value(column)
+                processor = get_processor(table.name, column)
+                if processor and default is not None:
+                    default = processor(default)
+                values = [default if value is missing else value for value in values]
+            elif missing in values:
+                omitted = [value is missing for value in values]
+                values = [None if value is missing else value for value in values]
+            column_headers.append(
+                pack_column(section, table.name, column, values, omitted)
+            )
+        header["tables"].append(
+            {
+                "name": table.name,
+                "rows": row_counts[table.name],
+                "columns": column_headers,
+            }
+        )
+
+    encoded_header = json.dumps(header).encode()
+    with open(output_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(encoded_header)))
+        f.write(encoded_header)
+        f.write(bytes(-f.tell() % ALIGNMENT))
+        for chunk in section.chunks:
+            f.write(chunk)
+
+
+def has_default(column: "Column") -> bool:
+    """Whether the column has a Python default that convert() can evaluate."""
+    default = column.default
+    return isinstance(default, ColumnDefault) and (
+        default.is_scalar or default.is_callable
+    )
+
+
+def default_value(column: "Column") -> object:
+    default = column.default
+    if not isinstance(default, ColumnDefault):
+        return None
+    if default.is_scalar:
+        return default.arg
+    if default.is_callable:
+        # SQLAlchemy wraps callables to take an execution context, which zero
+        # argument callables ignore
+        return default.arg(None)
+    return None
+
+
+def read_column(
+    buffer: "mmap.mmap", start: int, column: ColumnHeader, rows: int
+) -> "Sequence":
+    """Read a column from the data section of a memory-mapped columnar fixture.
+
+    Args:
+        buffer (mmap.mmap): The memory-mapped file.
+        start (int): The offset of the data section in the file.
+        column (ColumnHeader): The header of the column.
+        rows (int): The number of rows of the table.
+
+    Returns:
+        Sequence: The values of the column.
+    """
+    offset, length = column["data"]
+    data = buffer[start + offset : start + offset + length]
+    kind = column["kind"]
+
+    values: Sequence
+    if kind in ("q", "d"):
+        numbers = array(kind, data)
+        if BIG_ENDIAN:  # pragma: no cover
+            numbers.byteswap()
+        values = numbers
+    elif column["offsets"] is None:
+        raise ValueError(f"Column {column['name']} has no offsets")
+    else:
+        offsets_offset, offsets_length = column["offsets"]
+        offsets = array(
+            "q",
+            buffer[start + offsets_offset : start + offsets_offset + offsets_length],
+        )
+        if BIG_ENDIAN:  # pragma: no cover
+            offsets.byteswap()
+        if kind == "s":
+            text = data.decode()
+            # offsets count bytes, so slice bytes unless the text is ASCII
+            if len(text) == len(data):
+                values = [text[offsets[i] : offsets[i + 1]] for i in range(rows)]
+            else:
+                values = [
+                    data[offsets[i] : offsets[i + 1]].decode() for i in range(rows)
+                ]
+        else:
+            values = [data[offsets[i] : offsets[i + 1]] for i in range(rows)]
+
+    if column["nulls"]:
+        mask = read_mask(buffer, start, column["nulls"])
+        values = [
+            None if null else value for value, null in zip(values, mask, strict=True)
+        ]
+    return values
+
+
+def read_mask(buffer: "mmap.mmap", start: int, block: "list[int] | None") -> bytes:
+    """Read a mask of n bytes from the data section, empty without one."""
+    if not block:
+        return b""
+    offset, length = block
+    return buffer[start + offset : start + offset + length]
+
+
+def row_runs(
+    omitted: "list[bytes]", rows: int
+) -> "Iterator[tuple[int, int, list[int]]]":
+    """Split the rows of a table into runs of consecutive rows setting the same
+    columns.
+
+    Args:
+        omitted (list[bytes]): The omitted mask of each column, empty when no row
+                               omits it.
+        rows (int): The number of rows of the table.
+
+    Returns:
+        Iterator[tuple[int, int, list[int]]]: The first and past the last row of each
+                                              run, and the indexes of the columns
+                                              its rows set.
+    """
+    masks = [(index, mask) for index, mask in enumerate(omitted) if mask]
+    if not masks:
+        if rows:
+            yield 0, rows, list(range(len(omitted)))
+        return
+    start = 0
+    previous = None
+    for row in range(rows):
+        present = [
+            index for index, mask in enumerate(omitted) if not mask or not mask[row]
+        ]
+        if present != previous:
+            if previous is not None:
+                yield start, row, previous
+            start, previous = row, present
+    if previous is not None:
+        yield start, rows, previous
+
+
+def load(
+    connection: "Connection", file_path: "Path | str", metadata: "MetaData"
+) -> dict[str, list[tuple]]:
+    """Insert the rows of a columnar fixture file.
+
+    Args:
+        connection (Connection): The connection to insert the rows with. The caller
+                                 commits.
+        file_path (Path | str): The columnar fixture file.
+        metadata (MetaData): The SQLAlchemy metadata of the mocked schemas.
+
+    Returns:
+        dict[str, list[tuple]]: The primary keys of the inserted rows, by table name.
+
+    Raises:
+        ValueError: If the file is not a columnar fixture, or does not match the schema.
+    """
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{file_path} is not a columnar fixture file")
+            header_start = len(MAGIC) + HEADER_LENGTH.size
+            (header_length,) = HEADER_LENGTH.unpack_from(buffer, len(MAGIC))
+            header: FixtureHeader = json.loads(
+                buffer[header_start : header_start + header_length]
+            )
+            if header["version"] != FORMAT_VERSION:
+                raise ValueError(
+                    f"{file_path} uses columnar format version {header['version']}"
+                )
+            data_start = header_start + header_length
+            data_start += -data_start % ALIGNMENT
+
+            connection.exec_driver_sql("PRAGMA defer_foreign_keys = ON")
+            keys = {}
+            for table_header in header["tables"]:
+                table = metadata.tables.get(table_header["name"])
+                if table is None:
+                    raise ValueError(f"Table {table_header['name']} does not exist")
+                keys[table.name] = load_table(
+                    connection, table, table_header, buffer, data_start
+                )
+            return keys
+
+
+def load_table(
+    connection: "Connection",
+    table: "Table",
+    table_header: TableHeader,
+    buffer: "mmap.mmap",
+    data_start: int,
+) -> list[tuple]:
+    column_names = [column["name"] for column in table_header["columns"]]
+    for column in table_header["columns"]:
+        if column["name"] not in table.c:
+            raise ValueError(f"Column {table.name}.{column['name']} does not exist")
+        affinity = type_affinity(table.c[column["name"]])
+        if column["type"] != affinity:
+            raise ValueError(
+                f"Column {table.name}.{column['name']} was converted as "
+                f"{column['type']}, but is now {affinity}. Convert the fixture again."
+            )
+
+    rows = table_header["rows"]
+    columns = [
+        read_column(buffer, data_start, column, rows)
+        for column in table_header["columns"]
+    ]
+    omitted = [
+        read_mask(buffer, data_start, column["omitted"])
+        for column in table_header["columns"]
+    ]
+    keys = []
+    for start, stop, present in row_runs(omitted, rows):
+        keys.extend(
+            insert_rows(
+                connection,
+                table,
+                [column_names[index] for index in present],
+                [columns[index] for index in present],
+                start,
+                stop,
+            )
+        )
+    return keys
+
+
+def insert_rows(
+    connection: "Connection",
+    table: "Table",
+    column_names: list[str],
+    columns: "list[Sequence]",
+    start: int,
+    stop: int,
+) -> list[tuple]:
+    """Insert a run of rows setting the same columns, in batches.
+
+    Args:
+        connection (Connection): The connection to insert the rows with.
+        table (Table): The table.
+        column_names (list[str]): The columns the rows set.
+        columns (list[Sequence]): The values of those columns, for every row of the
+                                  table.
+        start (int): The first row of the run.
+        stop (int): Past the last row of the run.
+
+    Returns:
+        list[tuple]: The primary keys of the inserted rows.
+    """
+    primary_key = [column.name for column in table.primary_key.columns]
+    table_name = quote(table.name)
+
+    generated_keys = not all(name in column_names for name in primary_key)
+    if generated_keys:
+        # every new rowid is above the current maximum
+        last_rowid = connection.exec_driver_sql(
+            f"SELECT COALESCE(MAX(rowid), 0) FROM {table_name}"
+        ).scalar()
+
+    if column_names:
+        statement = "INSERT INTO {} ({}) VALUES ({})".format(
+            table_name,
+            ", ".join(quote(name) for name in column_names),
+            ", ".join("?" for _ in column_names),
+        )
+    else:
+        statement = f"INSERT INTO {table_name} DEFAULT VALUES"
+    for batch_start in range(start, stop, BATCH_SIZE):
+        batch_stop = min(batch_start + BATCH_SIZE, stop)
+        if columns:
+            parameters = list(
+                zip(
+                    *(column[batch_start:batch_stop] for column in columns),
+                    strict=True,
+                )
+            )
+        else:
+            parameters = [()] * (batch_stop - batch_start)
+        connection.exec_driver_sql(statement, parameters)
+
+    if not generated_keys:
+        return list(
+            zip(
+                *(
+                    columns[column_names.index(name)][start:stop]
+                    for name in primary_key
+                ),
+                strict=True,
+            )
+        )
+    return [
+        tuple(row)
+        for row in connection.exec_driver_sql(
+            "SELECT {} FROM {} WHERE rowid > ? ORDER BY rowid".format(
+                ", ".join(quote(name) for name in primary_key), table_name
+            ),
+            (last_rowid,),
+        )
+    ]
+
+
+def main(argv: "list[str] | None" = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sqlamock.columnar",
+        description="Convert a JSON fixture file to a columnar fixture file.",
+    )
+    parser.add_argument("json_path", help="The JSON fixture file.")
+    parser.add_argument("output_path", help="The columnar fixture file to write.")
+    parser.add_argument(
+        "base", help="The declarative base of the schemas, as module:attribute."
+    )
+    args = parser.parse_args(argv)
+
+    module_name, _, attribute = args.base.partition(":")
+    base = getattr(importlib.import_module(module_name), attribute)
+    convert(args.json_path, args.output_path, base)
+
+
+if __name__ == "__main__":
+    main()
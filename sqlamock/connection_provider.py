@@ -1,10 +1,141 @@
+import os
+import sqlite3
 import tempfile
-from functools import lru_cache
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Connection, Engine, create_engine, event
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from .copy_on_write import use_copy_on_write
+from .queries import QueryRecorder, use_query_recorders
+from .revert import Marks, use_insert_watch
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from .types import IsolationMode, PragmaProfile, SnapshotStrategy
+
+# Durability settings that only cost time for a throwaway test database. The journal
+# stays in memory rather than off, because ROLLBACK (and SAVEPOINT) still need it.
+# locking_mode = EXCLUSIVE is left out: the pool, the snapshots and the async engine
+# open several connections to the same database, and an exclusive connection would
+# lock all the others out.
+PRAGMA_PROFILES: dict[str, dict[str, str | int]] = {
+    "fast": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def use_pragmas(engine: Engine, pragmas: "dict[str, str | int]"):
+    """Apply PRAGMAs to every new connection of the engine.
+
+    Args:
+        engine (Engine): The (sync) engine to configure. For async engines pass
+                         AsyncEngine.sync_engine.
+        pragmas (dict[str, str | int]): The PRAGMA values by name, in order.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+def use_explicit_begin(engine: Engine):
+    """Let SQLAlchemy emit BEGIN itself instead of relying on the sqlite3 driver.
+
+    The sqlite3 driver only opens a transaction right before DML statements, which
+    breaks SAVEPOINT handling. This is the recipe from the SQLAlchemy SQLite dialect
+    documentation, see "Serializable isolation / Savepoints / Transactional DDL".
+
+    Args:
+        engine (Engine): The (sync) engine to configure. For async engines pass
+                         AsyncEngine.sync_engine.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+def apply_query_only(dbapi_connection, info: dict, enabled: bool):
+    """Switch a DBAPI connection to PRAGMA query_only, or back, unless it already is.
+
+    Args:
+        dbapi_connection: The sqlite3 (or adapted aiosqlite) connection.
+        info (dict): The info of the connection's pool record, remembering its state.
+        enabled (bool): Whether writes must fail.
+    """
+    if info.get("sqlamock_query_only", False) != enabled:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA query_only = {int(enabled)}")
+        cursor.close()
+        info["sqlamock_query_only"] = enabled
+
+
+def use_query_only(engine: Engine, provider: "MockConnectionProvider"):
+    """Switch every connection checked out of the engine's pool to PRAGMA query_only
+    while the provider is read-only, see MockConnectionProvider.set_query_only().
+
+    Args:
+        engine (Engine): The (sync) engine to configure. For async engines pass
+                         AsyncEngine.sync_engine.
+        provider (MockConnectionProvider): The provider owning the engine.
+    """
+
+    @event.listens_for(engine, "checkout")
+    def _apply_query_only(dbapi_connection, connection_record, connection_proxy):
+        apply_query_only(dbapi_connection, connection_record.info, provider.query_only)
+
+
+# how long the watcher connection waits for the locks of other connections, in seconds.
+# A lock held longer is taken for a session left open, see locked().
+WATCHER_TIMEOUT = 0.1
+
+
+def sqlite_connection(conn: Connection) -> sqlite3.Connection:
+    """Get the sqlite3 connection of a SQLAlchemy connection, e.g. for the backup API.
+
+    Args:
+        conn (Connection): A connection of a sync engine.
+
+    Returns:
+        sqlite3.Connection: The driver's connection.
+
+    Raises:
+        TypeError: If the connection is not a sqlite3 one, e.g. an aiosqlite one.
+    """
+    dbapi_connection = conn.connection.dbapi_connection
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        raise TypeError(f"{dbapi_connection!r} is not a sqlite3 connection")
+    return dbapi_connection
+
+
+def memory_database_uri(name: str) -> str:
+    """Build the SQLite URI of a named in-memory database, shared by every connection
+    of the process that opens it.
+
+    Args:
+        name (str): The name of the database.
+
+    Returns:
+        str: The URI, to open with sqlite3.connect(uri, uri=True).
+    """
+    return f"file:{name}?mode=memory&cache=shared"
 
 
 class MockConnectionProvider:
@@ -15,51 +146,390 @@ class MockConnectionProvider:
 
     Attributes:
         engine_kwargs (dict): Additional keyword arguments to pass to create_engine.
+        snapshot_strategy (str): How Snapshot captures and restores the database state.
+        isolation (str): How db_mock contexts are isolated from each other.
+        in_memory (bool): Whether databases live in memory rather than in a temp file.
+        pragmas (dict[str, str | int]): The PRAGMAs applied to every new connection.
+        engine (Engine | None): The engine returned by get_engine(), until reset().
+        pinned_connection (Connection | None): The connection every session joins in
+                                               "savepoint" isolation.
+        keeper_connection (sqlite3.Connection | None): Keeps the in-memory database
+                                                       alive while the engine's pool
+                                                       holds no connection.
+        recorders (list[QueryRecorder]): The recorders of record_queries() open on
+                                         the provider's engines.
+        watcher_connection (sqlite3.Connection | None): The plain sqlite3 connection
+                                                        reading data_version(), out of
+                                                        SQLAlchemy's sight.
+        watchers (int): How many watcher connections were opened, since their data
+                        versions do not compare.
+        query_only (bool): Whether connections are checked out with PRAGMA
+                           query_only, see set_query_only().
+        watched (list[Marks]): The marks of the contexts being seeded, flagged
+                               when a statement other than an INSERT runs, see
+                               watch_inserts().
+        bookkeeping_database (str | None): The database of the "copy_on_write"
+                                           bookkeeping, see
+                                           copy_on_write_database(), until reset().
+        bookkeeping_connection (sqlite3.Connection | None): Keeps the in-memory
+                                                            bookkeeping database
+                                                            alive.
     """
 
     if TYPE_CHECKING:
         engine_kwargs: dict
+        snapshot_strategy: SnapshotStrategy
+        isolation: IsolationMode
+        in_memory: bool
+        pragmas: dict[str, str | int]
+        engine: Engine | None
+        pinned_connection: Connection | None
+        keeper_connection: sqlite3.Connection | None
+        recorders: list[QueryRecorder]
+        watcher_connection: sqlite3.Connection | None
+        watchers: int
+        query_only: bool
+        watched: list[Marks]
+        bookkeeping_database: str | None
+        bookkeeping_connection: sqlite3.Connection | None
 
-    def __init__(self, engine_kwargs: dict | None = None):
+    def __init__(
+        self,
+        engine_kwargs: dict | None = None,
+        snapshot_strategy: "SnapshotStrategy" = "backup",
+        isolation: "IsolationMode" = "snapshot",
+        in_memory: bool = False,
+        pragmas: "PragmaProfile | dict[str, str | int] | None" = "fast",
+    ):
         """Initialize a new MockConnectionProvider instance.
 
         Args:
             engine_kwargs (dict | None): Additional keyword arguments to pass to create_engine.
                                          If None, an empty dict will be used.
+            snapshot_strategy (str): "backup" copies the database page by page with the
+                                     SQLite online backup API. "dump" writes the database
+                                     out as SQL text and replays it on restore.
+                                     "copy_on_write" only saves and restores the tables
+                                     written inside each context (see copy_on_write.py).
+                                     "swap" prepares a copy of the "backup" snapshot
+                                     in a standby database file in the background,
+                                     and swaps it in on exit, see swap_database().
+                                     It needs file databases.
+            isolation (str): "snapshot" snapshots and restores the whole database around
+                             each db_mock context. "savepoint" runs every context in a
+                             SAVEPOINT on a single pinned connection and rolls it back
+                             on exit. Sessions from get_session() join that connection,
+                             so code under test must use them rather than the engine.
+            in_memory (bool): Whether to keep databases in memory, as a named shared-cache
+                              database, rather than in a temporary file. This saves the
+                              file system round trips, and snapshots stay in memory too.
+                              Note that shared-cache connections lock tables rather than
+                              the whole database, and fail right away instead of waiting
+                              when a table is locked by another connection.
+            pragmas (str | dict | None): "fast" (default) turns off the durability
+                                         settings a throwaway database does not need:
+                                         in-memory journal, synchronous off, a larger
+                                         page cache and in-memory temp tables. A dict
+                                         of PRAGMA values by name is applied as is, and
+                                         None keeps SQLite's defaults, e.g. for tests
+                                         that rely on realistic journaling or locking.
         """
+        if in_memory and snapshot_strategy == "swap":
+            raise ValueError('The "swap" snapshot strategy needs file databases')
         self.engine_kwargs = engine_kwargs or {}
+        self.snapshot_strategy = snapshot_strategy
+        self.isolation = isolation
+        self.in_memory = in_memory
+        if isinstance(pragmas, str):
+            pragmas = PRAGMA_PROFILES[pragmas]
+        self.pragmas = dict(pragmas or {})
+        self.engine = None
+        self.pinned_connection = None
+        self.keeper_connection = None
+        self.recorders = []
+        self.watcher_connection = None
+        self.watchers = 0
+        self.query_only = False
+        self.watched = []
+        self.bookkeeping_database = None
+        self.bookkeeping_connection = None
 
-    @lru_cache  # noqa: B019
     def get_engine(self) -> Engine:
         """Get or create a SQLAlchemy engine instance.
 
         This method creates a new SQLite in-memory database engine. The result is
-        cached, so subsequent calls will return the same engine instance.
+        kept on the provider, so subsequent calls will return the same engine
+        instance, with its pool and compiled statement cache, until reset().
+
+        Returns:
+            Engine: A SQLAlchemy engine instance.
+        """
+        if self.engine is None:
+            self.engine = self.new_engine()
+        return self.engine
+
+    def new_engine(self) -> Engine:
+        """Create the engine of a new, empty database.
 
         Returns:
             Engine: A SQLAlchemy engine instance.
         """
-        with tempfile.NamedTemporaryFile() as tmpfile:
-            return create_engine(f"sqlite:///{tmpfile.name}", **self.engine_kwargs)
+        if self.in_memory:
+            engine = self.create_memory_engine()
+        else:
+            with tempfile.NamedTemporaryFile() as tmpfile:
+                engine = create_engine(
+                    f"sqlite:///{tmpfile.name}", **self.engine_kwargs
+                )
+
+        if self.pragmas:
+            use_pragmas(engine, self.pragmas)
+        if self.isolation == "savepoint":
+            use_explicit_begin(engine)
+        use_query_recorders(engine, self.recorders)
+        use_insert_watch(engine, self.watched)
+        use_query_only(engine, self)
+        if self.snapshot_strategy == "copy_on_write":
+            use_copy_on_write(engine, self.copy_on_write_database())
+        return engine
+
+    def copy_on_write_database(self) -> str:
+        """Get the database holding the "copy_on_write" bookkeeping, out of the user's
+        database, see copy_on_write.py.
+
+        Like the database, it is kept until reset(). Snapshot._recreate() carries
+        its committed state over to the next one.
+
+        Returns:
+            str: The URI of a named in-memory database, or a file name, for the
+                 engines to attach.
+        """
+        if self.bookkeeping_database is None:
+            if self.in_memory:
+                uri = memory_database_uri(f"sqlamock_cow_{uuid.uuid4().hex}")
+                self.bookkeeping_connection = sqlite3.connect(
+                    uri, uri=True, check_same_thread=False
+                )
+                self.bookkeeping_database = uri
+            else:
+                with tempfile.NamedTemporaryFile(suffix="-cow") as tmpfile:
+                    self.bookkeeping_database = tmpfile.name
+        return self.bookkeeping_database
+
+    def create_memory_engine(self) -> Engine:
+        """Create an engine on a new named in-memory database.
+
+        SQLite frees an in-memory database with its last connection, so a keeper
+        connection stays open until reset().
+
+        Returns:
+            Engine: A SQLAlchemy engine instance.
+        """
+        uri = memory_database_uri(f"sqlamock_{uuid.uuid4().hex}")
+        self.keeper_connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+        engine_kwargs = {"poolclass": QueuePool, **self.engine_kwargs}
+        # pooled connections are handed over between threads, as for file databases
+        engine_kwargs["connect_args"] = {
+            "check_same_thread": False,
+            **self.engine_kwargs.get("connect_args", {}),
+        }
+        return create_engine(f"sqlite:///{uri}&uri=true", **engine_kwargs)
+
+    @contextmanager
+    def record_queries(
+        self, recorder: "QueryRecorder | None" = None
+    ) -> "Iterator[QueryRecorder]":
+        """Record the statements executed on the provider's engines within, see
+        queries.py.
+
+        Args:
+            recorder (QueryRecorder | None): The recorder to use, e.g. an
+                                             NPlusOneDetector. Defaults to a new
+                                             QueryRecorder.
+
+        Yields:
+            QueryRecorder: The count, time and rows of each normalized statement.
+        """
+        if recorder is None:
+            recorder = QueryRecorder()
+        self.recorders.append(recorder)
+        try:
+            yield recorder
+        finally:
+            self.recorders.remove(recorder)
+
+    def get_connection(self) -> Connection:
+        """Get the connection pinned for "savepoint" isolation.
+
+        The connection is opened lazily with an outer transaction that is never
+        committed. Each db_mock context opens a SAVEPOINT on it.
+
+        Returns:
+            Connection: The pinned SQLAlchemy connection.
+        """
+        if self.pinned_connection is None or self.pinned_connection.closed:
+            self.pinned_connection = self.get_engine().connect()
+            self.pinned_connection.begin()
+        return self.pinned_connection
+
+    def set_query_only(self, enabled: bool) -> bool:
+        """Make the database read-only, or writable again, for the code under test.
+
+        Connections get PRAGMA query_only as they are checked out of the engines'
+        pools, and the pinned connection of "savepoint" isolation right away, so that
+        writes fail with "attempt to write a readonly database". The watcher
+        connection is left writable.
+
+        Args:
+            enabled (bool): Whether writes must fail.
+
+        Returns:
+            bool: Whether they failed before, to switch back to.
+        """
+        previous, self.query_only = self.query_only, enabled
+        if self.isolation == "savepoint" and self.pinned_connection is not None:
+            fairy = self.pinned_connection.connection
+            apply_query_only(fairy.dbapi_connection, fairy.info, enabled)
+        return previous
+
+    def get_watcher_connection(self) -> sqlite3.Connection:
+        """Get a plain sqlite3 connection to the database, that neither the code under
+        test nor SQLAlchemy events see. Snapshots use it to tell what a context wrote.
+
+        Returns:
+            sqlite3.Connection: The watcher connection, kept until reset().
+        """
+        if self.watcher_connection is None:
+            engine = self.get_engine()
+            [database], kwargs = engine.dialect.create_connect_args(engine.url)
+            self.watcher_connection = sqlite3.connect(
+                database,
+                **{**kwargs, "check_same_thread": False, "timeout": WATCHER_TIMEOUT},
+            )
+            self.watchers += 1
+        return self.watcher_connection
+
+    def watch_inserts(self, marks: Marks):
+        """Flag the marks if a statement other than an INSERT runs on the provider's
+        engines, until unwatch_inserts(), see revert.py.
+
+        Args:
+            marks (Marks): The marks of a context about to be seeded.
+        """
+        self.watched.append(marks)
+
+    def unwatch_inserts(self, marks: Marks):
+        if marks in self.watched:
+            self.watched.remove(marks)
+
+    def locked(self, writes_only: bool = False) -> bool:
+        """Tell whether another connection holds a lock on the database, e.g. a session
+        left open with a pending write, or in a read transaction.
+
+        Restoring the database in place would wait on such a lock forever, so
+        snapshots move to a new database instead, see replace_database().
+
+        Args:
+            writes_only (bool): Only tell about pending writes, which also keep other
+                                connections of an in-memory database from reading.
+
+        Returns:
+            bool: Whether the lock was still held after WATCHER_TIMEOUT.
+        """
+        conn = self.get_watcher_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE" if writes_only else "BEGIN EXCLUSIVE")
+        except sqlite3.OperationalError:
+            return True
+        conn.execute("ROLLBACK")
+        return False
+
+    def replace_database(self):
+        """Move the provider to a new, empty database, when the current one cannot be
+        restored in place, see locked().
+
+        The engine is disposed of, and the next call to get_engine() creates one on
+        the new database. Sessions left open keep the current database.
+        """
+        self.reset()
+
+    def data_version(self) -> tuple[int, int]:
+        """Read the database's PRAGMA data_version, on the watcher connection.
+
+        The value changes whenever a change is committed to the database by any other
+        connection, so snapshots can tell whether a context wrote anything. Values
+        read on different watcher connections, e.g. across swap_database(), never
+        compare equal.
+
+        Returns:
+            tuple[int, int]: The watcher connection's number and the data version.
+        """
+        conn = self.get_watcher_connection()
+        [(version,)] = conn.execute("PRAGMA data_version").fetchall()
+        return self.watchers, version
+
+    def swap_database(self, file_name: str):
+        """Replace the database file with another one, e.g. the standby database of a
+        "swap" snapshot.
+
+        The engine is kept, with its compiled statement cache, but its pooled
+        connections, which would keep reading the replaced file, are closed. Sessions
+        left open across the swap keep reading it too.
+
+        Args:
+            file_name (str): The replacing SQLite file, moved into place.
+
+        Raises:
+            ValueError: If the database is not a file.
+        """
+        engine = self.get_engine()
+        if not engine.url.database:
+            raise ValueError("Only file databases can be swapped")
+        if self.watcher_connection is not None:
+            self.watcher_connection.close()
+            self.watcher_connection = None
+        engine.dispose()
+        os.replace(file_name, engine.url.database)
 
     def get_session(self) -> Session:
         """Create a new SQLAlchemy session.
 
         This method creates a new session bound to the engine returned by get_engine().
+        In "savepoint" isolation the session joins the pinned connection instead, and
+        its commits only release a nested SAVEPOINT.
 
         Returns:
             Session: A new SQLAlchemy session instance.
         """
+        if self.isolation == "savepoint":
+            return Session(
+                bind=self.get_connection(), join_transaction_mode="create_savepoint"
+            )
         return Session(bind=self.get_engine())
 
     def reset(self):
         """Reset the connection provider.
 
-        This method disposes of the current engine and clears the engine cache,
-        ensuring that a new engine will be created on the next call to get_engine().
+        This method disposes of the current engine, ensuring that a new engine, on a
+        new empty database, will be created on the next call to get_engine(). Other
+        providers keep their engines.
 
-        This is used in conjunction with the Snapshot context manager to reset the
-        database state between db_mock contexts (especially nested ones).
+        Snapshots restore the database in place and do not need it.
         """
-        self.get_engine().dispose()
-        self.get_engine.cache_clear()
+        if self.pinned_connection is not None:
+            self.pinned_connection.close()
+            self.pinned_connection = None
+        if self.watcher_connection is not None:
+            self.watcher_connection.close()
+            self.watcher_connection = None
+        if self.engine is not None:
+            self.engine.dispose()
+            self.engine = None
+        if self.keeper_connection is not None:
+            self.keeper_connection.close()
+            self.keeper_connection = None
+        if self.bookkeeping_connection is not None:
+            self.bookkeeping_connection.close()
+            self.bookkeeping_connection = None
+        self.bookkeeping_database = None
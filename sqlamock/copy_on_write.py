@@ -0,0 +1,276 @@
+"""Copy-on-write snapshot stack for the "copy_on_write" snapshot strategy.
+
+Every user table gets BEFORE INSERT/UPDATE/DELETE triggers. The first write to a
+table inside a snapshot layer copies the table's current rows into its shadow table
+and marks it dirty for that layer. Popping a layer only restores the dirty tables
+from their shadow copies, so teardown costs as much as the test touched rather than
+the size of the whole database.
+
+Bookkeeping lives in a database of its own, which every connection of the provider
+attaches as ``sqlamock`` (see use_copy_on_write), so it is shared by every connection
+while the user's database only holds the user's tables:
+
+- ``_sqlamock_layer``: a single row holding the current layer depth (0 = inactive).
+- ``_sqlamock_dirty``: the tables written in each layer, and their AUTOINCREMENT
+  sequence value before the first write (0 when the table had none yet).
+- ``_sqlamock_cow_<table>``: the pre-images of ``<table>``, tagged by layer.
+
+Triggers on the tables of one database cannot write to another one, unless they are
+TEMP triggers, which only exist on the connection that created them. Each connection
+creates its own as it begins a transaction, once push() created the shadow tables.
+
+Not meant for public use.
+"""
+
+import sqlite3
+from typing import TYPE_CHECKING
+
+from sqlalchemy import event
+
+if TYPE_CHECKING:
+    from sqlalchemy import Connection, Engine
+
+PREFIX = "_sqlamock_"
+# the schema name the bookkeeping database is attached under
+SCHEMA = "sqlamock"
+# the bookkeeping tables are named without their schema within TEMP triggers, which
+# find them in the attached database, as their prefix keeps them apart from the user's
+LAYER_TABLE = f"{PREFIX}layer"
+DIRTY_TABLE = f"{PREFIX}dirty"
+
+
+def quote(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def shadow_name(table_name: str) -> str:
+    return f"{PREFIX}cow_{table_name}"
+
+
+def trigger_statements(table_name: str, autoincrement: bool) -> list[str]:
+    """Build the DDL creating the TEMP triggers of a single table, on the connection
+    executing it.
+
+    Args:
+        table_name (str): The user table to track.
+        autoincrement (bool): Whether the table uses AUTOINCREMENT, in which case its
+                              sqlite_sequence value is recorded alongside the pre-image.
+
+    Returns:
+        list[str]: The statements to execute, in order.
+    """
+    table = quote(table_name)
+    shadow = quote(shadow_name(table_name))
+    literal = "'{}'".format(table_name.replace("'", "''"))
+    depth = f"(SELECT depth FROM {LAYER_TABLE})"
+    sequence = (
+        f"COALESCE((SELECT seq FROM main.sqlite_sequence WHERE name = {literal}), 0)"
+        if autoincrement
+        else "NULL"
+    )
+
+    statements = []
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        trigger = quote(f"{shadow_name(table_name)}_{operation.lower()}")
+        statements.append(
+            f"CREATE TEMP TRIGGER IF NOT EXISTS {trigger} BEFORE {operation} "
+            f"ON main.{table} "
+            f"WHEN {depth} > 0 AND NOT EXISTS ("
+            f"SELECT 1 FROM {DIRTY_TABLE} WHERE layer = {depth} AND tbl = {literal}"
+            ") BEGIN "
+            f"INSERT INTO {DIRTY_TABLE} (layer, tbl, seq) "
+            f"SELECT depth, {literal}, {sequence} FROM {LAYER_TABLE}; "
+            f"INSERT INTO {shadow} SELECT {LAYER_TABLE}.depth, source.* "
+            f"FROM {LAYER_TABLE}, main.{table} AS source; "
+            "END"
+        )
+    return statements
+
+
+def install_triggers(dbapi_connection, info: dict):
+    """Create the TEMP triggers of every user table with a shadow table on a
+    connection, unless it has them since the last schema change of either database.
+
+    Args:
+        dbapi_connection (DBAPIConnection): The driver's connection, with the
+                                            bookkeeping database attached.
+        info (dict): The info dictionary of the connection, remembering the schema
+                     versions its triggers were created for.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        versions = []
+        for schema in ("main", SCHEMA):
+            cursor.execute(f"PRAGMA {schema}.schema_version")
+            [(version,)] = cursor.fetchall()
+            versions.append(version)
+        if info.get("sqlamock_cow_versions") == versions:
+            return
+
+        cursor.execute(f"SELECT name FROM {SCHEMA}.sqlite_master WHERE type = 'table'")
+        shadows = {name for (name,) in cursor.fetchall()}
+        cursor.execute(
+            "SELECT name, sql FROM main.sqlite_master "
+            "WHERE type = 'table' AND name NOT GLOB 'sqlite_*'"
+        )
+        for name, sql in cursor.fetchall():
+            if shadow_name(name) not in shadows:
+                continue
+            autoincrement = "AUTOINCREMENT" in (sql or "").upper()
+            for statement in trigger_statements(name, autoincrement):
+                cursor.execute(statement)
+        info["sqlamock_cow_versions"] = versions
+    finally:
+        cursor.close()
+
+
+def connect(database: str) -> sqlite3.Connection:
+    """Open a plain sqlite3 connection to a bookkeeping database, e.g. to copy it.
+
+    Args:
+        database (str): The bookkeeping database, see use_copy_on_write().
+
+    Returns:
+        sqlite3.Connection: The connection, to close.
+    """
+    return sqlite3.connect(database, uri=True)
+
+
+def use_copy_on_write(engine: "Engine", database: str):
+    """Attach the bookkeeping database to every new connection of the engine, and
+    create the triggers of the tracked tables as each transaction begins.
+
+    Args:
+        engine (Engine): The (sync) engine to configure. For async engines pass
+                         AsyncEngine.sync_engine.
+        database (str): The bookkeeping database, a file name, or the URI of a named
+                        in-memory database for engines on one, see
+                        MockConnectionProvider.copy_on_write_database().
+    """
+
+    @event.listens_for(engine, "connect")
+    def _attach_bookkeeping(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (database,))
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _install_triggers(conn):
+        install_triggers(conn.connection.dbapi_connection, conn.connection.info)
+
+
+def install(conn: "Connection"):
+    """Create the bookkeeping tables, the shadow tables of every user table that does
+    not have one yet, and the connection's triggers.
+
+    Args:
+        conn (Connection): A connection to the mocked database.
+    """
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{LAYER_TABLE} (depth INTEGER NOT NULL)"
+    )
+    conn.exec_driver_sql(
+        f"INSERT INTO {SCHEMA}.{LAYER_TABLE} (depth) "
+        f"SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM {SCHEMA}.{LAYER_TABLE})"
+    )
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{DIRTY_TABLE} ("
+        "layer INTEGER NOT NULL, tbl TEXT NOT NULL, seq INTEGER, "
+        "PRIMARY KEY (layer, tbl))"
+    )
+    tables = conn.exec_driver_sql(
+        "SELECT name FROM main.sqlite_master "
+        "WHERE type = 'table' AND name NOT GLOB 'sqlite_*'"
+    ).scalars()
+    for name in tables.all():
+        conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{quote(shadow_name(name))} AS "
+            f"SELECT 0 AS {PREFIX}layer, * FROM main.{quote(name)} WHERE 0"
+        )
+    install_triggers(conn.connection.dbapi_connection, conn.connection.info)
+
+
+def push(conn: "Connection") -> int:
+    """Open a new copy-on-write layer.
+
+    Args:
+        conn (Connection): A connection to the mocked database.
+
+    Returns:
+        int: The depth of the new layer.
+    """
+    install(conn)
+    conn.exec_driver_sql(f"UPDATE {SCHEMA}.{LAYER_TABLE} SET depth = depth + 1")
+    depth = conn.exec_driver_sql(
+        f"SELECT depth FROM {SCHEMA}.{LAYER_TABLE}"
+    ).scalar_one()
+    conn.commit()
+    return depth
+
+
+def pop(conn: "Connection") -> list[str]:
+    """Close the current copy-on-write layer, restoring the tables written in it.
+
+    Foreign key enforcement is switched off during the restore, so parent rows can
+    be swapped without firing ON DELETE actions on children that were not touched.
+
+    Args:
+        conn (Connection): A connection to the mocked database.
+
+    Returns:
+        list[str]: The names of the restored tables.
+    """
+    foreign_keys = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+    if foreign_keys:
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+
+    try:
+        depth = conn.exec_driver_sql(
+            f"SELECT depth FROM {SCHEMA}.{LAYER_TABLE}"
+        ).scalar_one()
+        dirty = conn.exec_driver_sql(
+            f"SELECT tbl, seq FROM {SCHEMA}.{DIRTY_TABLE} WHERE layer = ?", (depth,)
+        ).all()
+
+        # suspend the triggers while the tables are swapped back
+        conn.exec_driver_sql(f"UPDATE {SCHEMA}.{LAYER_TABLE} SET depth = 0")
+        for table_name, sequence in dirty:
+            table = f"main.{quote(table_name)}"
+            shadow = f"{SCHEMA}.{quote(shadow_name(table_name))}"
+            columns = ", ".join(
+                quote(row[1])
+                for row in conn.exec_driver_sql(
+                    f"PRAGMA main.table_info({quote(table_name)})"
+                )
+            )
+            conn.exec_driver_sql(f"DELETE FROM {table}")
+            conn.exec_driver_sql(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {shadow} "
+                f"WHERE {PREFIX}layer = ?",
+                (depth,),
+            )
+            conn.exec_driver_sql(
+                f"DELETE FROM {shadow} WHERE {PREFIX}layer = ?", (depth,)
+            )
+            if sequence is not None:
+                conn.exec_driver_sql(
+                    "DELETE FROM main.sqlite_sequence WHERE name = ?", (table_name,)
+                )
+                if sequence:
+                    conn.exec_driver_sql(
+                        "INSERT INTO main.sqlite_sequence (name, seq) VALUES (?, ?)",
+                        (table_name, sequence),
+                    )
+
+        conn.exec_driver_sql(
+            f"DELETE FROM {SCHEMA}.{DIRTY_TABLE} WHERE layer = ?", (depth,)
+        )
+        conn.exec_driver_sql(
+            f"UPDATE {SCHEMA}.{LAYER_TABLE} SET depth = ?", (depth - 1,)
+        )
+        conn.commit()
+    finally:
+        if foreign_keys:
+            conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+    return [table_name for table_name, _ in dirty]
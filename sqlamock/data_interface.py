@@ -1,10 +1,86 @@
 from collections import defaultdict
 from typing import TYPE_CHECKING, Generic
 
+from sqlalchemy import inspect, select, tuple_
+from sqlalchemy.orm import with_polymorphic
+
 from .types import BaseType
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable
+    from collections.abc import Callable, Iterable
+
+    from sqlalchemy.orm import Session
+
+    from .queries import QueryRecorder
+
+# keeps composite key lookups below SQLite's default limit of 999 bound parameters
+LOAD_CHUNK_SIZE = 400
+
+
+def instance_keys(instances: "Iterable[BaseType]") -> dict[str, list[tuple]]:
+    """Collect the primary keys of persisted ORM instances by table name.
+
+    Args:
+        instances (Iterable[BaseType]): Persisted SQLAlchemy ORM instances.
+
+    Returns:
+        dict[str, list[tuple]]: The primary key values of each instance, in order.
+    """
+    keys: defaultdict[str, list[tuple]] = defaultdict(list)
+    for instance in instances:
+        identity = inspect(instance).identity
+        if identity is None:
+            raise ValueError(f"{instance!r} was not persisted")
+        keys[instance.__tablename__].append(tuple(identity))
+    return dict(keys)
+
+
+def load_instances(
+    session: "Session",
+    orm_classes: "dict[str, type[BaseType]]",
+    keys: "dict[str, list[tuple]]",
+) -> list[BaseType]:
+    """Load ORM instances back from their primary keys, see instance_keys.
+
+    Instances already in the session's identity map are refreshed in place, so a
+    whole table costs one SELECT per chunk of keys rather than one per instance.
+    Each table is selected through the base class of its inheritance hierarchy,
+    with every subclass loaded, so that subclasses sharing it, e.g. with single
+    table inheritance, come back as themselves.
+
+    Args:
+        session (Session): The session to load the instances with.
+        orm_classes (dict[str, type[BaseType]]): The ORM classes by table name.
+        keys (dict[str, list[tuple]]): The primary key values by table name.
+
+    Returns:
+        list[BaseType]: The instances, in the order of the keys.
+    """
+    instances: list[BaseType] = []
+    for table_name, table_keys in keys.items():
+        mapper = inspect(orm_classes[table_name]).base_mapper
+        primary_key = mapper.primary_key
+        entity = (
+            with_polymorphic(mapper.class_, "*")
+            if mapper.polymorphic_on is not None
+            else mapper.class_
+        )
+        loaded = {}
+        for start in range(0, len(table_keys), LOAD_CHUNK_SIZE):
+            chunk = table_keys[start : start + LOAD_CHUNK_SIZE]
+            if len(primary_key) == 1:
+                condition = primary_key[0].in_([key[0] for key in chunk])
+            else:
+                condition = tuple_(*primary_key).in_(chunk)
+            statement = (
+                select(entity)
+                .where(condition)
+                .execution_options(populate_existing=True)
+            )
+            for instance in session.scalars(statement):
+                loaded[inspect(instance).identity] = instance
+        instances.extend(loaded[tuple(key)] for key in table_keys)
+    return instances
 
 
 class MockDataInterface(Generic[BaseType]):
@@ -19,11 +95,14 @@ class MockDataInterface(Generic[BaseType]):
     Attributes:
         data_registry (dict): A dictionary mapping ORM classes to lists of their instances.
         table_name_mapping (dict): A dictionary mapping table names to their corresponding ORM classes.
+        queries (QueryRecorder | None): The statements executed within the context, when
+                                        the DBMock records queries.
     """
 
     if TYPE_CHECKING:
         data_registry: dict[type[BaseType], list[BaseType]]
         table_name_mapping: dict[str, type[BaseType]]
+        queries: QueryRecorder | None
 
     def __init__(self, instances: "Iterable[BaseType]"):
         """Initialize the MockDataInterface with a list of ORM instances.
@@ -36,6 +115,7 @@ class MockDataInterface(Generic[BaseType]):
         """
         self.data_registry = defaultdict(list)
         self.table_name_mapping = {}
+        self.queries = None
 
         for instance in instances:
             self.data_registry[type(instance)].append(instance)
@@ -65,3 +145,68 @@ class MockDataInterface(Generic[BaseType]):
                 raise KeyError(f"Table name {key} not found") from e
 
         return self.data_registry[key]
+
+
+class LazyMockDataInterface(MockDataInterface[BaseType]):
+    """A MockDataInterface that only holds the primary keys of the seeded rows.
+
+    The instances of a table are loaded on first access, with a SELECT per chunk of
+    keys. Used for streamed fixtures, whose rows would not fit in memory as ORM
+    instances all at once.
+
+    Attributes:
+        data_registry (dict): A dictionary mapping ORM classes to lists of their loaded
+                              instances.
+        table_name_mapping (dict): A dictionary mapping table names to their
+                                   corresponding ORM classes.
+        pending_keys (dict): The primary keys of the tables not loaded yet, by table name.
+        session_factory (Callable[[], Session]): Opens the sessions loading the instances.
+    """
+
+    if TYPE_CHECKING:
+        pending_keys: dict[str, list[tuple]]
+        session_factory: Callable[[], Session]
+
+    def __init__(
+        self,
+        keys: "dict[str, list[tuple]]",
+        orm_classes: "dict[str, type[BaseType]]",
+        session_factory: "Callable[[], Session]",
+    ):
+        """Initialize the LazyMockDataInterface with the primary keys of the seeded rows.
+
+        Args:
+            keys (dict[str, list[tuple]]): The primary key values by table name.
+            orm_classes (dict[str, type[BaseType]]): The ORM classes by table name.
+            session_factory (Callable[[], Session]): Opens the sessions loading the
+                                                     instances.
+        """
+        super().__init__(instances=[])
+        self.pending_keys = dict(keys)
+        self.session_factory = session_factory
+        for table_name in keys:
+            self.table_name_mapping[table_name] = orm_classes[table_name]
+
+    def __getitem__(self, key: "type[BaseType] | str") -> list["BaseType"]:
+        """Retrieve mocked data instances by ORM class or table name, loading them
+        on first access.
+
+        Args:
+            key (type[BaseType] | str): The ORM class or table name to retrieve data for.
+
+        Returns:
+            list[BaseType]: A list of mocked data instances for the specified key.
+
+        Raises:
+            KeyError: If the provided key is not found in the data registry or table name mapping.
+        """
+        table_name = key if isinstance(key, str) else key.__tablename__
+        if table_name in self.pending_keys:
+            table_keys = self.pending_keys.pop(table_name)
+            with self.session_factory() as session:
+                self.data_registry[self.table_name_mapping[table_name]] = (
+                    load_instances(
+                        session, self.table_name_mapping, {table_name: table_keys}
+                    )
+                )
+        return super().__getitem__(key)
@@ -1,94 +1,129 @@
 import json
+from abc import ABC, abstractmethod
+from collections import defaultdict
 from contextlib import contextmanager
 from functools import cached_property
-from typing import TYPE_CHECKING, Generic
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+from weakref import WeakSet
 
-from sqlalchemy import Index, Integer, inspect
+from sqlalchemy import Index, Integer, insert, inspect, text
 from sqlalchemy.schema import CreateIndex
 
 from sqlamock.patches import Patches
 
-from .data_interface import MockDataInterface
+from . import columnar, profiling, queries, revert
+from .connection_provider import MockConnectionProvider
+from .data_interface import (
+    LazyMockDataInterface,
+    MockDataInterface,
+    instance_keys,
+    load_instances,
+)
+from .json_stream import batched_rows, iter_rows
+from .n_plus_one import NPlusOneDetector
+from .queries import QueryRecorder
+from .savepoint import Savepoint
+from .seed_cache import DEFAULT_SEED_CACHE_BYTES, SeedCache, seed_hash
 from .snapshot import Snapshot
+from .template import (
+    SchemaTemplate,
+    SeedTemplate,
+    detach,
+    mapper_hash,
+    metadata_hash,
+    tables_are_empty,
+)
 from .types import BaseType
 
+# rows per INSERT ... RETURNING statement when streaming a fixture file
+STREAM_BATCH_SIZE = 1000
+
+# the context managers returned by DBMock and AsyncDBMock, sync and async
+DataContext = TypeVar("DataContext")
+
 if TYPE_CHECKING:
-    from collections.abc import Generator, Iterable
+    from collections.abc import Callable, Generator, Iterable, Iterator, Mapping
     from contextlib import AbstractContextManager
-    from pathlib import Path
 
-    from sqlalchemy import MetaData
+    from sqlalchemy import Engine, MetaData
+    from sqlalchemy.sql.dml import ReturningInsert
 
     from .connection_provider import ConnectionProvider
     from .data_interface import MockDataInterface
+    from .profiling import ContextProfile
 
 
-class DBMock(Generic[BaseType]):
-    """A class that provides a mock interface for simulating interactions with
-    multiple database tables in unit tests.
-
-    This class validates the mocked data against the current state of the SQLAlchemy
-    schemas, ensuring that the mock data aligns with the actual table and column
-    definitions in the database models. The context managers returned by this class
-    can be scoped to the fixture they are provided in, ensuring that each test
-    maintains isolated and clean data. Different database data mocks can be applied
-    at different scopes and layers. For example, you can provide default data for
-    all tests, but within a test, apply additional data for a specific test function,
-    or for managing multiple data contexts within the same test.
-
-    Features:
-    ---------
-    - **Mock Data Across Tables**: Provides an interface to mock data for multiple
-      tables, validated against the current SQLAlchemy schemas.
-    - **Fixture Scoped Data**: The mocked data is scoped according to the fixture
-      (e.g., function, module) it is provided in, ensuring that each test maintains
-      isolated and clean data.
-    - **No External Resources**: Supports unit testing without needing separately
-      provisioned resources, such as a real database, allowing tests to run faster
-      and in isolation.
-    - **Foreign Key Support**: Allows defining foreign keys and creating rows across
-      related tables, ensuring that relationships between tables are respected in
-      the mock data.
-    - **Isolated Mock Instances**: Each mock instance maintains its own state,
-      allowing multiple test cases or fixtures to apply separate layers of data
-      without conflict.
-        - Example: You can have a default mock database state and apply additional
-          test-specific data layers that are cleaned up when out of scope.
-        - Limitation: Constraints across different mock instances will break. All
-          data related to a test must be created within a single mock instance to
-          remain isolated and valid.
-
-    Methods:
-    --------
-    from_dict(data: dict[str, list[dict]]):
-        Mocks multiple tables and their rows using a dictionary format, ensuring
-        data consistency with SQLAlchemy schemas.
+class DBMockBase(ABC, Generic[BaseType, DataContext]):
+    """The parts of DBMock and AsyncDBMock that are neither sync nor async: their
+    configuration, the dispatch of from_dict and from_file to the seeding methods each
+    implements, the statements those run, and the seed templates, which are built on
+    sync engines.
 
-    from_orm(models: list[Base]):
-        Mocks multiple database tables using SQLAlchemy ORM model instances,
-        supporting relationships between tables and foreign keys.
+    The seeding methods are abstract: DBMock returns their results, and AsyncDBMock
+    awaitables of them, hence their Any return types.
 
-    from_file(file_path: Path | str):
-        Loads mock data for multiple tables from a JSON file, simulating tables
-        with relationships, and bulk operations.
+    Not meant for public use.
     """
 
     if TYPE_CHECKING:
         base: type[BaseType]
         connection_provider: ConnectionProvider
-        database_initialized: bool
+        initialized_engines: WeakSet[Engine]
         patches: Patches
+        schema_template: SchemaTemplate | None
+        cache_dir: Path | str | None
+        on_profile: Callable[[ContextProfile], None] | None
+        record_queries: bool
+        seed_cache: SeedCache
 
     def __init__(
         self,
         base: "type[BaseType]",
         connection_provider: "ConnectionProvider",
         patches: "Patches",
+        schema_template: bool = True,
+        cache_dir: "Path | str | None" = None,
+        on_profile: "Callable[[ContextProfile], None] | None" = None,
+        record_queries: bool = False,
+        seed_cache_bytes: int = DEFAULT_SEED_CACHE_BYTES,
     ):
+        """Initialize a new DBMock instance.
+
+        Args:
+            base (type[BaseType]): The SQLAlchemy declarative base of the mocked schemas.
+            connection_provider (MockConnectionProvider): The mock connection provider.
+            patches (Patches): The patches applied within db_mock contexts.
+            schema_template (bool): Whether to cache the initialized schema as a template
+                                    database file, keyed by a hash of the metadata, and
+                                    start new databases from a copy of it.
+            cache_dir (Path | str | None): Where template files are stored. Defaults to a
+                                           "sqlamock-<uid>" directory in the system
+                                           temp dir. Share it between pytest-xdist
+                                           workers, but not between users.
+            on_profile (Callable | None): Called with the profile of each context as it
+                                          exits: the duration of its phases, the rows
+                                          inserted and the snapshot size, see
+                                          profiling.py.
+            record_queries (bool): Whether to record the statements executed within
+                                   each context, once seeded, into the queries of its
+                                   data interface (see queries.py), e.g. to assert how
+                                   many queries the code under test runs.
+            seed_cache_bytes (int): The memory budget of the seeded states cached by
+                                    from_dict and from_file with cached=True, see
+                                    seed_cache.py. 0 disables the in-memory cache.
+        """
         self.base = base
         self.connection_provider = connection_provider
-        self.database_initialized = False
+        self.initialized_engines = WeakSet()
         self.patches = patches
+        self.cache_dir = cache_dir
+        self.schema_template = (
+            SchemaTemplate(base.metadata, cache_dir) if schema_template else None
+        )
+        self.on_profile = on_profile
+        self.record_queries = record_queries
+        self.seed_cache = SeedCache(seed_cache_bytes)
 
     @property
     def metadata(self) -> "MetaData":
@@ -96,55 +131,369 @@ class DBMock(Generic[BaseType]):
 
     @cached_property
     def orm_classes(self) -> dict[str, "type[BaseType]"]:
+        # subclasses of single table inheritance share their parent's table
         return {
             mapper.entity.__tablename__: mapper.entity
             for mapper in self.base.registry.mappers
+            if mapper.inherits is None
+            or mapper.local_table is not mapper.inherits.local_table
         }
 
     def from_dict(
-        self, data: dict[str, list[dict]]
-    ) -> "AbstractContextManager[MockDataInterface]":
+        self,
+        data: dict[str, list[dict]],
+        bulk: bool = False,
+        read_only: bool = False,
+        cached: bool = False,
+    ) -> "DataContext":
         """Mock multiple tables and their rows using a dictionary.
 
         Args:
         -----
         data (dict): Dictionary where the key is the table name and the value is
                      a list of rows (each row being a dictionary of column data).
+        bulk (bool): Whether to insert each table's rows with a single bulk
+                     INSERT ... RETURNING, in foreign key order, instead of going
+                     through the ORM unit of work. The rows are not passed to the
+                     ORM class constructors, so only column attributes are allowed.
+        read_only (bool): Whether to make the database read-only once seeded, see
+                          from_orm.
+        cached (bool): Whether to keep an in-memory image of the seeded database,
+                       keyed by a hash of the data and the schema, and copy it over
+                       the database when the same data is seeded again. The instances
+                       are then loaded back by primary key. Like from_file(cached=True)
+                       this only applies to a database without any row, in "snapshot"
+                       isolation with the "backup", "dump" or "swap" strategy. The
+                       data may only hold JSON values, dates, times, decimals, UUIDs,
+                       bytes and enums, see seed_cache.canonical_value.
 
         Returns:
         -------
-        ContextManager[MockedDataInterface]: Mocked data interface containing
-                                             created data by table and rows.
+        DataContext: The context manager, sync or async, yielding the mocked data
+                     interface containing created data by table and rows.
         """
-        instances = [
-            self.orm_classes[table_name](**row)
-            for table_name, rows in data.items()
-            for row in rows
-        ]
-        return self.from_orm(instances)
+        if cached:
+            seed = self.bulk_seed if bulk else self.build_and_seed
+            # the key is only computed once init_database has adapted the metadata
+            return self._from_seed(
+                lambda: self.seed_from_cache(
+                    seed_hash(self.template_key, data), lambda: seed(data)
+                ),
+                "from_dict",
+                read_only,
+            )
+        if bulk:
+            return self._from_seed(
+                lambda: self.bulk_seed_interface(data), "from_dict", read_only
+            )
+        return self.from_orm(self.build_instances(data), read_only=read_only)
 
     def from_file(
-        self, file_path: "Path | str"
-    ) -> "AbstractContextManager[MockDataInterface]":
+        self,
+        file_path: "Path | str",
+        cached: bool = False,
+        bulk: bool = False,
+        stream: bool = False,
+        read_only: bool = False,
+    ) -> "DataContext":
         """Load mock data for multiple tables from a JSON file and simulate
         relationships between tables.
 
         Args:
         -----
-        file_path (str): Path to the JSON file containing mock data for multiple tables.
+        file_path (str): Path to the JSON file containing mock data for multiple tables,
+                         or to a columnar fixture file converted from one (see
+                         columnar.py), which is always loaded like a streamed one.
+        cached (bool): Whether to compile the file once into a seeded template
+                       database, keyed by the schema and the file content, and load
+                       it natively afterwards, including in later pytest processes
+                       (e.g. every pytest-xdist worker). When the database holds no
+                       row yet, and the connection provider uses "snapshot" isolation
+                       with the "backup", "dump" or "swap" strategy, the template is
+                       copied over the whole database. Otherwise its rows are copied with
+                       ATTACH and INSERT ... SELECT, as long as the file's tables are
+                       empty, and the file is loaded as usual if they are not.
+                       Copied templates are also kept in memory, see from_dict.
+        bulk (bool): Whether to insert the rows in bulk, see from_dict.
+        stream (bool): Whether to parse the file incrementally and insert its rows in
+                       bulk, in batches of STREAM_BATCH_SIZE, so memory stays flat
+                       however large the file is. Rows are inserted in file order
+                       with foreign key checks deferred to the commit. The data
+                       interface only keeps the primary keys, and loads the instances
+                       of a table when it is first accessed. With AsyncDBMock in
+                       "savepoint" isolation the instances are loaded right away,
+                       since sync sessions cannot see the pinned async connection.
+        read_only (bool): Whether to make the database read-only once seeded, see
+                          from_orm.
 
         Returns:
         -------
-        ContextManager[MockedDataInterface]: Mocked data interface containing
-                                             created data by table and rows.
+        DataContext: The context manager, sync or async, yielding the mocked data
+                     interface containing created data by table and rows.
         """
+        stream = stream or columnar.is_columnar(file_path)
+        label = f"from_file({Path(file_path).name})"
+        if cached:
+            return self._from_seed(
+                lambda: self.seed_from_template(file_path, bulk, stream),
+                label,
+                read_only,
+            )
+        return self._from_seed(
+            lambda: self.seed_file(file_path, bulk, stream), label, read_only
+        )
+
+    @contextmanager
+    def recorded(
+        self, data: MockDataInterface, n_plus_one: "int | None" = None
+    ) -> "Generator[None, None, None]":
+        """Record the statements executed within into the queries of the data
+        interface, if the DBMock records queries, and check them for N+1 queries if
+        the detection is enabled, see Patches.detect_n_plus_one()."""
+        if n_plus_one is None:
+            n_plus_one = self.patches.n_plus_one_threshold
+        with queries.resume():
+            if n_plus_one is not None:
+                recorder: QueryRecorder = NPlusOneDetector(
+                    n_plus_one, self.patches.n_plus_one_action
+                )
+            elif self.record_queries:
+                recorder = QueryRecorder()
+            else:
+                yield
+                return
+
+            with self.connection_provider.record_queries(recorder):
+                data.queries = recorder
+                yield
+            if isinstance(recorder, NPlusOneDetector):
+                recorder.check()
+
+    def build_instances(self, data: dict[str, list[dict]]) -> list[BaseType]:
+        return [
+            self.orm_classes[table_name](**row)
+            for table_name, rows in data.items()
+            for row in rows
+        ]
+
+    def read_file(self, file_path: "Path | str") -> dict[str, list[dict]]:
         with open(file_path) as f:
-            data = json.load(f)
-        return self.from_dict(data)
+            return json.load(f)
+
+    def seed_template(self, file_path: "Path | str") -> SeedTemplate:
+        # the seeded rows also depend on the ORM code the instances go through
+        key = f"{self.template_key}:{mapper_hash(self.base.registry.mappers)}"
+        return SeedTemplate(key, file_path, self.cache_dir)
+
+    def bulk_statements(
+        self, data: dict[str, list[dict]]
+    ) -> "Iterator[tuple[ReturningInsert, list[dict]]]":
+        """Build the bulk INSERT ... RETURNING of each table, in foreign key order, see
+        DBMock.bulk_seed.
+
+        Args:
+            data (dict): The rows of each table, by table name.
+
+        Returns:
+            Iterator[tuple[ReturningInsert, list[dict]]]: Each statement and its rows.
+        """
+        # unknown tables raise a KeyError before anything is inserted
+        orm_classes = {table_name: self.orm_classes[table_name] for table_name in data}
+        for table in self.metadata.sorted_tables:
+            rows = data.get(table.name)
+            if not rows:
+                continue
+            orm_class = orm_classes[table.name]
+            yield (
+                insert(orm_class).returning(orm_class, sort_by_parameter_order=True),
+                rows,
+            )
+
+    def stream_statement(self, table_name: str) -> "ReturningInsert":
+        """Build the INSERT ... RETURNING the primary key of a table's streamed rows,
+        see DBMock.stream_seed."""
+        orm_class = self.orm_classes[table_name]
+        return insert(orm_class).returning(
+            *inspect(orm_class).primary_key, sort_by_parameter_order=True
+        )
+
+    def compile_fixture(
+        self,
+        seed_template: SeedTemplate,
+        file_path: "Path | str",
+        bulk: bool,
+        stream: bool,
+    ):
+        """Seed a throwaway database from the JSON file and save it as the file's seed
+        template, unless another process already did. The template is a plain SQLite
+        file, so a sync DBMock builds it, on a sync connection provider of its own,
+        for AsyncDBMock too.
+
+        Args:
+            seed_template (SeedTemplate): The seed template of the file.
+            file_path (Path | str): Path to the JSON file containing the mock data.
+            bulk (bool): Whether to insert the rows in bulk.
+            stream (bool): Whether to stream the file.
+        """
+        connection_provider = MockConnectionProvider(
+            pragmas=self.connection_provider.pragmas
+        )
+        compiler = DBMock(
+            self.base,
+            connection_provider,
+            Patches(),
+            schema_template=self.schema_template is not None,
+            cache_dir=self.cache_dir,
+        )
+        engine = connection_provider.get_engine()
+        try:
+            with seed_template.lock():
+                if seed_template.read_keys() is not None:
+                    return
+                compiler.init_database()
+                if stream:
+                    keys = compiler.seed_keys(file_path)
+                else:
+                    keys = instance_keys(compiler.seed_instances(file_path, bulk))
+                seed_template.save(engine, keys)
+        finally:
+            connection_provider.reset()
+            if engine.url.database:
+                Path(engine.url.database).unlink(missing_ok=True)
+
+    def accepts_seed_template(self, engine: "Engine") -> bool:
+        # copying a template replaces the whole database, which only the whole
+        # database snapshots survive, and only an empty database matches the template
+        if self.connection_provider.isolation != "snapshot" or (
+            self.connection_provider.snapshot_strategy not in ("backup", "dump", "swap")
+        ):
+            return False
+        with engine.connect() as conn:
+            return tables_are_empty(
+                conn, [table.name for table in self.metadata.sorted_tables]
+            )
+
+    @property
+    def template_key(self) -> str:
+        if self.schema_template is not None:
+            return self.schema_template.key
+        return metadata_hash(self.metadata)
+
+    def adapt_primary_keys(self):
+        for table in self.base.metadata.sorted_tables:
+            # note: addreses a limitation of SQLite in which Identity is not recognized as
+            # a column to auto generate values for. We must pass in autoincrement explicitly to achieve
+            # the same effect.
+            pk_columns = [c for c in table.columns if c.primary_key]
+            has_composite_pk = len(pk_columns) > 1
+
+            for column in table.columns:
+                if column.primary_key and column.type.python_type is int:
+                    # only set autoincrement=True if not a composite PK
+                    # sqlite does not support composite primary keys
+                    column.autoincrement = not has_composite_pk
+                    column.type = Integer()
+
+    @abstractmethod
+    def from_orm(
+        self,
+        instances: "Iterable[BaseType]",
+        n_plus_one: "int | None" = None,
+        read_only: bool = False,
+    ) -> "DataContext":
+        """Seed ORM instances, see DBMock.from_orm."""
+
+    @abstractmethod
+    def _from_seed(
+        self, seed: "Callable[[], Any]", label: str, read_only: bool = False
+    ) -> "DataContext":
+        """Open a context seeded by the seed function, see DBMock._from_seed."""
+
+    @abstractmethod
+    def build_and_seed(self, data: dict[str, list[dict]]) -> Any:
+        """Build the instances of the rows and seed them through the ORM."""
+
+    @abstractmethod
+    def bulk_seed(self, data: dict[str, list[dict]]) -> Any:
+        """Insert the rows in bulk, see DBMock.bulk_seed."""
+
+    @abstractmethod
+    def bulk_seed_interface(self, data: dict[str, list[dict]]) -> Any:
+        """Insert the rows in bulk, and wrap them in a data interface."""
+
+    @abstractmethod
+    def seed_file(self, file_path: "Path | str", bulk: bool, stream: bool) -> Any:
+        """Seed the rows of a JSON or columnar file, see DBMock.from_file."""
+
+    @abstractmethod
+    def seed_from_template(
+        self, file_path: "Path | str", bulk: bool = False, stream: bool = False
+    ) -> Any:
+        """Seed a file from its seed template, see DBMock.seed_from_template."""
+
+    @abstractmethod
+    def seed_from_cache(self, key: str, seed: "Callable[[], Any]") -> Any:
+        """Seed from the in-memory seed cache, see DBMock.seed_from_cache."""
+
+
+class DBMock(DBMockBase[BaseType, "AbstractContextManager[MockDataInterface]"]):
+    """A class that provides a mock interface for simulating interactions with
+    multiple database tables in unit tests.
+
+    This class validates the mocked data against the current state of the SQLAlchemy
+    schemas, ensuring that the mock data aligns with the actual table and column
+    definitions in the database models. The context managers returned by this class
+    can be scoped to the fixture they are provided in, ensuring that each test
+    maintains isolated and clean data. Different database data mocks can be applied
+    at different scopes and layers. For example, you can provide default data for
+    all tests, but within a test, apply additional data for a specific test function,
+    or for managing multiple data contexts within the same test.
+
+    Features:
+    ---------
+    - **Mock Data Across Tables**: Provides an interface to mock data for multiple
+      tables, validated against the current SQLAlchemy schemas.
+    - **Fixture Scoped Data**: The mocked data is scoped according to the fixture
+      (e.g., function, module) it is provided in, ensuring that each test maintains
+      isolated and clean data.
+    - **No External Resources**: Supports unit testing without needing separately
+      provisioned resources, such as a real database, allowing tests to run faster
+      and in isolation.
+    - **Foreign Key Support**: Allows defining foreign keys and creating rows across
+      related tables, ensuring that relationships between tables are respected in
+      the mock data.
+    - **Isolated Mock Instances**: Each mock instance maintains its own state,
+      allowing multiple test cases or fixtures to apply separate layers of data
+      without conflict.
+        - Example: You can have a default mock database state and apply additional
+          test-specific data layers that are cleaned up when out of scope.
+        - Limitation: Constraints across different mock instances will break. All
+          data related to a test must be created within a single mock instance to
+          remain isolated and valid.
+
+    Methods:
+    --------
+    from_dict(data: dict[str, list[dict]], bulk: bool = False,
+              read_only: bool = False, cached: bool = False):
+        Mocks multiple tables and their rows using a dictionary format, ensuring
+        data consistency with SQLAlchemy schemas.
+
+    from_orm(models: list[Base]):
+        Mocks multiple database tables using SQLAlchemy ORM model instances,
+        supporting relationships between tables and foreign keys.
+
+    from_file(file_path: Path | str, cached: bool = False, bulk: bool = False,
+              stream: bool = False, read_only: bool = False):
+        Loads mock data for multiple tables from a JSON file, simulating tables
+        with relationships, and bulk operations.
+    """
 
     @contextmanager
     def from_orm(
-        self, instances: "Iterable[BaseType]"
+        self,
+        instances: "Iterable[BaseType]",
+        n_plus_one: "int | None" = None,
+        read_only: bool = False,
     ) -> "Generator[MockDataInterface, None, None]":
         """Mock multiple database tables using SQLAlchemy ORM model instances.
 
@@ -152,6 +501,15 @@ class DBMock(Generic[BaseType]):
         -----
         instances (list): List of SQLAlchemy ORM model instances representing
                           rows in the database tables.
+        n_plus_one (int | None): How many executions of a SELECT from the same call
+                                 site the context tolerates, overriding
+                                 Patches.detect_n_plus_one().
+        read_only (bool): Whether to make the database read-only once seeded, with
+                          PRAGMA query_only, so that writes fail with an
+                          OperationalError. With the "backup" and "dump" strategies
+                          no snapshot is taken, and the seed's inserts are reverted
+                          on exit instead, unless the instances update existing
+                          rows.
 
         Returns:
         -------
@@ -159,53 +517,348 @@ class DBMock(Generic[BaseType]):
                                                     data interface containing
                                                     created data by table and rows.
         """
-        with self.patches:
-            self.init_database()
-            with Snapshot(self.connection_provider):
-                with self.connection_provider.get_session() as session:
-                    session.add_all(instances)
-                    session.commit()
-                    for instance in instances:
-                        session.refresh(instance)
+        with (
+            self.patches.route(self.connection_provider),
+            profiling.profiled("from_orm", self.on_profile),
+            queries.suspend(),
+        ):
+            with profiling.phase("init"):
+                self.init_database()
+            # a read-only context cannot revert a seed updating existing rows
+            inserts_only = not (read_only and revert.updates_rows(instances))
+            with self.isolate(read_only, inserts_only) as isolation:
+                with profiling.phase("seed"):
+                    self.seed(instances)
+                isolation.seeded()
 
                 db_mock_context: MockDataInterface = MockDataInterface(
                     instances=instances
                 )
-                yield db_mock_context
+                profiling.record_rows(db_mock_context)
+                with self.recorded(db_mock_context, n_plus_one):
+                    yield db_mock_context
+
+    @contextmanager
+    def _from_seed(
+        self,
+        seed: "Callable[[], MockDataInterface]",
+        label: str,
+        read_only: bool = False,
+    ) -> "Generator[MockDataInterface, None, None]":
+        with (
+            self.patches.route(self.connection_provider),
+            profiling.profiled(label, self.on_profile),
+            queries.suspend(),
+        ):
+            with profiling.phase("init"):
+                self.init_database()
+            with self.isolate(read_only) as isolation:
+                with profiling.phase("seed"):
+                    db_mock_context: MockDataInterface = seed()
+                isolation.seeded()
+                profiling.record_rows(db_mock_context)
+                with self.recorded(db_mock_context):
+                    yield db_mock_context
+
+    def build_and_seed(self, data: dict[str, list[dict]]) -> list[BaseType]:
+        instances = self.build_instances(data)
+        self.seed(instances)
+        return instances
+
+    def seed(self, instances: "Iterable[BaseType]"):
+        with self.connection_provider.get_session() as session:
+            session.add_all(instances)
+            session.commit()
+            # reload generated and server side values with a SELECT per table
+            with profiling.phase("refresh"):
+                load_instances(session, self.orm_classes, instance_keys(instances))
+
+    def bulk_seed(self, data: dict[str, list[dict]]) -> list[BaseType]:
+        """Insert the rows with one bulk INSERT ... RETURNING per table, in foreign
+        key order, and build the instances from the returned rows.
+
+        Args:
+            data (dict): The rows of each table, by table name.
+
+        Returns:
+            list[BaseType]: The inserted instances, with their generated values.
+        """
+        instances = []
+        with self.connection_provider.get_session() as session:
+            # the instances keep the values returned by the inserts
+            session.expire_on_commit = False
+            for statement, rows in self.bulk_statements(data):
+                instances.extend(session.scalars(statement, rows))
+            session.commit()
+        return instances
+
+    def bulk_seed_interface(self, data: dict[str, list[dict]]) -> MockDataInterface:
+        return MockDataInterface(instances=self.bulk_seed(data))
+
+    def stream_seed(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        """Insert the rows of a JSON file while it is parsed, in batches.
+
+        Args:
+            file_path (Path | str): Path to the JSON file containing the mock data.
+
+        Returns:
+            dict[str, list[tuple]]: The primary keys of the inserted rows, by table name.
+        """
+        keys: defaultdict[str, list[tuple]] = defaultdict(list)
+        with self.connection_provider.get_session() as session:
+            # rows come in file order, so foreign keys are only checked on commit
+            session.execute(text("PRAGMA defer_foreign_keys = ON"))
+            for table_name, rows in batched_rows(
+                iter_rows(file_path), STREAM_BATCH_SIZE
+            ):
+                statement = self.stream_statement(table_name)
+                keys[table_name].extend(map(tuple, session.execute(statement, rows)))
+            session.commit()
+        return dict(keys)
+
+    def columnar_seed(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        """Insert the rows of a columnar fixture file, see columnar.py.
+
+        Args:
+            file_path (Path | str): Path to the columnar fixture file.
+
+        Returns:
+            dict[str, list[tuple]]: The primary keys of the inserted rows, by table name.
+        """
+        with self.connection_provider.get_session() as session:
+            keys = columnar.load(session.connection(), file_path, self.metadata)
+            session.commit()
+        return keys
+
+    def seed_keys(self, file_path: "Path | str") -> dict[str, list[tuple]]:
+        if columnar.is_columnar(file_path):
+            return self.columnar_seed(file_path)
+        return self.stream_seed(file_path)
+
+    def seed_file(
+        self, file_path: "Path | str", bulk: bool, stream: bool
+    ) -> MockDataInterface:
+        if stream:
+            return self.lazy_interface(self.seed_keys(file_path))
+        return MockDataInterface(instances=self.seed_instances(file_path, bulk))
+
+    def seed_instances(self, file_path: "Path | str", bulk: bool) -> list[BaseType]:
+        data = self.read_file(file_path)
+        if bulk:
+            return self.bulk_seed(data)
+        instances = self.build_instances(data)
+        self.seed(instances)
+        return instances
+
+    def lazy_interface(self, keys: dict[str, list[tuple]]) -> LazyMockDataInterface:
+        return LazyMockDataInterface(
+            keys, self.orm_classes, self.connection_provider.get_session
+        )
+
+    def seed_from_template(
+        self, file_path: "Path | str", bulk: bool = False, stream: bool = False
+    ) -> MockDataInterface:
+        """Seed the database from a JSON file through its seed template, see from_file.
+
+        Args:
+            file_path (Path | str): Path to the JSON file containing the mock data.
+            bulk (bool): Whether to insert the rows in bulk when the template is built.
+            stream (bool): Whether to stream the file when the template is built, and
+                           to load the instances lazily.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        engine = self.connection_provider.get_engine()
+        if not self.accepts_seed_template(engine):
+            return self.seed_from_fixture(file_path, bulk, stream)
+
+        seed_template = self.seed_template(file_path)
+        state = self.seed_cache.get(seed_template.key)
+        if state is not None:
+            state.load(engine)
+            keys = state.keys
+        else:
+            # the first pytest-xdist worker seeds the template, the others wait and
+            # copy it
+            with seed_template.lock():
+                template_keys = seed_template.load(engine)
+                if template_keys is None and not stream:
+                    instances = self.seed_instances(file_path, bulk)
+                    keys = instance_keys(instances)
+                    seed_template.save(engine, keys)
+                    self.seed_cache.save(seed_template.key, engine, keys)
+                    return MockDataInterface(instances=instances)
+                if template_keys is None:
+                    keys = self.seed_keys(file_path)
+                    seed_template.save(engine, keys)
+                else:
+                    keys = template_keys
+            self.seed_cache.save(seed_template.key, engine, keys)
+
+        if stream:
+            return self.lazy_interface(keys)
+        with (
+            profiling.phase("refresh"),
+            self.connection_provider.get_session() as session,
+        ):
+            return MockDataInterface(
+                instances=load_instances(session, self.orm_classes, keys)
+            )
+
+    def seed_from_cache(
+        self, key: str, seed: "Callable[[], list[BaseType]]"
+    ) -> MockDataInterface:
+        """Seed the database from the seed cache, see from_dict.
+
+        Args:
+            key (str): The seed hash, see seed_hash.
+            seed (Callable[[], list[BaseType]]): Seeds the data, when it is not cached
+                                                 or cannot be copied.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        engine = self.connection_provider.get_engine()
+        if self.seed_cache.budget <= 0 or not self.accepts_seed_template(engine):
+            return MockDataInterface(instances=seed())
+
+        state = self.seed_cache.get(key)
+        if state is None:
+            instances = seed()
+            self.seed_cache.save(key, engine, instance_keys(instances))
+            return MockDataInterface(instances=instances)
+
+        state.load(engine)
+        with (
+            profiling.phase("refresh"),
+            self.connection_provider.get_session() as session,
+        ):
+            return MockDataInterface(
+                instances=load_instances(session, self.orm_classes, state.keys)
+            )
+
+    def seed_from_fixture(
+        self, file_path: "Path | str", bulk: bool = False, stream: bool = False
+    ) -> MockDataInterface:
+        """Seed the database by copying the rows of the JSON file's seed template,
+        compiled first if needed, see from_file.
+
+        Args:
+            file_path (Path | str): Path to the JSON file containing the mock data.
+            bulk (bool): Whether to insert the rows in bulk when the template is built.
+            stream (bool): Whether to stream the file when the template is built, and
+                           to load the instances lazily.
+
+        Returns:
+            MockDataInterface: The seeded data.
+        """
+        seed_template = self.seed_template(file_path)
+        if seed_template.read_keys() is None:
+            self.compile_fixture(seed_template, file_path, bulk, stream)
+
+        keys = self.copy_fixture(seed_template)
+        if keys is None:
+            return self.seed_file(file_path, bulk, stream)
+        if stream:
+            return self.lazy_interface(keys)
+        with (
+            profiling.phase("refresh"),
+            self.connection_provider.get_session() as session,
+        ):
+            return MockDataInterface(
+                instances=load_instances(session, self.orm_classes, keys)
+            )
+
+    def copy_fixture(
+        self, seed_template: SeedTemplate
+    ) -> "dict[str, list[tuple]] | None":
+        """Copy the rows of a seed template into the database, see
+        SeedTemplate.copy_rows.
+
+        Args:
+            seed_template (SeedTemplate): The compiled fixture file.
+
+        Returns:
+            dict[str, list[tuple]] | None: The primary keys of the copied rows by table
+                                           name, or None when nothing was copied.
+        """
+        if self.connection_provider.isolation == "savepoint":
+            # the Savepoint of the db_mock context covers the copy
+            conn = self.connection_provider.get_connection()
+            return seed_template.copy_rows(conn, self.metadata)
+
+        with self.connection_provider.get_engine().connect() as conn:
+            keys = seed_template.copy_rows(conn, self.metadata)
+            conn.commit()
+            detach(conn, seed_template.alias)
+        return keys
+
+    def isolate(
+        self, read_only: bool = False, inserts_only: bool = True
+    ) -> "AbstractContextManager":
+        """Create the context manager that isolates a db_mock context, according to
+        the connection provider's isolation mode.
+
+        Args:
+        -----
+        read_only (bool): Whether to make the database read-only once seeded.
+        inserts_only (bool): Whether the seed is expected to only run INSERTs, see
+                             Snapshot.
+
+        Returns:
+        -------
+        ContextManager: Savepoint in "savepoint" isolation, Snapshot otherwise.
+        """
+        if self.connection_provider.isolation == "savepoint":
+            return Savepoint(self.connection_provider, read_only)
+        return Snapshot(self.connection_provider, read_only, inserts_only)
 
     def init_database(self):
-        if self.database_initialized:
+        # each database of a PooledConnectionProvider is initialized on first use
+        engine = self.connection_provider.get_engine()
+        if engine in self.initialized_engines:
             return
 
+        self.adapt_primary_keys()
+
+        if self.schema_template is None:
+            self.create_tables(engine)
+        else:
+            # the first pytest-xdist worker builds the template, the others wait and
+            # copy it
+            with self.schema_template.lock():
+                if not self.schema_template.load(engine) and self.create_tables(engine):
+                    self.schema_template.save(engine)
+
+        self.initialized_engines.add(engine)
+
+    def create_tables(self, engine: "Engine") -> bool:
+        """Create the missing tables and their indexes.
+
+        Args:
+            engine (Engine): The (sync) engine of the mocked database.
+
+        Returns:
+            bool: Whether the whole schema was built from scratch.
+        """
         tables_to_create = set()
 
-        engine = self.connection_provider.get_engine()
         inspection = inspect(engine)
 
         for table in self.base.metadata.sorted_tables:
             if not inspection.has_table(table.name, schema=table.schema):
                 tables_to_create.add(table)
 
-            # note: addreses a limitation of SQLite in which Identity is not recognized as
-            # a column to auto generate values for. We must pass in autoincrement explicitly to achieve
-            # the same effect.
-            pk_columns = [c for c in table.columns if c.primary_key]
-            has_composite_pk = len(pk_columns) > 1
-
-            for column in table.columns:
-                if column.primary_key and column.type.python_type is int:
-                    # only set autoincrement=True if not a composite PK
-                    # sqlite does not support composite primary keys
-                    column.autoincrement = not has_composite_pk
-                    column.type = Integer()
-
         for table_to_create in tables_to_create:
             indexes_with_postgresql_where = []
             indexes_to_remove = []
 
             for index in list(table_to_create.indexes):
                 if index.name and hasattr(index, "dialect_options"):
-                    postgresql_opts = index.dialect_options.get("postgresql", {})
+                    postgresql_opts: Mapping[str, Any] = index.dialect_options.get(
+                        "postgresql", {}
+                    )
                     postgresql_where = postgresql_opts.get("where")
                     if postgresql_where is not None:
                         indexes_with_postgresql_where.append((index, postgresql_where))
@@ -238,4 +891,5 @@ class DBMock(Generic[BaseType]):
                         # Silently continue as the index may have been created by table.create()
                         pass
 
-        self.database_initialized = True
+        # only a schema built from scratch is a valid template
+        return len(tables_to_create) == len(self.base.metadata.sorted_tables)
@@ -0,0 +1,200 @@
+"""Incremental reader for JSON fixture files.
+
+Fixture files map table names to lists of rows::
+
+    {"human": [{"name": "John"}, ...], "pet": [...]}
+
+iter_rows() walks that structure with a bounded buffer and decodes one row at a
+time with json.JSONDecoder.raw_decode, so memory does not grow with the file size.
+
+Not meant for public use.
+"""
+
+import json
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from pathlib import Path
+    from typing import TextIO
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStream:
+    """A read buffer over a text file, decoding one JSON value or token at a time.
+
+    Attributes:
+        file (TextIO): The file being read.
+        chunk_size (int): How many characters are read at once.
+        buffer (str): The characters read but not consumed yet, from pos on.
+        pos (int): The position of the next character to consume in buffer.
+        eof (bool): Whether the whole file has been read.
+        decoder (json.JSONDecoder): Decodes the values found in the buffer.
+    """
+
+    if TYPE_CHECKING:
+        file: TextIO
+        chunk_size: int
+        buffer: str
+        pos: int
+        eof: bool
+        decoder: json.JSONDecoder
+
+    def __init__(self, file: "TextIO", chunk_size: int = 1 << 16):
+        """Initialize a new JSONStream instance.
+
+        Args:
+            file (TextIO): The file to read.
+            chunk_size (int): How many characters to read at once.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        """Read the next chunk, dropping the consumed part of the buffer.
+
+        Returns:
+            bool: Whether anything was read.
+        """
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it.
+
+        Returns:
+            str: The next character, or "" at the end of the file.
+
+        Raises:
+            ValueError: If the whitespace cannot be matched, which the pattern always
+                        does, if only with an empty match.
+        """
+        while True:
+            match = WHITESPACE.match(self.buffer, self.pos)
+            if match is None:
+                raise ValueError(f"No whitespace match at position {self.pos}")
+            self.pos = match.end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of the given ones.
+
+        Args:
+            chars (str): The allowed characters.
+
+        Returns:
+            str: The consumed character.
+
+        Raises:
+            json.JSONDecodeError: If the next character is not allowed.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting one of {chars!r}", self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def decode(self) -> object:
+        """Decode the next JSON value, reading more of the file until it is complete.
+
+        Returns:
+            object: The decoded value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number could go on in the next chunk
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_rows(
+    file_path: "Path | str", chunk_size: int = 1 << 16
+) -> "Iterator[tuple[str, dict]]":
+    """Iterate over the rows of a fixture file, in file order.
+
+    Args:
+        file_path (Path | str): The JSON fixture file.
+        chunk_size (int): How many characters to read at once.
+
+    Returns:
+        Iterator[tuple[str, dict]]: The table name and the data of each row.
+
+    Raises:
+        json.JSONDecodeError: If the file does not map table names to lists of rows.
+    """
+    with open(file_path, encoding="utf-8") as f:
+        stream = JSONStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+
+        while True:
+            table_name = stream.decode()
+            if not isinstance(table_name, str):
+                raise json.JSONDecodeError(
+                    "Expecting a table name", stream.buffer, stream.pos
+                )
+            stream.expect(":")
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    row = stream.decode()
+                    if not isinstance(row, dict):
+                        raise json.JSONDecodeError(
+                            "Expecting a row object", stream.buffer, stream.pos
+                        )
+                    yield table_name, row
+                    if stream.expect(",]") == "]":
+                        break
+            if stream.expect(",}") == "}":
+                return
+
+
+def batched_rows(
+    rows: "Iterable[tuple[str, dict]]", batch_size: int
+) -> "Iterator[tuple[str, list[dict]]]":
+    """Group consecutive rows of the same table into batches.
+
+    Args:
+        rows (Iterable[tuple[str, dict]]): The table name and the data of each row.
+        batch_size (int): The maximum number of rows in a batch.
+
+    Returns:
+        Iterator[tuple[str, list[dict]]]: The table name and the rows of each batch.
+    """
+    table_name = ""
+    batch: list[dict] = []
+    for row_table_name, row in rows:
+        if batch and (row_table_name != table_name or len(batch) >= batch_size):
+            yield table_name, batch
+            batch = []
+        table_name = row_table_name
+        batch.append(row)
+    if batch:
+        yield table_name, batch
@@ -0,0 +1,145 @@
+import os
+import sys
+import sysconfig
+import warnings
+from collections import defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import sqlalchemy
+
+from .queries import QueryRecorder, normalize
+
+if TYPE_CHECKING:
+    from types import FrameType
+
+    from .types import NPlusOneAction
+
+# frames of SQLAlchemy, sqlamock and the standard library are not call sites, only
+# the code calling into them
+_PACKAGE_PATHS = (
+    str(Path(sqlalchemy.__file__).parent) + os.sep,
+    str(Path(__file__).parent) + os.sep,
+)
+_STDLIB_PATH = sysconfig.get_paths()["stdlib"] + os.sep
+_SITE_PACKAGES_PATHS = (
+    sysconfig.get_paths()["purelib"] + os.sep,
+    sysconfig.get_paths()["platlib"] + os.sep,
+)
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a db_mock context runs the same SELECT too many times."""
+
+
+class NPlusOneWarning(UserWarning):
+    """Warned when a db_mock context runs the same SELECT too many times."""
+
+
+def is_library_frame(filename: str) -> bool:
+    return (
+        filename.startswith(("<", *_PACKAGE_PATHS))
+        or filename.startswith(_STDLIB_PATH)
+        and not filename.startswith(_SITE_PACKAGES_PATHS)
+    )
+
+
+def call_site() -> "str | None":
+    """Find the code that executed the current statement, outside of SQLAlchemy,
+    sqlamock and the standard library.
+
+    Async sessions run the ORM in a greenlet, whose stack ends there, so the search
+    goes on with the stack of the parent greenlet that awaited it.
+
+    Returns:
+        str | None: The file name and line number of the call site, if found.
+    """
+    try:
+        from greenlet import getcurrent
+    except ImportError:  # pragma: no cover - greenlet ships with the async extra
+        current = None
+    else:
+        current = getcurrent()
+
+    frame: "FrameType | None" = sys._getframe(1)
+    while True:
+        while frame is not None:
+            if not is_library_frame(frame.f_code.co_filename):
+                return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+            frame = frame.f_back
+        current = current.parent if current is not None else None
+        if current is None:
+            return None
+        frame = current.gr_frame
+
+
+class NPlusOneDetector(QueryRecorder):
+    """Records the statements of a db_mock context like QueryRecorder, and flags the
+    SELECTs run more than a threshold number of times from the same call site, the
+    trace left by lazy loading a relationship in a loop.
+
+    Attributes:
+        statements (dict[str, QueryStats]): The statistics of each normalized
+                                            statement, see QueryRecorder.
+        threshold (int): How many executions of a SELECT from the same call site are
+                         tolerated.
+        action (str): "raise" to raise NPlusOneError, or "warn" to warn
+                      NPlusOneWarning, in check().
+        selects (dict[tuple[str, str | None], int]): How many times each normalized
+                                                     SELECT ran, by call site.
+    """
+
+    if TYPE_CHECKING:
+        threshold: int
+        action: NPlusOneAction
+        selects: defaultdict[tuple[str, str | None], int]
+
+    def __init__(self, threshold: int, action: "NPlusOneAction" = "raise"):
+        # counting the statements is enough, their rows are left unbuffered
+        super().__init__(count_rows=False)
+        self.threshold = threshold
+        self.action = action
+        self.selects = defaultdict(int)
+
+    def record(self, statement: str, duration: float, rows: int):
+        super().record(statement, duration, rows)
+        normalized = normalize(statement)
+        if normalized.upper().startswith("SELECT"):
+            self.selects[normalized, call_site()] += 1
+
+    def clear(self):
+        super().clear()
+        self.selects.clear()
+
+    def offenders(self) -> "list[tuple[str, str | None, int]]":
+        """List the SELECTs run more than threshold times from the same call site.
+
+        Returns:
+            list[tuple[str, str | None, int]]: The normalized statement, call site and
+                                               execution count of each offender.
+        """
+        return [
+            (statement, site, count)
+            for (statement, site), count in self.selects.items()
+            if count > self.threshold
+        ]
+
+    def check(self):
+        """Raise NPlusOneError, or warn NPlusOneWarning, if any SELECT ran more than
+        threshold times from the same call site.
+
+        Raises:
+            NPlusOneError: If the action is "raise" and there are offenders.
+        """
+        offenders = self.offenders()
+        if not offenders:
+            return
+
+        message = "N+1 queries detected:" + "".join(
+            f"\n  {count} x {statement!r} from {site or 'an unknown call site'}"
+            for statement, site, count in offenders
+        )
+        if self.action == "warn":
+            warnings.warn(message, NPlusOneWarning, stacklevel=2)
+        else:
+            raise NPlusOneError(message)
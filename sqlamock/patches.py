@@ -1,4 +1,5 @@
-from contextlib import ExitStack
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
 from threading import Lock
 from typing import TYPE_CHECKING
 from unittest.mock import patch
@@ -6,10 +7,20 @@ from unittest.mock import patch
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql.sqltypes import Enum
 
+from .async_connection_provider import MockAsyncConnectionProvider
+
 if TYPE_CHECKING:
+    from collections.abc import Iterator
     from contextlib import AbstractContextManager
     from typing import Self
 
+    from sqlalchemy import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+    from sqlalchemy.orm import Session
+
+    from .connection_provider import MockConnectionProvider
+    from .types import NPlusOneAction
+
 
 def mock_enum():
     original = Enum._object_value_for_elem
@@ -37,15 +48,27 @@ class Patches(ExitStack):
     It can handle nested contexts safely using an internal lock and counter, applying patches only once when the first context is entered,
     and restoring them when the final context is exited.
 
+    db_mock contexts also route get_session(), get_engine() and their async counterparts to their connection provider,
+    per thread and asyncio task. Patching a session or engine factory with them, rather than with the methods of one
+    provider, lets concurrent contexts of different providers share the same process-wide patches.
+
     Attributes:
         patches (list[AbstractContextManager]): A list of additional patches added by the user.
         counter (int): Tracks the number of active contexts to control the application and restoration of patches.
+        routes (ContextVar[tuple[MockConnectionProvider, ...]]): The providers of the db_mock contexts entered in the
+                                                                 current thread or task, innermost last.
+        n_plus_one_threshold (int | None): How many executions of a SELECT from the same call site db_mock contexts
+                                           tolerate, see detect_n_plus_one(). None disables the detection.
+        n_plus_one_action (str): "raise" or "warn", see detect_n_plus_one().
     """
 
     if TYPE_CHECKING:
         _lock: Lock
         patches: list[AbstractContextManager]
         counter: int
+        routes: ContextVar[tuple[MockConnectionProvider, ...]]
+        n_plus_one_threshold: int | None
+        n_plus_one_action: NPlusOneAction
 
     def __init__(self, *args, **kwargs):
         """Initializes the Patches context manager.
@@ -57,6 +80,9 @@ class Patches(ExitStack):
         self._lock = Lock()
         self.patches = [mock_enum()]
         self.counter = 0
+        self.routes = ContextVar(f"sqlamock_routes_{id(self)}", default=())
+        self.n_plus_one_threshold = None
+        self.n_plus_one_action = "raise"
 
     def add_patch(self, patch: "AbstractContextManager"):
         """Adds an additional patch to be applied within the db_mock context.
@@ -71,6 +97,20 @@ class Patches(ExitStack):
         """
         self.patches.append(patch)
 
+    def detect_n_plus_one(self, threshold: int = 5, action: "NPlusOneAction" = "raise"):
+        """Flag the SELECTs that db_mock contexts run more than threshold times from the same call site, the trace
+        left by lazy loading a relationship in a loop, see n_plus_one.py.
+
+        The statements are checked when each context exits, once seeded, unless the context exits with an exception.
+        from_orm(n_plus_one=...) overrides the threshold of a context.
+
+        Args:
+            threshold (int): How many executions of a SELECT from the same call site are tolerated.
+            action (str): "raise" to raise NPlusOneError, or "warn" to warn NPlusOneWarning.
+        """
+        self.n_plus_one_threshold = threshold
+        self.n_plus_one_action = action
+
     def __enter__(self) -> "Self":
         """db_mock manages opening and closing Patches context, to apply the patches alongside the db_mock context.
 
@@ -95,3 +135,85 @@ class Patches(ExitStack):
             self.counter -= 1
             if self.counter == 0:
                 super().__exit__(*args, **kwargs)
+
+    @contextmanager
+    def route(self, connection_provider: "MockConnectionProvider") -> "Iterator[Self]":
+        """Apply the patches, and route the factories below to the given provider in the
+        current thread or asyncio task.
+
+        Args:
+            connection_provider (MockConnectionProvider): The provider of the db_mock context.
+
+        Yields:
+            Patches: The current instance of Patches, with patches applied.
+        """
+        with self:
+            self.routes.set((*self.routes.get(), connection_provider))
+            try:
+                yield self
+            finally:
+                # async fixtures may exit in another task than they entered, so the
+                # route is popped from the current context rather than reset
+                routes = self.routes.get()
+                if routes and routes[-1] is connection_provider:
+                    self.routes.set(routes[:-1])
+
+    def connection_provider(self) -> "MockConnectionProvider":
+        """Get the provider of the innermost db_mock context of the current thread or
+        task.
+
+        Threads started by the code under test do not inherit the context of the
+        thread starting them, unless run in a copy of it, see contextvars.copy_context().
+        Guessing their provider among the contexts of other threads could hand them
+        another test's database, so they get none.
+
+        Returns:
+            MockConnectionProvider: The connection provider.
+
+        Raises:
+            LookupError: If no db_mock context was entered in the current thread or task.
+        """
+        routes = self.routes.get()
+        if not routes:
+            raise LookupError(
+                "No db_mock context is active in this thread or task, run threads "
+                "started within one in a copy of its context, see "
+                "contextvars.copy_context()"
+            )
+        return routes[-1]
+
+    def get_session(self, *args, **kwargs) -> "Session":
+        """Session factory to patch in, see connection_provider()."""
+        return self.connection_provider().get_session()
+
+    def get_engine(self, *args, **kwargs) -> "Engine":
+        """Engine factory to patch in, see connection_provider()."""
+        return self.connection_provider().get_engine()
+
+    def async_connection_provider(self) -> MockAsyncConnectionProvider:
+        """Get the provider of the innermost db_mock context of the current thread or
+        task, for the async factories, see connection_provider().
+
+        Returns:
+            MockAsyncConnectionProvider: The connection provider.
+
+        Raises:
+            LookupError: If no db_mock context was entered in the current thread or task.
+            TypeError: If the innermost context's provider has no async engine, i.e. it
+                       is not a MockAsyncConnectionProvider.
+        """
+        connection_provider = self.connection_provider()
+        if not isinstance(connection_provider, MockAsyncConnectionProvider):
+            raise TypeError(
+                f"The db_mock context's {type(connection_provider).__name__} has no "
+                "async engine, use a MockAsyncConnectionProvider with AsyncDBMock"
+            )
+        return connection_provider
+
+    def get_async_session(self, *args, **kwargs) -> "AsyncSession":
+        """Async session factory to patch in, see async_connection_provider()."""
+        return self.async_connection_provider().get_async_session()
+
+    def get_async_engine(self, *args, **kwargs) -> "AsyncEngine":
+        """Async engine factory to patch in, see async_connection_provider()."""
+        return self.async_connection_provider().get_async_engine()
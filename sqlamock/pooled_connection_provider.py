@@ -0,0 +1,295 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import TYPE_CHECKING, cast
+
+from .connection_provider import MockConnectionProvider, sqlite_connection
+
+if TYPE_CHECKING:
+    import sqlite3
+    from collections.abc import Iterator
+
+    from sqlalchemy import Connection, Engine
+    from sqlalchemy.orm import Session
+
+    from .queries import QueryRecorder
+    from .revert import Marks
+    from .types import IsolationMode, PragmaProfile, SnapshotStrategy
+
+
+def copy_database(source: "Engine", target: "Engine"):
+    """Copy the source engine's database over the target engine's database with the
+    SQLite online backup API."""
+    with source.connect() as source_conn, target.connect() as target_conn:
+        sqlite_connection(source_conn).backup(sqlite_connection(target_conn))
+
+
+class PooledConnectionProvider(MockConnectionProvider):
+    """A connection provider handing each thread, or asyncio task, its own database.
+
+    Outside of worker(), it behaves like MockConnectionProvider on a template database:
+    session-level data seeded there is shared by every worker. Within worker(), the
+    provider routes get_engine(), get_session() and get_connection() to a database
+    checked out of the pool, so tests running concurrently in one process neither
+    share a SQLite file nor each other's snapshots. Patches that point at
+    get_session() route to the caller's database the same way.
+
+    A pooled database is cloned from the template the first time it is checked out,
+    and goes back to the pool when its worker exits, for the next worker to reuse.
+    Workers must leave their db_mock contexts before exiting, so that the database
+    is back to the state it was cloned at. It is cloned again on checkout whenever
+    the template changed since, e.g. once session-level data is seeded or restored
+    there, see template_version(). Under "savepoint" isolation, the template's
+    session-level data is never committed, so workers do not see it, and are only
+    cloned once.
+
+    Attributes:
+        idle (list[MockConnectionProvider]): The pooled databases not checked out.
+        cloned (dict[MockConnectionProvider, tuple[int, ...] | None]): The template's
+            version each pooled database was cloned at, None for an unused template.
+        current (ContextVar[MockConnectionProvider | None]): The database of the
+                                                             current worker.
+    """
+
+    if TYPE_CHECKING:
+        _lock: Lock
+        idle: list[MockConnectionProvider]
+        cloned: dict[MockConnectionProvider, tuple[int, ...] | None]
+        current: ContextVar[MockConnectionProvider | None]
+
+    def __init__(
+        self,
+        engine_kwargs: dict | None = None,
+        snapshot_strategy: "SnapshotStrategy" = "backup",
+        isolation: "IsolationMode" = "snapshot",
+        in_memory: bool = False,
+        pragmas: "PragmaProfile | dict[str, str | int] | None" = "fast",
+    ):
+        """Initialize a new PooledConnectionProvider instance.
+
+        Args:
+            engine_kwargs (dict | None): Additional keyword arguments to pass to create_engine.
+            snapshot_strategy (str): "backup" (default), "dump", "copy_on_write" or
+                                     "swap", see MockConnectionProvider.
+            isolation (str): "snapshot" (default) or "savepoint", see MockConnectionProvider.
+            in_memory (bool): Whether to keep the databases in memory, see
+                              MockConnectionProvider.
+            pragmas (str | dict | None): "fast" (default), a dict of PRAGMA values by
+                                         name, or None, see MockConnectionProvider.
+        """
+        super().__init__(
+            engine_kwargs, snapshot_strategy, isolation, in_memory, pragmas
+        )
+        self._lock = Lock()
+        self.idle = []
+        self.cloned = {}
+        self.current = ContextVar(f"sqlamock_worker_{id(self)}", default=None)
+
+    def new_worker(self) -> MockConnectionProvider:
+        """Create the provider of a new pooled database, with the same settings.
+
+        Returns:
+            MockConnectionProvider: The provider of the pooled database.
+        """
+        return MockConnectionProvider(
+            self.engine_kwargs,
+            self.snapshot_strategy,
+            self.isolation,
+            self.in_memory,
+            self.pragmas,
+        )
+
+    @contextmanager
+    def worker(self) -> "Iterator[MockConnectionProvider]":
+        """Check a database out of the pool for the current thread or asyncio task.
+
+        Yields:
+            MockConnectionProvider: The provider of the checked out database.
+        """
+        with self._lock:
+            provider = self.idle.pop() if self.idle else None
+            version = self.template_version()
+            # the pinned connection of "savepoint" isolation would block the copy
+            stale = provider is None or (
+                self.isolation == "snapshot" and self.cloned.get(provider) != version
+            )
+        if provider is None:
+            provider = self.new_worker()
+        if stale and version is not None:
+            # an unused template is empty, and DBMock initializes each database
+            copy_database(super().get_engine(), provider.get_engine())
+        with self._lock:
+            self.cloned[provider] = version
+
+        token = self.current.set(provider)
+        try:
+            yield provider
+        finally:
+            self.current.reset(token)
+            with self._lock:
+                self.idle.append(provider)
+
+    def template_version(self) -> tuple[int, ...] | None:
+        """Read the version of the template, whichever worker is current.
+
+        The data version only tells about changes committed by other connections, so
+        the changes made by the watcher connection itself, e.g. when a snapshot
+        reverts a seed, are counted as well.
+
+        Returns:
+            tuple[int, ...] | None: The watcher connection's number, the data version
+                                    and the watcher connection's total changes, or
+                                    None while the template is unused.
+        """
+        if self.engine is None:
+            return None
+        conn = super().get_watcher_connection()
+        [(version,)] = conn.execute("PRAGMA data_version").fetchall()
+        return self.watchers, version, conn.total_changes
+
+    def _target(self) -> MockConnectionProvider:
+        """The provider of the current worker's database, or the template's methods,
+        for the methods below to delegate to.
+
+        Returns:
+            MockConnectionProvider: The current worker's provider, or this provider as
+                                    a MockConnectionProvider, i.e. the template.
+        """
+        provider = self.current.get()
+        if provider is None:
+            return cast(MockConnectionProvider, super())
+        return provider
+
+    def get_engine(self) -> "Engine":
+        """Get the engine of the current worker's database, or of the template.
+
+        Returns:
+            Engine: A SQLAlchemy engine instance.
+        """
+        return self._target().get_engine()
+
+    def get_connection(self) -> "Connection":
+        """Get the connection pinned for "savepoint" isolation on the current worker's
+        database, or on the template.
+
+        Returns:
+            Connection: The pinned SQLAlchemy connection.
+        """
+        return self._target().get_connection()
+
+    def set_query_only(self, enabled: bool) -> bool:
+        """Make the current worker's database, or the template, read-only or writable
+        again, see MockConnectionProvider.
+
+        Args:
+            enabled (bool): Whether writes must fail.
+
+        Returns:
+            bool: Whether they failed before, to switch back to.
+        """
+        return self._target().set_query_only(enabled)
+
+    def get_watcher_connection(self) -> "sqlite3.Connection":
+        """Get the watcher connection of the current worker's database, or of the
+        template, see MockConnectionProvider.
+
+        Returns:
+            sqlite3.Connection: The watcher connection.
+        """
+        return self._target().get_watcher_connection()
+
+    def data_version(self) -> tuple[int, int]:
+        """Read the data version of the current worker's database, or of the template,
+        see MockConnectionProvider.
+
+        Returns:
+            tuple[int, int]: The watcher connection's number and the data version.
+        """
+        return self._target().data_version()
+
+    def watch_inserts(self, marks: "Marks"):
+        """Watch the statements run on the current worker's database, or on the
+        template, see MockConnectionProvider.
+
+        Args:
+            marks (Marks): The marks of a context about to be seeded.
+        """
+        self._target().watch_inserts(marks)
+
+    def unwatch_inserts(self, marks: "Marks"):
+        self._target().unwatch_inserts(marks)
+
+    def locked(self, writes_only: bool = False) -> bool:
+        """Tell whether another connection holds a lock on the current worker's
+        database, or on the template, see MockConnectionProvider.
+
+        Args:
+            writes_only (bool): Only tell about pending writes.
+
+        Returns:
+            bool: Whether the lock was still held after WATCHER_TIMEOUT.
+        """
+        return self._target().locked(writes_only)
+
+    def replace_database(self):
+        """Move the current worker, or the template, to a new database, see
+        MockConnectionProvider. The other pooled databases are kept.
+        """
+        # resets the template alone, unlike reset() outside of a worker
+        self._target().reset()
+
+    def copy_on_write_database(self) -> str:
+        """Get the "copy_on_write" bookkeeping database of the current worker, or of
+        the template, see MockConnectionProvider.
+
+        Returns:
+            str: The URI of a named in-memory database, or a file name.
+        """
+        return self._target().copy_on_write_database()
+
+    def swap_database(self, file_name: str):
+        """Replace the current worker's database file, or the template's, see
+        MockConnectionProvider.
+
+        Args:
+            file_name (str): The replacing SQLite file, moved into place.
+        """
+        self._target().swap_database(file_name)
+
+    def get_session(self) -> "Session":
+        """Create a new SQLAlchemy session on the current worker's database, or on the
+        template.
+
+        Returns:
+            Session: A new SQLAlchemy session instance.
+        """
+        return self._target().get_session()
+
+    @contextmanager
+    def record_queries(
+        self, recorder: "QueryRecorder | None" = None
+    ) -> "Iterator[QueryRecorder]":
+        """Record the statements executed on the current worker's database, or on the
+        template, see MockConnectionProvider.
+
+        Yields:
+            QueryRecorder: The count, time and rows of each normalized statement.
+        """
+        with self._target().record_queries(recorder) as recorder:
+            yield recorder
+
+    def reset(self):
+        """Reset the current worker's database, or the template and every pooled
+        database.
+        """
+        provider = self.current.get()
+        if provider is not None:
+            provider.reset()
+            return
+
+        super().reset()
+        with self._lock:
+            idle, self.idle = self.idle, []
+            self.cloned.clear()
+        for provider in idle:
+            provider.reset()
@@ -0,0 +1,148 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+    from .data_interface import MockDataInterface
+
+# callbacks notified of every profiled db_mock context, e.g. by the pytest plugin
+hooks: "list[Callable[[ContextProfile], None]]" = []
+
+# what opens db_mock contexts at the moment, e.g. the running pytest test or fixture
+owner: "str | None" = None
+
+# the profile of the innermost db_mock context of the current thread or task
+current: "ContextVar[ContextProfile | None]" = ContextVar(
+    "sqlamock_profile", default=None
+)
+
+
+class ContextProfile:
+    """The timings of one db_mock context.
+
+    Phases are timed from the outside of the context, so the time spent within it,
+    by the test, is not part of any phase:
+
+    - "init": init_database, building or copying the schema on first use.
+    - "snapshot": capturing the database state, or opening the savepoint.
+    - "seed": inserting the rows.
+    - "refresh": reloading the inserted instances, for generated values.
+    - "restore": restoring the database state on exit.
+
+    Attributes:
+        label (str): How the context was opened, e.g. "from_orm".
+        owner (str | None): The pytest test or fixture that opened the context, when
+                            the pytest plugin is enabled.
+        phases (dict[str, float]): The duration of each phase, in seconds.
+        rows (int): The number of rows inserted.
+        snapshot_bytes (int): The size of the database state captured by the
+                              snapshot, when the strategy copies it.
+    """
+
+    if TYPE_CHECKING:
+        label: str
+        owner: str | None
+        phases: dict[str, float]
+        rows: int
+        snapshot_bytes: int
+        nested: float
+
+    def __init__(self, label: str, owner: "str | None" = None):
+        self.label = label
+        self.owner = owner
+        self.phases = {}
+        self.rows = 0
+        self.snapshot_bytes = 0
+        # the time spent in the phases nested in the open one
+        self.nested = 0.0
+
+    @property
+    def total(self) -> float:
+        """The time spent in every phase, in seconds."""
+        return sum(self.phases.values())
+
+    def __repr__(self) -> str:
+        phases = ", ".join(
+            f"{name}={duration:.6f}" for name, duration in self.phases.items()
+        )
+        return (
+            f"ContextProfile({self.label!r}, owner={self.owner!r}, {phases}, "
+            f"rows={self.rows}, snapshot_bytes={self.snapshot_bytes})"
+        )
+
+
+@contextmanager
+def profiled(
+    label: str, on_profile: "Callable[[ContextProfile], None] | None" = None
+) -> "Iterator[ContextProfile | None]":
+    """Profile the db_mock context opened within, if anything listens.
+
+    Args:
+        label (str): How the context was opened.
+        on_profile (Callable | None): The callback of the DBMock instance, notified
+                                      along with the module hooks when the context
+                                      exits.
+
+    Yields:
+        ContextProfile | None: The profile, or None when nothing listens.
+    """
+    if on_profile is None and not hooks:
+        yield None
+        return
+
+    profile = ContextProfile(label, owner)
+    previous = current.get()
+    current.set(profile)
+    try:
+        yield profile
+    finally:
+        # async fixtures may exit in another task than they entered, where a token
+        # reset would fail
+        current.set(previous)
+        if on_profile is not None:
+            on_profile(profile)
+        for hook in list(hooks):
+            hook(profile)
+
+
+@contextmanager
+def phase(name: str) -> "Iterator[None]":
+    """Add the time spent within to a phase of the current context's profile,
+    except the time spent in the phases nested within."""
+    profile = current.get()
+    if profile is None:
+        yield
+        return
+
+    outer_nested, profile.nested = profile.nested, 0.0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        profile.phases[name] = profile.phases.get(name, 0.0) + elapsed - profile.nested
+        profile.nested = outer_nested + elapsed
+
+
+def active() -> bool:
+    """Whether the current context is profiled, to skip measuring otherwise."""
+    return current.get() is not None
+
+
+def record_rows(data: "MockDataInterface"):
+    """Count the rows seeded in the current context, from its data interface."""
+    profile = current.get()
+    if profile is None:
+        return
+    profile.rows = sum(map(len, data.data_registry.values())) + sum(
+        map(len, getattr(data, "pending_keys", {}).values())
+    )
+
+
+def add_snapshot_bytes(count: int):
+    profile = current.get()
+    if profile is not None:
+        profile.snapshot_bytes += count
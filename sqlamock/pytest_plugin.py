@@ -0,0 +1,320 @@
+"""pytest plugin reporting where db_mock contexts spend their time, and running tests
+in forked processes.
+
+Enable it with `-p sqlamock.pytest_plugin`, or `pytest_plugins = ["sqlamock.pytest_plugin"]`
+in the root conftest.py, then run pytest with `--sqlamock-profile` to list the slowest
+db_mock contexts, and the tests and fixtures that opened them, at the end of the session.
+
+With `--sqlamock-fork` (Linux only), every test function runs in a child process forked once
+its fixtures are set up, see ForkRunner.
+"""
+
+import bdb
+import os
+import pickle
+import sys
+from collections import defaultdict
+from contextlib import contextmanager, suppress
+from typing import TYPE_CHECKING
+
+import pytest
+
+from . import profiling
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterator
+    from typing import NoReturn
+
+    from .profiling import ContextProfile
+
+PHASES = ("init", "snapshot", "seed", "refresh", "restore")
+
+
+def pytest_addoption(parser: "pytest.Parser"):
+    group = parser.getgroup("sqlamock")
+    group.addoption(
+        "--sqlamock-profile",
+        action="store_true",
+        help="Report the time db_mock contexts spend in each phase.",
+    )
+    group.addoption(
+        "--sqlamock-profile-top",
+        type=int,
+        default=10,
+        help="How many contexts and owners to list in the profile report.",
+    )
+    group.addoption(
+        "--sqlamock-fork",
+        action="store_true",
+        help="Run each test in a child process forked once its fixtures are set up "
+        "(Linux only).",
+    )
+
+
+def pytest_configure(config: "pytest.Config"):
+    if config.getoption("sqlamock_profile"):
+        config.pluginmanager.register(
+            ProfileReport(config.getoption("sqlamock_profile_top")),
+            "sqlamock-profile",
+        )
+    if config.getoption("sqlamock_fork"):
+        if not sys.platform.startswith("linux"):
+            raise pytest.UsageError("--sqlamock-fork is only supported on Linux")
+        config.pluginmanager.register(ForkRunner(), "sqlamock-fork")
+
+
+class ProfileReport:
+    """Collects the profile of every db_mock context of the session.
+
+    Attributes:
+        top (int): How many contexts and owners to list.
+        profiles (list[ContextProfile]): The profiles collected so far.
+    """
+
+    if TYPE_CHECKING:
+        top: int
+        profiles: list[ContextProfile]
+
+    def __init__(self, top: int):
+        self.top = top
+        self.profiles = []
+        profiling.hooks.append(self.profiles.append)
+
+    def pytest_unconfigure(self):
+        profiling.hooks.remove(self.profiles.append)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_fixture_setup(
+        self, fixturedef: "pytest.FixtureDef", request: "pytest.FixtureRequest"
+    ) -> "Iterator":
+        with owned_by(f"{fixturedef.argname} (fixture)"):
+            return (yield)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item: "pytest.Item") -> "Iterator":
+        with owned_by(item.nodeid):
+            return (yield)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        write_line = terminalreporter.write_line
+        terminalreporter.write_sep("=", "sqlamock profile")
+        if not self.profiles:
+            write_line("no db_mock context was opened")
+            return
+
+        totals = defaultdict(float)
+        for profile in self.profiles:
+            for name, duration in profile.phases.items():
+                totals[name] += duration
+        write_line(
+            f"{len(self.profiles)} contexts, {sum(totals.values()):.3f}s: "
+            + ", ".join(f"{name} {totals[name]:.3f}s" for name in PHASES)
+        )
+
+        terminalreporter.write_sep("-", f"slowest {self.top} contexts")
+        slowest = sorted(self.profiles, key=lambda profile: -profile.total)
+        for profile in slowest[: self.top]:
+            phases = " ".join(
+                f"{name}={profile.phases.get(name, 0.0) * 1000:.1f}ms"
+                for name in PHASES
+            )
+            write_line(
+                f"{profile.total:8.3f}s {profile.label} in {profile.owner}: {phases} "
+                f"rows={profile.rows} snapshot={profile.snapshot_bytes}B"
+            )
+
+        terminalreporter.write_sep("-", f"slowest {self.top} tests and fixtures")
+        owners = defaultdict(list)
+        for profile in self.profiles:
+            owners[profile.owner].append(profile.total)
+        slowest_owners = sorted(owners.items(), key=lambda owner: -sum(owner[1]))
+        for owner, totals_by_context in slowest_owners[: self.top]:
+            write_line(
+                f"{sum(totals_by_context):8.3f}s {owner} "
+                f"({len(totals_by_context)} contexts)"
+            )
+
+
+class ForkRunner:
+    """Runs the call phase of every test function in a child process, forked once
+    the test's fixtures are set up, and logs the report the child sends back.
+
+    Tests still go through pytest's standard protocol: fixtures, with the db_mock
+    contexts and session baselines they seed, are set up and torn down in the pytest
+    process as usual. Only the call is forked: the child runs the test function, and
+    the report the other plugins make of it, e.g. for xfail or --runxfail, is sent
+    back in place of the parent's, which skips the function. The child's memory is a
+    copy-on-write copy of the parent's, in-memory databases included, so whatever
+    the test writes is thrown away with the child instead of being restored. File
+    databases are shared with the child, and still need the test's contexts to
+    restore them.
+
+    The profiles of the contexts opened by the test are sent back along with the
+    report, to the parent's profiling hooks. A child that dies without a readable
+    report, e.g. on a segfault, fails the test.
+
+    Attributes:
+        reports (dict[str, pytest.TestReport]): The reports sent back by the
+            children, by the node id of their test, until logged.
+        pipe (int | None): In a child, the write end of the pipe to the parent.
+        profiles (list[ContextProfile]): In a child, the profiles of the contexts
+            opened by the test.
+    """
+
+    if TYPE_CHECKING:
+        reports: dict[str, pytest.TestReport]
+        pipe: int | None
+        profiles: list[ContextProfile]
+
+    def __init__(self):
+        self.reports = {}
+        self.pipe = None
+        self.profiles = []
+
+    @pytest.hookimpl(wrapper=True, tryfirst=True)
+    def pytest_runtest_call(self, item: "pytest.Item") -> "Generator[None, None, None]":
+        if not isinstance(item, pytest.Function):
+            return (yield)
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self.pipe = write_fd
+            profiling.hooks.append(self.profiles.append)
+            try:
+                return (yield)
+            except (KeyboardInterrupt, pytest.exit.Exception):
+                # never let the child go on to the parent's teardown
+                os._exit(1)
+
+        os.close(write_fd)
+        self.reports[item.nodeid] = self.wait_for_report(item, pid, read_fd)
+        return (yield)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(self, pyfuncitem: "pytest.Function") -> bool | None:
+        # the child ran the test function already
+        return True if pyfuncitem.nodeid in self.reports else None
+
+    @pytest.hookimpl(wrapper=True, tryfirst=True)
+    def pytest_runtest_makereport(
+        self, item: "pytest.Item", call: "pytest.CallInfo[None]"
+    ) -> "Generator[None, pytest.TestReport, pytest.TestReport]":
+        if self.pipe is not None and call.when == "call":
+            child_report = None
+            try:
+                child_report = yield
+            finally:
+                # the child exits here, with the report or without one when making
+                # it failed
+                self.send_report(self.pipe, item, call, child_report)
+
+        report = yield
+        if call.when != "call":
+            return report
+        return self.reports.pop(item.nodeid, report)
+
+    def send_report(
+        self,
+        pipe: int,
+        item: "pytest.Item",
+        call: "pytest.CallInfo[None]",
+        report: "pytest.TestReport | None",
+    ) -> "NoReturn":
+        """Send the report of the call phase to the parent, and exit the child.
+
+        The child exits with status 1 without sending anything when there is no
+        report, or when the parent no longer reads the pipe, e.g. once interrupted.
+        The parent then fails the test, see wait_for_report().
+
+        Args:
+            pipe (int): The write end of the pipe to the parent.
+            item (pytest.Item): The test run by the child.
+            call (pytest.CallInfo[None]): The call phase of the test.
+            report (pytest.TestReport | None): The report made of it, None if another
+                                               plugin failed to make it.
+        """
+        status = 1
+        try:
+            if report is not None:
+                # as pytest does once the report is logged, e.g. for --pdb
+                if (
+                    call.excinfo is not None
+                    and report.failed
+                    and not call.excinfo.errisinstance(bdb.BdbQuit)
+                ):
+                    item.ihook.pytest_exception_interact(
+                        node=item, call=call, report=report
+                    )
+                data = item.config.hook.pytest_report_to_serializable(
+                    config=item.config, report=report
+                )
+                with suppress(BrokenPipeError):
+                    with open(pipe, "wb") as file:
+                        pickle.dump((data, self.profiles), file)
+                    status = 0
+        finally:
+            # skip the parent's atexit handlers, buffered output and teardowns
+            os._exit(status)
+
+    def wait_for_report(
+        self, item: "pytest.Item", pid: int, read_fd: int
+    ) -> "pytest.TestReport":
+        """Wait for the forked child to send back the report of the test.
+
+        Args:
+            item (pytest.Item): The test run by the child.
+            pid (int): The child's process id.
+            read_fd (int): The read end of the pipe from the child.
+
+        Returns:
+            pytest.TestReport: The report of the call phase, made by the child, or a
+                failure if it sent back none that can be read.
+        """
+        with open(read_fd, "rb") as pipe:
+            payload = pipe.read()
+        _, status = os.waitpid(pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        reason = f"signal {-code}" if code < 0 else f"status {code}"
+        if not payload:
+            return self.failure(
+                item, f"The forked test process exited with {reason} before reporting"
+            )
+        try:
+            data, profiles = pickle.loads(payload)
+        except Exception as exc:
+            return self.failure(
+                item,
+                f"The forked test process exited with {reason} "
+                f"and an unreadable report: {exc!r}",
+            )
+
+        # the child's hooks were the parent's, e.g. ProfileReport's
+        for profile in profiles:
+            for profile_hook in list(profiling.hooks):
+                profile_hook(profile)
+        return item.config.hook.pytest_report_from_serializable(
+            config=item.config, data=data
+        )
+
+    @staticmethod
+    def failure(item: "pytest.Item", message: str) -> "pytest.TestReport":
+        return pytest.TestReport(
+            item.nodeid,
+            item.location,
+            {keyword: 1 for keyword in item.keywords},
+            "failed",
+            message,
+            "call",
+        )
+
+
+@contextmanager
+def owned_by(owner: str) -> "Iterator[None]":
+    """Attribute the db_mock contexts opened within to a test or fixture."""
+    previous, profiling.owner = profiling.owner, owner
+    try:
+        yield
+    finally:
+        profiling.owner = previous
@@ -0,0 +1,248 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from sqlalchemy import event
+
+try:
+    from sqlalchemy.engine.cursor import (
+        CursorFetchStrategy,
+        FullyBufferedCursorFetchStrategy,
+    )
+except ImportError:  # pragma: no cover - SQLAlchemy moved its fetch strategies
+    BUFFERS_ROWS = False
+else:
+    BUFFERS_ROWS = True
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from sqlalchemy import Engine
+
+# whether the statements of the current thread or task are left out of recorders,
+# e.g. those db_mock contexts run to snapshot and seed the database
+suspended: ContextVar[bool] = ContextVar("sqlamock_queries_suspended", default=False)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize(statement: str) -> str:
+    """Normalize a SQL statement, so that executions differing only by their
+    parameters are counted together.
+
+    Literals become "?" placeholders, expanded IN lists and multi-row VALUES collapse
+    to a single "(?)", and whitespace to single spaces.
+
+    Args:
+        statement (str): The SQL statement as sent to the driver.
+
+    Returns:
+        str: The normalized statement.
+    """
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    statement = _PARAMETER_LIST.sub("(?)", statement)
+    statement = _ROW_LIST.sub("(?)", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+class QueryStats:
+    """The executions of one normalized statement.
+
+    Attributes:
+        statement (str): The normalized statement.
+        count (int): How many times it was executed.
+        duration (float): The total time of its executions, in seconds.
+        rows (int): The rows it returned, or affected for DML statements.
+    """
+
+    if TYPE_CHECKING:
+        statement: str
+        count: int
+        duration: float
+        rows: int
+
+    def __init__(self, statement: str):
+        self.statement = statement
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryStats({self.statement!r}, count={self.count}, "
+            f"duration={self.duration:.6f}, rows={self.rows})"
+        )
+
+
+class QueryRecorder:
+    """Records the statements executed on a mocked database, see
+    MockConnectionProvider.record_queries().
+
+    Attributes:
+        statements (dict[str, QueryStats]): The statistics of each normalized
+                                            statement, in order of first execution.
+        count_rows (bool): Whether the rows returned by SELECTs are counted, which
+                           buffers them, see buffer_rows().
+    """
+
+    if TYPE_CHECKING:
+        statements: dict[str, QueryStats]
+        count_rows: bool
+
+    def __init__(self, count_rows: bool = True):
+        """Initialize a new QueryRecorder instance.
+
+        Args:
+            count_rows (bool): Whether to count the rows returned by SELECTs. When
+                               False, their rows are recorded as 0.
+        """
+        self.statements = {}
+        self.count_rows = count_rows
+
+    @property
+    def count(self) -> int:
+        """How many statements were executed."""
+        return sum(stats.count for stats in self.statements.values())
+
+    @property
+    def duration(self) -> float:
+        """The total time of the executed statements, in seconds."""
+        return sum(stats.duration for stats in self.statements.values())
+
+    @property
+    def rows(self) -> int:
+        """The rows returned or affected by the executed statements."""
+        return sum(stats.rows for stats in self.statements.values())
+
+    def record(self, statement: str, duration: float, rows: int):
+        """Record an execution.
+
+        Args:
+            statement (str): The SQL statement as sent to the driver.
+            duration (float): How long the execution took, in seconds.
+            rows (int): The rows it returned, or affected.
+        """
+        normalized = normalize(statement)
+        stats = self.statements.get(normalized)
+        if stats is None:
+            stats = self.statements[normalized] = QueryStats(normalized)
+        stats.count += 1
+        stats.duration += duration
+        stats.rows += rows
+
+    def clear(self):
+        self.statements.clear()
+
+    def __repr__(self) -> str:
+        return (
+            f"QueryRecorder(count={self.count}, duration={self.duration:.6f}, "
+            f"rows={self.rows})"
+        )
+
+
+@contextmanager
+def suspend() -> "Iterator[None]":
+    """Leave the statements executed within out of recorders."""
+    previous = suspended.get()
+    suspended.set(True)
+    try:
+        yield
+    finally:
+        # async fixtures may exit in another task than they entered, where a token
+        # reset would fail
+        suspended.set(previous)
+
+
+@contextmanager
+def resume() -> "Iterator[None]":
+    """Record the statements executed within again, within suspend()."""
+    previous = suspended.get()
+    suspended.set(False)
+    try:
+        yield
+    finally:
+        suspended.set(previous)
+
+
+def use_query_recorders(engine: "Engine", recorders: "list[QueryRecorder]"):
+    """Record every statement executed on the engine into the given recorders.
+
+    The list is read on each execution, so recorders can be added and removed at any
+    time. Rows returned by a SELECT are buffered to be counted only while a recorder
+    counting rows listens, see buffer_rows().
+
+    Args:
+        engine (Engine): The (sync) engine to instrument. For async engines pass
+                         AsyncEngine.sync_engine.
+        recorders (list[QueryRecorder]): The recorders to notify.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        # insertmanyvalues batches run one after the other on the same context
+        context.sqlamock_query_start = (
+            time.perf_counter() if recorders and not suspended.get() else None
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_query(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "sqlamock_query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+
+        row_count = None
+        if any(recorder.count_rows for recorder in recorders):
+            row_count = buffer_rows(context, cursor)
+        if row_count is None:
+            row_count = max(cursor.rowcount, 0)
+
+        for recorder in tuple(recorders):
+            recorder.record(statement, duration, row_count)
+
+
+def buffer_rows(context, cursor) -> "int | None":
+    """Fetch the rows of a SELECT ahead of the caller to count them, and hand them
+    back through a fully buffered fetch strategy.
+
+    SQLAlchemy has no public hook to count the rows of a result without consuming
+    it, so the strategy is swapped on the execution context the way SQLAlchemy 2.0
+    dialects do it. The swap is checked for: it only happens when the context has a
+    fetch strategy that is the plain CursorFetchStrategy and the results are not
+    streamed, so executions with yield_per or stream_results, results already
+    buffered by the dialect, and SQLAlchemy versions without these strategies are
+    left alone, their rows are not counted.
+
+    Args:
+        context (ExecutionContext): The context of the execution.
+        cursor (DBAPICursor): The DBAPI cursor, executed.
+
+    Returns:
+        int | None: The rows returned, or None when they were not buffered.
+    """
+    if (
+        not BUFFERS_ROWS
+        or cursor.description is None
+        or context.isinsert
+        or context.isupdate
+        or context.isdelete
+        # yield_per implies stream_results, which SQLite drivers ignore
+        or context.execution_options.get("stream_results")
+        or type(getattr(context, "cursor_fetch_strategy", None))
+        is not CursorFetchStrategy
+    ):
+        return None
+    rows = cursor.fetchall()
+    context.cursor_fetch_strategy = FullyBufferedCursorFetchStrategy(
+        cursor, initial_buffer=rows
+    )
+    return len(rows)
@@ -0,0 +1,422 @@
+"""Reverting the rows inserted by a db_mock context's seed, for the "backup" and
+"dump" snapshot strategies.
+
+When nothing but the seed wrote to the database within a context, deleting the rows
+it inserted is cheaper than restoring the whole snapshot. On entry, the highest rowid
+of every table is marked, along with the AUTOINCREMENT sequences, without scanning
+any table. On exit, the rows above the marks are deleted and the sequences put back,
+as long as they are all the rows the seed inserted, as counted by the changes of the
+provider's connections. Otherwise, e.g. when a row was inserted below the highest
+rowid, nothing is reverted and the snapshot is restored.
+
+Both run on the connection provider's watcher connection, a plain sqlite3 connection
+that SQLAlchemy events and the code under test do not see, or on the async watcher
+connection, an aiosqlite one, with async_mark() and async_revert().
+
+Rowids cannot tell an UPDATE of an existing row, or a row deleted and inserted again
+at the same rowid, so the seed must also be proven to have only run INSERTs: the
+provider's engines flag the marks being watched whenever any other statement writes
+(see use_insert_watch), and databases with triggers of their own are never proven. Read-only contexts, which take no snapshot to fall back on, predict it
+from the instances they seed instead (see updates_rows).
+
+Not meant for public use.
+"""
+
+import re
+import sqlite3
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import instance_state
+
+from .copy_on_write import quote
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    import aiosqlite
+    from sqlalchemy import Connection, Engine
+
+# plain INSERTs add rows without changing or removing existing ones
+_INSERT = re.compile(
+    r"\s*INSERT\s+(?:OR\s+(?:ABORT|FAIL|IGNORE|ROLLBACK)\s+)?INTO\s", re.I
+)
+# statements that write no rows
+_HARMLESS = re.compile(
+    r"\s*(?:SELECT|PRAGMA|BEGIN|SAVEPOINT|RELEASE|COMMIT|END|ROLLBACK|ATTACH|DETACH)\b",
+    re.I,
+)
+# an INSERT ... ON CONFLICT DO UPDATE updates the conflicting row
+_UPSERT = re.compile(r"\bON\s+CONFLICT\b.*\bDO\s+UPDATE\b", re.I | re.S)
+
+
+class Marks:
+    """The state of the database's tables when a context was entered.
+
+    Attributes:
+        tables (dict[str, tuple[bool, int | None]]): Whether each table has a rowid,
+                                                     and its highest rowid, 0 when
+                                                     empty. None for WITHOUT ROWID
+                                                     tables with rows.
+        sequences (list[tuple[str, int]] | None): The rows of sqlite_sequence, None
+                                                  when the database has none.
+        inserts_only (bool): Whether only INSERTs were seen writing since the marks
+                             were taken, while they were watched.
+        changes (dict[object, tuple[int, int]]): The total changes of each driver
+                                                 connection when first and last seen
+                                                 while watched, see count_changes().
+    """
+
+    if TYPE_CHECKING:
+        tables: dict[str, tuple[bool, int | None]]
+        sequences: list[tuple[str, int]] | None
+        inserts_only: bool
+        changes: dict[object, tuple[int, int]]
+
+    def __init__(
+        self,
+        tables: "dict[str, tuple[bool, int | None]]",
+        sequences: "list[tuple[str, int]] | None",
+        inserts_only: bool = True,
+    ):
+        self.tables = tables
+        self.sequences = sequences
+        self.inserts_only = inserts_only
+        self.changes = {}
+
+    @property
+    def empty(self) -> bool:
+        """Whether every table was empty, so that any row found later was inserted."""
+        return all(max_rowid == 0 for _, max_rowid in self.tables.values())
+
+    @property
+    def inserted(self) -> int:
+        """The rows inserted while watched, as counted by the connections' changes."""
+        return sum(last - first for first, last in self.changes.values())
+
+
+@lru_cache(maxsize=1024)
+def inserts_only(statement: str) -> bool:
+    """Tell whether a statement leaves the existing rows as they are: a plain INSERT,
+    without REPLACE or an UPSERT, or a statement that writes no rows at all.
+
+    Args:
+        statement (str): The SQL statement as sent to the driver.
+
+    Returns:
+        bool: Whether the statement only adds rows, if any.
+    """
+    if _HARMLESS.match(statement):
+        return True
+    return bool(_INSERT.match(statement)) and not _UPSERT.search(statement)
+
+
+def count_changes(conn: "Connection", watched: "list[Marks]"):
+    """Record the total changes of a connection's driver connection into the watched
+    marks: the rows it inserted, updated or deleted since it was opened.
+
+    Args:
+        conn (Connection): The connection, executing or committing.
+        watched (list[Marks]): The marks of the contexts being seeded.
+    """
+    # sqlite3 and aiosqlite connections both count them
+    driver_connection = conn.connection.driver_connection
+    if driver_connection is None:  # a closed connection
+        return
+    total = driver_connection.total_changes
+    for marks in watched:
+        first, _ = marks.changes.get(driver_connection, (total, total))
+        marks.changes[driver_connection] = (first, total)
+
+
+def use_insert_watch(engine: "Engine", watched: "list[Marks]"):
+    """Flag the watched marks when a statement other than an INSERT runs on the engine,
+    see inserts_only(), and count the rows written, see count_changes().
+
+    The list is read on each execution, so marks can be watched and unwatched at any
+    time. Changes are counted around each statement and on commit, once the rows of an
+    INSERT ... RETURNING were fetched.
+
+    Args:
+        engine (Engine): The (sync) engine to instrument. For async engines pass
+                         AsyncEngine.sync_engine.
+        watched (list[Marks]): The marks of the contexts being seeded.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _watch_inserts(conn, cursor, statement, parameters, context, executemany):
+        if not watched:
+            return
+        count_changes(conn, watched)
+        if not inserts_only(statement):
+            for marks in watched:
+                marks.inserts_only = False
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if watched:
+            count_changes(conn, watched)
+
+    @event.listens_for(engine, "commit")
+    def _count_committed(conn):
+        if watched:
+            count_changes(conn, watched)
+
+
+def updates_rows(instances: "Iterable[object]") -> bool:
+    """Tell whether seeding the ORM instances would update existing rows, i.e. whether
+    any of them, or of the instances they cascade to, is persistent or detached and
+    was modified.
+
+    Args:
+        instances (Iterable[object]): The ORM instances to seed.
+
+    Returns:
+        bool: Whether the seed would run UPDATEs, and cannot be reverted.
+    """
+    for instance in instances:
+        state = instance_state(instance)
+        states = [state] + [
+            related
+            for _, _, related, _ in state.mapper.cascade_iterator("save-update", state)
+            if related is not None
+        ]
+        if any(related.key is not None and related.modified for related in states):
+            return True
+    return False
+
+
+# the user tables, and whether the database has AUTOINCREMENT sequences or triggers,
+# in a single query. The copy-on-write triggers are TEMP ones, out of sqlite_master.
+_SCHEMA = (
+    "SELECT type, name, sql FROM sqlite_master WHERE type = 'table' OR type = 'trigger'"
+)
+_SEQUENCES = "SELECT name, seq FROM sqlite_sequence"
+
+
+class Schema:
+    """The tables of the database, as read by mark() and revert().
+
+    Attributes:
+        tables (dict[str, bool]): Whether each user table has a rowid.
+        sequences (bool): Whether the database has a sqlite_sequence table, i.e.
+                          AUTOINCREMENT tables.
+        triggers (bool): Whether the database has triggers, which could change
+                         existing rows on INSERT.
+    """
+
+    if TYPE_CHECKING:
+        tables: dict[str, bool]
+        sequences: bool
+        triggers: bool
+
+    def __init__(self, rows: "Iterable[Sequence[Any]]"):
+        self.tables = {}
+        self.sequences = False
+        self.triggers = False
+        for kind, name, sql in rows:
+            if kind == "trigger":
+                self.triggers = True
+            elif name == "sqlite_sequence":
+                self.sequences = True
+            elif not name.startswith("sqlite_"):
+                self.tables[name] = "WITHOUT ROWID" not in (sql or "").upper()
+
+    def mark_query(self) -> str:
+        """The query selecting the highest rowid of every table, or whether a WITHOUT
+        ROWID table has rows. Both only read the first or last entry of the table."""
+        columns = [
+            f"(SELECT max(rowid) FROM {quote(name)})"
+            if has_rowid
+            else f"EXISTS (SELECT 1 FROM {quote(name)})"
+            for name, has_rowid in self.tables.items()
+        ]
+        return f"SELECT {', '.join(columns)}"
+
+    def marks(
+        self, values: "Sequence[int | None]", sequences: "list[tuple[str, int]] | None"
+    ) -> Marks:
+        """Build the marks from the values selected by mark_query().
+
+        Args:
+            values (Sequence[int | None]): The row selected by mark_query().
+            sequences (list[tuple[str, int]] | None): The rows of sqlite_sequence.
+
+        Returns:
+            Marks: The marks, for revert().
+        """
+        return Marks(
+            {
+                name: (
+                    has_rowid,
+                    (value or 0) if has_rowid else (None if value else 0),
+                )
+                for (name, has_rowid), value in zip(
+                    self.tables.items(), values, strict=True
+                )
+            },
+            sequences,
+            not self.triggers,
+        )
+
+
+def count_query(marks: Marks) -> str:
+    """The query selecting how many rows of every marked table are above its marked
+    rowid, i.e. were inserted since. Only these rows are read."""
+    columns = []
+    for name, (has_rowid, max_rowid) in marks.tables.items():
+        if max_rowid is None:
+            # the rows of a WITHOUT ROWID table cannot be told apart
+            columns.append("0")
+        elif has_rowid:
+            columns.append(
+                f"(SELECT count(*) FROM {quote(name)} WHERE rowid > {max_rowid})"
+            )
+        else:
+            columns.append(f"(SELECT count(*) FROM {quote(name)})")
+    return f"SELECT {', '.join(columns)}"
+
+
+def revert_statements(
+    marks: Marks, schema: Schema, counts: "Sequence[int]"
+) -> "list[tuple[str, list[tuple]]] | None":
+    """Plan the revert of the rows inserted above the marks, from the values selected
+    by count_query().
+
+    Args:
+        marks (Marks): The marks taken when the context was entered.
+        schema (Schema): The tables of the database now.
+        counts (Sequence[int]): The row selected by count_query().
+
+    Returns:
+        list[tuple[str, list[tuple]]] | None: The statements deleting the rows and
+            putting the sequences back, with their rows of parameters, or None if the
+            tables were changed other than by appending rows.
+    """
+    if not marks.inserts_only or schema.tables.keys() != marks.tables.keys():
+        return None
+    # rows inserted below the marks, or into WITHOUT ROWID tables with rows, are not
+    # counted above them. An empty database can also be seeded by copying a template
+    # with the backup API, whose rows no connection counts, but all of them are new.
+    if not marks.empty and sum(counts) != marks.inserted:
+        return None
+
+    statements: list[tuple[str, list[tuple]]] = []
+    for (name, (has_rowid, max_rowid)), above in zip(
+        marks.tables.items(), counts, strict=True
+    ):
+        if not above:
+            continue
+        if has_rowid:
+            statements.append(
+                (f"DELETE FROM {quote(name)} WHERE rowid > ?", [(max_rowid,)])
+            )
+        else:
+            statements.append((f"DELETE FROM {quote(name)}", [()]))
+    if marks.sequences is not None or schema.sequences:
+        statements.append(("DELETE FROM sqlite_sequence", [()]))
+        if marks.sequences:
+            statements.append(
+                (
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                    marks.sequences,
+                )
+            )
+    return statements
+
+
+def mark(conn: sqlite3.Connection) -> Marks:
+    """Mark the highest rowid of every table.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the mocked database.
+
+    Returns:
+        Marks: The marks, for revert().
+    """
+    # statements are always run to completion, or their read lock would be kept
+    schema = Schema(conn.execute(_SCHEMA).fetchall())
+    [values] = conn.execute(schema.mark_query()).fetchall() if schema.tables else [()]
+    sequences = conn.execute(_SEQUENCES).fetchall() if schema.sequences else None
+    return schema.marks(values, sequences)
+
+
+async def async_mark(conn: "aiosqlite.Connection") -> Marks:
+    """Mark the highest rowid of every table, see mark().
+
+    Args:
+        conn (aiosqlite.Connection): A connection to the mocked database.
+
+    Returns:
+        Marks: The marks, for async_revert().
+    """
+    schema = Schema(await conn.execute_fetchall(_SCHEMA))
+    [values] = (
+        await conn.execute_fetchall(schema.mark_query()) if schema.tables else [()]
+    )
+    sequences = None
+    if schema.sequences:
+        sequences = [
+            (name, seq) for name, seq in await conn.execute_fetchall(_SEQUENCES)
+        ]
+    return schema.marks(values, sequences)
+
+
+def revert(conn: sqlite3.Connection, marks: Marks) -> bool:
+    """Delete the rows inserted above the marks, and put the sequences back, if the
+    tables were only appended to since they were marked, by INSERTs only.
+
+    Args:
+        conn (sqlite3.Connection): A connection to the mocked database, without
+                                   foreign key enforcement.
+        marks (Marks): The marks taken when the context was entered.
+
+    Returns:
+        bool: Whether the inserts were reverted. When not, nothing was changed and the
+              snapshot must be restored.
+    """
+    if not marks.inserts_only:
+        return False
+    schema = Schema(conn.execute(_SCHEMA).fetchall())
+    [counts] = conn.execute(count_query(marks)).fetchall() if marks.tables else [()]
+    statements = revert_statements(marks, schema, counts)
+    if statements is None:
+        return False
+
+    # parents and children are deleted in any order, the watcher connection does not
+    # enforce foreign keys
+    with conn:
+        for statement, rows in statements:
+            conn.executemany(statement, rows)
+    return True
+
+
+async def async_revert(conn: "aiosqlite.Connection", marks: Marks) -> bool:
+    """Delete the rows inserted above the marks, and put the sequences back, see
+    revert().
+
+    Args:
+        conn (aiosqlite.Connection): A connection to the mocked database, without
+                                     foreign key enforcement.
+        marks (Marks): The marks taken when the context was entered.
+
+    Returns:
+        bool: Whether the inserts were reverted.
+    """
+    if not marks.inserts_only:
+        return False
+    schema = Schema(await conn.execute_fetchall(_SCHEMA))
+    [counts] = await conn.execute_fetchall(count_query(marks)) if marks.tables else [()]
+    statements = revert_statements(marks, schema, counts)
+    if statements is None:
+        return False
+
+    try:
+        for statement, rows in statements:
+            await conn.executemany(statement, rows)
+    except BaseException:
+        await conn.rollback()
+        raise
+    await conn.commit()
+    return True
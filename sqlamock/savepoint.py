@@ -0,0 +1,77 @@
+from typing import TYPE_CHECKING
+
+from . import profiling
+
+if TYPE_CHECKING:
+    from sqlalchemy import NestedTransaction
+
+    from .connection_provider import MockConnectionProvider
+
+
+class Savepoint:
+    """ContextManager that isolates a db_mock context with a SAVEPOINT.
+
+    This is the "savepoint" isolation counterpart of Snapshot. Instead of copying the
+    whole database on entry and restoring it on exit, it opens a SAVEPOINT on the
+    connection pinned by the connection provider and rolls back to it on exit, so
+    teardown only costs as much as the rows changed inside the context.
+
+    Not meant for public use.
+
+    Attributes:
+        connection_provider (MockConnectionProvider): The connection provider for the database.
+        transaction (NestedTransaction): The SAVEPOINT opened for the context.
+        read_only (bool): Whether the context is read-only once seeded.
+        query_only (bool): Whether the database was read-only when the context was
+                           entered, i.e. within a read-only context.
+    """
+
+    if TYPE_CHECKING:
+        connection_provider: "MockConnectionProvider"
+        transaction: NestedTransaction
+        read_only: bool
+        query_only: bool
+
+    def __init__(
+        self, connection_provider: "MockConnectionProvider", read_only: bool = False
+    ):
+        """Initialize a new Savepoint instance.
+
+        Args:
+            connection_provider (MockConnectionProvider): The connection provider for the database.
+            read_only (bool): Whether to make the database read-only once seeded.
+        """
+        self.connection_provider = connection_provider
+        self.read_only = read_only
+        self.query_only = False
+
+    def __enter__(self):
+        """Enter the context manager, opening a SAVEPOINT on the pinned connection.
+
+        Returns:
+            Savepoint: The Savepoint instance.
+        """
+        self.query_only = self.connection_provider.set_query_only(False)
+        with profiling.phase("snapshot"):
+            self.transaction = self.connection_provider.get_connection().begin_nested()
+        return self
+
+    def seeded(self):
+        """Make the database read-only if the context is. There is nothing to mark,
+        the SAVEPOINT is rolled back in any case."""
+        if self.read_only:
+            self.connection_provider.set_query_only(True)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit the context manager, rolling back to the SAVEPOINT.
+
+        Args:
+            exc_type: The type of the exception that caused the context to be exited.
+            exc_value: The instance of the exception that caused the context to be exited.
+            traceback: A traceback object encoding the stack trace.
+        """
+        self.connection_provider.set_query_only(False)
+        with profiling.phase("restore"):
+            if self.transaction.is_active:
+                self.transaction.rollback()
+        self.connection_provider.set_query_only(self.query_only)
@@ -0,0 +1,191 @@
+"""In-memory cache of seeded database states, for from_dict(cached=True) and
+from_file(cached=True).
+
+The first context seeding a given baseline into an empty database stores a page image
+of the seeded database, with the primary keys of the seeded rows. Later contexts
+seeding the same baseline copy the image over the database with the backup API and
+load the instances back by primary key, without building, inserting or refreshing
+anything. Images are evicted least recently used first, to keep them within a memory
+budget.
+
+Not meant for public use.
+"""
+
+import datetime
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from decimal import Decimal
+from enum import Enum
+from typing import TYPE_CHECKING
+from uuid import UUID
+
+from .connection_provider import sqlite_connection
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+
+# the default memory budget of a DBMock's seed cache, in bytes
+DEFAULT_SEED_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def canonical_value(value: object) -> object:
+    """Encode a seed data value JSON cannot represent, for seed_hash.
+
+    Args:
+        value (object): The column value.
+
+    Returns:
+        object: A JSON representation tagged with the value's type.
+
+    Raises:
+        TypeError: If the value has no canonical representation, e.g. an arbitrary
+                   object whose repr may not tell its state.
+    """
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return [type(value).__name__, str(value)]
+    if isinstance(value, (Decimal, UUID)):
+        return [type(value).__name__, str(value)]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return ["bytes", bytes(value).hex()]
+    if isinstance(value, Enum):
+        return [f"{type(value).__module__}.{type(value).__qualname__}", value.name]
+    raise TypeError(
+        f"cannot hash the seed data value {value!r} of type {type(value).__name__}, "
+        "seed it with cached=False"
+    )
+
+
+def seed_hash(schema_key: str, data: dict[str, list[dict]]) -> str:
+    """Hash seed data canonically, along with the schema it is seeded into.
+
+    Tables and rows keep their order, which decides the generated primary keys, while
+    the columns of a row are sorted. Values JSON cannot represent are hashed through
+    canonical_value.
+
+    Args:
+        schema_key (str): The key of the schema, see metadata_hash.
+        data (dict[str, list[dict]]): The rows by table name, as given to from_dict.
+
+    Returns:
+        str: The hex digest.
+
+    Raises:
+        TypeError: If a value has no canonical representation, see canonical_value.
+    """
+    digest = hashlib.sha256(schema_key.encode())
+    digest.update(
+        json.dumps(
+            list(data.items()),
+            sort_keys=True,
+            separators=(",", ":"),
+            default=canonical_value,
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+class SeedState:
+    """A seeded database, as a page image held by an in-memory SQLite database.
+
+    Attributes:
+        image (sqlite3.Connection): The in-memory database holding the image.
+        keys (dict[str, list[tuple]]): The primary keys of the seeded rows by table name.
+        size (int): The size of the image, in bytes.
+    """
+
+    if TYPE_CHECKING:
+        image: sqlite3.Connection
+        keys: dict[str, list[tuple]]
+        size: int
+
+    def __init__(self, image: sqlite3.Connection, keys: "dict[str, list[tuple]]"):
+        self.image = image
+        self.keys = keys
+        [(page_count,)] = image.execute("PRAGMA page_count").fetchall()
+        [(page_size,)] = image.execute("PRAGMA page_size").fetchall()
+        self.size = page_count * page_size
+
+    @classmethod
+    def take(cls, engine: "Engine", keys: "dict[str, list[tuple]]") -> "SeedState":
+        """Take an image of the engine's freshly seeded database.
+
+        Args:
+            engine (Engine): The (sync) engine of the seeded database.
+            keys (dict[str, list[tuple]]): The primary keys of the seeded rows.
+
+        Returns:
+            SeedState: The seeded state.
+        """
+        # images are restored from whichever thread runs the context, e.g. to_thread
+        image = sqlite3.connect(":memory:", check_same_thread=False)
+        with engine.connect() as conn:
+            sqlite_connection(conn).backup(image)
+        return cls(image, keys)
+
+    def load(self, engine: "Engine"):
+        """Copy the image over the engine's database, in place."""
+        with engine.connect() as conn:
+            self.image.backup(sqlite_connection(conn))
+
+    def close(self):
+        self.image.close()
+
+
+class SeedCache:
+    """The seeded states of a DBMock, by seed hash, least recently used first.
+
+    Attributes:
+        budget (int): The total size of the images kept, in bytes. 0 disables the cache.
+        states (OrderedDict[str, SeedState]): The cached states.
+    """
+
+    if TYPE_CHECKING:
+        budget: int
+        states: OrderedDict[str, SeedState]
+
+    def __init__(self, budget: int = DEFAULT_SEED_CACHE_BYTES):
+        self.budget = budget
+        self.states = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached images, in bytes."""
+        return sum(state.size for state in self.states.values())
+
+    def get(self, key: str) -> "SeedState | None":
+        """Get a cached state, marking it as the most recently used."""
+        state = self.states.get(key)
+        if state is not None:
+            self.states.move_to_end(key)
+        return state
+
+    def save(self, key: str, engine: "Engine", keys: "dict[str, list[tuple]]"):
+        """Cache the engine's freshly seeded database, evicting the least recently used
+        states beyond the budget. Images larger than the whole budget are not kept.
+
+        Args:
+            key (str): The seed hash.
+            engine (Engine): The (sync) engine of the seeded database.
+            keys (dict[str, list[tuple]]): The primary keys of the seeded rows.
+        """
+        if self.budget <= 0:
+            return
+        state = SeedState.take(engine, keys)
+        if state.size > self.budget:
+            state.close()
+            return
+
+        previous = self.states.pop(key, None)
+        if previous is not None:
+            previous.close()
+        self.states[key] = state
+        while self.size > self.budget:
+            _, evicted = self.states.popitem(last=False)
+            evicted.close()
+
+    def clear(self):
+        for state in self.states.values():
+            state.close()
+        self.states.clear()
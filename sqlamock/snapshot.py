@@ -1,13 +1,54 @@
+import os
+import sqlite3
 import tempfile
-from contextlib import ExitStack
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, closing, suppress
 from typing import TYPE_CHECKING
 
+from . import copy_on_write, profiling, revert
+
 if TYPE_CHECKING:
     from sqlalchemy import Engine
 
     from .connection_provider import ConnectionProvider
 
 
+# prepares the standby databases of "swap" snapshots while the tests run
+STANDBY_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlamock")
+
+
+# whether this is a forked child process, e.g. with the pytest plugin's --sqlamock-fork,
+# whose parent shares the database files and holds connections to them
+forked = False
+
+
+def mark_forked():
+    global forked
+    forked = True
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=mark_forked)
+
+
+def copy_to_file(source: sqlite3.Connection, file_name: str):
+    """Copy a database into the given SQLite file with the backup API."""
+    with closing(sqlite3.connect(file_name)) as target:
+        source.backup(target)
+
+
+def remove_file(file_name: str):
+    with suppress(FileNotFoundError):
+        os.remove(file_name)
+
+
+def database_size(conn: sqlite3.Connection) -> int:
+    """The size of a SQLite database, in bytes."""
+    (page_count,) = conn.execute("PRAGMA page_count").fetchone()
+    (page_size,) = conn.execute("PRAGMA page_size").fetchone()
+    return page_count * page_size
+
+
 class Snapshot(ExitStack):
     """ContextManager that helps separate the scopes of database mocked data contexts.
 
@@ -19,58 +60,357 @@ class Snapshot(ExitStack):
     This is a critical part of teardown and maintaining deterministic testing state. This can only be used
     as a context manager within a db_mock context.
 
+    The way the state is captured depends on the connection provider's snapshot_strategy:
+
+    - "backup": the SQLite online backup API copies the database page by page into a
+      spare in-memory database, and copies it back on exit.
+    - "dump": the database is dumped as SQL text into a temporary file, and the script
+      is replayed on exit, into a spare in-memory database copied back over it.
+    - "copy_on_write": nothing is copied on entry. Triggers save a table's rows the
+      first time it is written inside the context, and only those tables are restored
+      on exit (see copy_on_write.py).
+    - "swap": pages are copied into a spare in-memory database as with "backup", and
+      a background thread copies them on into a standby database file while the
+      context runs. On exit the standby file replaces the database file, so the
+      restore is off the test's critical path. In forked child processes, whose
+      parent keeps its connections to the database file, it falls back to "backup".
+
+    Every strategy keeps the connection provider's engine, with its compiled statement
+    cache, across contexts. All but "swap" restore the database in place and keep its
+    pool too.
+
+    With "backup", "dump" and "swap", the restore is skipped when nothing was
+    committed within the context, according to PRAGMA data_version. With "backup" and
+    "dump", when only the seed wrote, i.e. nothing was committed since seeded(), its
+    inserts are reverted instead, as long as it only ran INSERTs appending rows (see
+    revert.py).
+
+    A read_only context takes no snapshot at all unless with "copy_on_write", or
+    unless its seed is known to update existing rows: the database is made read-only
+    once seeded (see MockConnectionProvider.set_query_only) and the seed's inserts are
+    reverted on exit.
+
+    When another connection still holds a lock on the database on exit, e.g. a
+    session left open with a pending write, restoring in place would wait on it
+    forever. The provider then moves to a new database, which the snapshot is
+    restored into, while the session keeps the old one (see _recreate()).
+
     Not meant for public use.
 
     Attributes:
            engine (Engine): The recyclable engine specific to the snapshot context.
-           tmpfile_name (str): The name of the temporary file used to store the snapshot.
+           tmpfile_name (str): The name of the temporary file used to store the "dump" snapshot.
+           backup (sqlite3.Connection): The in-memory database holding the "backup" snapshot.
+           standby_name (str): The file of the "swap" snapshot's standby database.
+           standby (Future | None): The copy of the snapshot into the standby
+                                    database, None unless swapping.
+           swapped (bool): Whether the standby database replaced the database on exit.
+           recreated (bool): Whether the snapshot was restored into a new database on
+                             exit, see _recreate().
            connection_provider (MockConnectionProvider): The connection provider for the database.
+           version (tuple[int, int] | None): The data version when the snapshot was
+                                             taken.
+           seeded_version (tuple[int, int] | None): The data version once the context
+                                                    was seeded.
+           marks (revert.Marks | None): The tables' highest rowids when the
+                                        snapshot was taken.
+           read_only (bool): Whether the context is read-only once seeded.
+           inserts_only (bool): Whether the seed is expected to only run INSERTs, so
+                                that a read-only context can revert it.
+           query_only (bool): Whether the database was read-only when the context
+                              was entered, i.e. within a read-only context.
     """
 
     if TYPE_CHECKING:
         engine: "Engine"
         tmpfile_name: str
+        backup: sqlite3.Connection
+        standby_name: str
+        standby: Future | None
+        swapped: bool
+        recreated: bool
         connection_provider: "ConnectionProvider"
+        version: tuple[int, int] | None
+        seeded_version: tuple[int, int] | None
+        marks: revert.Marks | None
+        read_only: bool
+        inserts_only: bool
+        query_only: bool
 
-    def __init__(self, connection_provider: "ConnectionProvider"):
+    def __init__(
+        self,
+        connection_provider: "ConnectionProvider",
+        read_only: bool = False,
+        inserts_only: bool = True,
+    ):
         """Initialize a new Snapshot instance.
 
         Args:
             connection_provider (MockConnectionProvider): The connection provider for the database.
+            read_only (bool): Whether to make the database read-only once seeded.
+            inserts_only (bool): Whether the seed is expected to only run INSERTs, see
+                                 revert.updates_rows(). When not, a read-only
+                                 context takes a snapshot like any other.
         """
         self.connection_provider = connection_provider
+        self.version = None
+        self.seeded_version = None
+        self.marks = None
+        self.read_only = read_only
+        self.inserts_only = inserts_only
+        self.query_only = False
+        self.standby = None
+        self.swapped = False
+        self.recreated = False
         super().__init__()
 
+    @property
+    def reverts(self) -> bool:
+        """Whether the context reverts its seed rather than taking a snapshot."""
+        return (
+            self.read_only
+            and self.inserts_only
+            and self.connection_provider.snapshot_strategy != "copy_on_write"
+        )
+
     def __enter__(self):
         """Enter the context manager, creating a snapshot of the current database state.
 
-        This method creates a temporary file and dumps the current database state into it.
-
         Returns:
             Snapshot: The Snapshot instance.
         """
-        tmpfile = tempfile.NamedTemporaryFile()
-        self.tmpfile_name = self.enter_context(tmpfile).name
-        with self.connection_provider.get_engine().connect() as conn:
-            with open(self.tmpfile_name, "w") as f:
-                for line in conn.connection.iterdump():
-                    f.write(f"{line}\n")
+        strategy = self.connection_provider.snapshot_strategy
+        self.query_only = self.connection_provider.set_query_only(False)
+        with profiling.phase("snapshot"):
+            if self.reverts:
+                self._mark()
+            elif strategy == "copy_on_write":
+                self._push()
+            elif strategy == "dump":
+                self._dump()
+                self._mark()
+            elif strategy == "swap" and not forked:
+                self._backup()
+                self._mark()
+                self._prepare_standby()
+            else:
+                self._backup()
+                self._mark()
         return super().__enter__()
 
     def __exit__(self, exc_type, exc_value, traceback):
         """Exit the context manager, restoring the database to the snapshotted state.
 
-        This method resets the connection provider and restores the database state
-        from the temporary file created in __enter__.
+        This method restores the database state captured in __enter__, in place.
 
         Args:
             exc_type: The type of the exception that caused the context to be exited.
             exc_value: The instance of the exception that caused the context to be exited.
             traceback: A traceback object encoding the stack trace.
         """
-        self.connection_provider.reset()
+        strategy = self.connection_provider.snapshot_strategy
+        self.connection_provider.set_query_only(False)
+        try:
+            with profiling.phase("restore"):
+                if self.connection_provider.locked():
+                    self._recreate()
+                elif self.reverts:
+                    self._revert_seed()
+                elif strategy == "copy_on_write":
+                    self._pop()
+                elif self.standby is not None:
+                    if self.connection_provider.data_version() != self.version:
+                        self._swap()
+                elif not self._reverted():
+                    if strategy == "dump":
+                        self._restore_dump()
+                    else:
+                        self._restore_backup()
+        finally:
+            self._unwatch()
+            self.connection_provider.set_query_only(self.query_only)
+
+        return super().__exit__(exc_type, exc_value, traceback)
+
+    def seeded(self):
+        """Mark the end of the context's seed, see _reverted(), and make the database
+        read-only if the context is."""
+        if self.version is not None:
+            self.seeded_version = self.connection_provider.data_version()
+        self._unwatch()
+        if self.read_only:
+            self.connection_provider.set_query_only(True)
+
+    def _mark(self):
+        """Mark the data version and the tables, to tell on exit what was written, and
+        watch the statements run until seeded(), see revert.py."""
+        self.version = self.connection_provider.data_version()
+        self.marks = revert.mark(self.connection_provider.get_watcher_connection())
+        self.connection_provider.watch_inserts(self.marks)
+
+    def _unwatch(self):
+        if self.marks is not None:
+            self.connection_provider.unwatch_inserts(self.marks)
+
+    def _reverted(self) -> bool:
+        """Skip the restore if nothing was committed within the context, or revert the
+        seed's inserts if nothing else was.
+
+        Returns:
+            bool: Whether the database is back to the snapshotted state.
+        """
+        version = self.connection_provider.data_version()
+        if version == self.version:
+            return True
+        if (
+            self.marks is None
+            or self.seeded_version is None
+            or version != self.seeded_version
+        ):
+            return False
+        return revert.revert(
+            self.connection_provider.get_watcher_connection(), self.marks
+        )
+
+    def _revert_seed(self):
+        """Revert the seed of a read-only context, which has no snapshot to restore.
+
+        Raises:
+            RuntimeError: If the database was written other than by INSERTs appending
+                          rows, which query_only prevents on the provider's
+                          connections once seeded, and revert.updates_rows() did not
+                          predict, e.g. from the ORM events of the code under test.
+        """
+        if self.connection_provider.data_version() == self.version:
+            return
+        if not revert.revert(
+            self.connection_provider.get_watcher_connection(), self.marks
+        ):
+            raise RuntimeError(
+                "The database was written within a read_only db_mock context, and "
+                "cannot be restored"
+            )
+
+    def _recreate(self):
+        """Restore the snapshot into a new database, as another connection holds a lock
+        on the current one, see MockConnectionProvider.locked(). Whichever session
+        holds it keeps the current database.
+
+        Without a copy of the database, i.e. with "copy_on_write" or in a read_only
+        context, its committed state is carried over to the new database first, and
+        restored there in place.
+
+        Raises:
+            RuntimeError: If the lock is a pending write on an in-memory database,
+                          which keeps its committed state from being read.
+        """
+        provider = self.connection_provider
+        if self.standby is not None:
+            # the standby database is a new database already
+            self._swap()
+            return
+
+        if not (self.reverts or provider.snapshot_strategy == "copy_on_write"):
+            provider.replace_database()
+            self.recreated = True
+            if provider.snapshot_strategy == "dump":
+                self._restore_dump()
+            else:
+                self._restore_backup()
+            return
+
+        if provider.in_memory and provider.locked(writes_only=True):
+            raise RuntimeError(
+                "A session left open with a pending write locks the in-memory "
+                "database, which cannot be restored without a snapshot. Close "
+                "sessions before their db_mock context exits."
+            )
+        with (
+            closing(sqlite3.connect(":memory:")) as current,
+            closing(sqlite3.connect(":memory:")) as bookkeeping,
+        ):
+            provider.get_watcher_connection().backup(current)
+            if not self.reverts:
+                # the new database gets new copy-on-write bookkeeping too
+                with closing(
+                    copy_on_write.connect(provider.copy_on_write_database())
+                ) as conn:
+                    conn.backup(bookkeeping)
+            provider.replace_database()
+            self.recreated = True
+            with provider.get_engine().connect() as conn:
+                current.backup(conn.connection.dbapi_connection)
+            if not self.reverts:
+                with closing(
+                    copy_on_write.connect(provider.copy_on_write_database())
+                ) as conn:
+                    bookkeeping.backup(conn)
+        if self.reverts:
+            self._revert_seed()
+        else:
+            self._pop()
+
+    def _dump(self):
+        """Dump the current database state as SQL text into a temporary file."""
+        tmpfile = tempfile.NamedTemporaryFile()
+        self.tmpfile_name = self.enter_context(tmpfile).name
         with self.connection_provider.get_engine().connect() as conn:
+            with open(self.tmpfile_name, "w") as f:
+                for line in conn.connection.iterdump():
+                    f.write(f"{line}\n")
+        if profiling.active():
+            profiling.add_snapshot_bytes(os.path.getsize(self.tmpfile_name))
+
+    def _restore_dump(self):
+        """Replay the SQL text dump into a spare in-memory database, and copy its
+        pages over the database."""
+        with closing(sqlite3.connect(":memory:")) as restored:
             with open(self.tmpfile_name) as f:
-                conn.connection.executescript(f.read())
+                restored.executescript(f.read())
+            with self.connection_provider.get_engine().connect() as conn:
+                restored.backup(conn.connection.dbapi_connection)
 
-        return super().__exit__(exc_type, exc_value, traceback)
+    def _backup(self):
+        """Copy the current database pages into a spare in-memory database."""
+        # the async snapshot enters and exits from different worker threads
+        backup = sqlite3.connect(":memory:", check_same_thread=False)
+        self.backup = self.enter_context(closing(backup))
+        with self.connection_provider.get_engine().connect() as conn:
+            conn.connection.dbapi_connection.backup(self.backup)
+        if profiling.active():
+            profiling.add_snapshot_bytes(database_size(self.backup))
+
+    def _restore_backup(self):
+        """Copy the snapshotted pages back over the database."""
+        with self.connection_provider.get_engine().connect() as conn:
+            self.backup.backup(conn.connection.dbapi_connection)
+
+    def _prepare_standby(self):
+        """Copy the snapshot into a standby database file, in the background."""
+        database = self.connection_provider.get_engine().url.database
+        # next to the database, for the swap to be an atomic rename
+        fd, self.standby_name = tempfile.mkstemp(
+            dir=os.path.dirname(database), suffix=".standby"
+        )
+        os.close(fd)
+        self.callback(remove_file, self.standby_name)
+        self.standby = STANDBY_EXECUTOR.submit(
+            copy_to_file, self.backup, self.standby_name
+        )
+        self.callback(wait, [self.standby])
+
+    def _swap(self):
+        """Replace the database with the standby database, once it is ready."""
+        self.standby.result()
+        self.connection_provider.swap_database(self.standby_name)
+        self.swapped = True
+
+    def _push(self):
+        """Open a copy-on-write layer for the context."""
+        with self.connection_provider.get_engine().connect() as conn:
+            copy_on_write.push(conn)
+
+    def _pop(self):
+        """Restore the tables written in the context's copy-on-write layer."""
+        with self.connection_provider.get_engine().connect() as conn:
+            copy_on_write.pop(conn)
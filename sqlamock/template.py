@@ -0,0 +1,568 @@
+import getpass
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import sys
+import tempfile
+import warnings
+from contextlib import closing, contextmanager
+from functools import cache, cached_property
+from inspect import iscode, isfunction, unwrap
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import sqlalchemy
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import ColumnDefault, CreateTable, ExecutableDDLElement
+
+from .connection_provider import sqlite_connection
+
+if sys.platform == "win32":  # pragma: no cover - Windows
+    import msvcrt
+else:
+    import fcntl
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from contextlib import AbstractContextManager
+
+    from sqlalchemy import Connection, Engine, MetaData, Table
+    from sqlalchemy.orm import Mapper
+
+# bump whenever init_database changes the schema it builds for the same metadata
+TEMPLATE_VERSION = 1
+
+# the mapper events the ORM dispatches while flushing the seeded instances
+PERSISTENCE_EVENTS = ("before_insert", "after_insert", "before_update", "after_update")
+
+
+def default_cache_dir() -> Path:
+    # one directory per user, as anyone can create files in the system temp dir
+    return Path(tempfile.gettempdir()) / f"sqlamock-{user_id()}"
+
+
+def user_id() -> str:
+    if hasattr(os, "getuid"):
+        return str(os.getuid())
+    return getpass.getuser()  # pragma: no cover - Windows
+
+
+@cache
+def is_private(cache_dir: Path) -> bool:
+    """Create the cache directory, accessible to the current user only, and check
+    that it belongs to them and that no one else can write to it, before its
+    templates are trusted. Checked once per directory and process.
+
+    Args:
+        cache_dir (Path): The directory holding the cache files.
+
+    Returns:
+        bool: Whether templates can be read from and written to the directory.
+    """
+    try:
+        cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        info = cache_dir.lstat()
+    except OSError:
+        # an unwritable cache dir cannot hold templates either
+        return False
+    private = stat.S_ISDIR(info.st_mode)
+    if hasattr(os, "getuid"):
+        private = private and info.st_uid == os.getuid() and not info.st_mode & 0o022
+    if not private:
+        warnings.warn(
+            f"Ignoring the sqlamock cache directory {cache_dir}, which does not "
+            "belong to the current user or is writable by others",
+            stacklevel=2,
+        )
+    return private
+
+
+@contextmanager
+def file_lock(path: Path) -> "Iterator[None]":
+    """Hold an exclusive lock on the given file, shared by every process on the host.
+
+    pytest-xdist workers use it so that only the first of them builds a template,
+    while the others wait and then copy it.
+
+    Args:
+        path (Path): The lock file, created if missing.
+    """
+    if not is_private(path.parent):
+        # templates are neither read nor written, so there is nothing to guard
+        yield
+        return
+    try:
+        lock_file = open(path, "a+b")
+    except OSError:
+        yield
+        return
+
+    with lock_file:
+        lock_file.seek(0)
+        if sys.platform == "win32":  # pragma: no cover - Windows
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":  # pragma: no cover - Windows
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_atomic(cache_dir: Path, path: Path, write: "Callable[[str], object]") -> bool:
+    """Write a cache file next to its final path and move it into place, so readers
+    never see a partial file.
+
+    Args:
+        cache_dir (Path): The directory holding the cache files.
+        path (Path): The final path of the file.
+        write (Callable[[str], object]): Writes the content to the given temporary
+                                         path. Its result is ignored.
+
+    Returns:
+        bool: Whether the file was written. The cache is an optimization, so I/O
+              errors are swallowed rather than failing tests.
+    """
+    if not is_private(cache_dir):
+        return False
+    try:
+        fd, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        os.close(fd)
+    except OSError:
+        return False
+
+    try:
+        write(tmp_name)
+        os.replace(tmp_name, path)
+    except (OSError, sqlite3.Error):
+        Path(tmp_name).unlink(missing_ok=True)
+        return False
+    return True
+
+
+def backup_to(engine: "Engine", file_name: str):
+    """Copy the engine's database into the given SQLite file with the backup API."""
+    with engine.connect() as conn:
+        with closing(sqlite3.connect(file_name)) as target:
+            sqlite_connection(conn).backup(target)
+
+
+def restore_from(engine: "Engine", path: Path):
+    """Copy the given SQLite file over the engine's database with the backup API."""
+    with engine.connect() as conn:
+        with closing(sqlite3.connect(path)) as source:
+            source.backup(sqlite_connection(conn))
+
+
+def quote(name: str) -> str:
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def tables_are_empty(conn: "Connection", table_names: "Iterable[str]") -> bool:
+    """Check that none of the given tables holds a row, in a single query per chunk.
+
+    Args:
+        conn (Connection): A (sync) connection to the mocked database.
+        table_names (Iterable[str]): The tables to check.
+
+    Returns:
+        bool: Whether all the tables are empty.
+    """
+    probes = [f"SELECT 1 FROM {quote(name)}" for name in table_names]
+    # stay below SQLite's limit of 500 terms in a compound SELECT
+    for start in range(0, len(probes), 400):
+        query = " UNION ALL ".join(probes[start : start + 400])
+        if conn.exec_driver_sql(f"{query} LIMIT 1").first():
+            return False
+    return True
+
+
+def copy_tables(
+    conn: "Connection", path: Path, alias: str, tables: "Iterable[Table]"
+) -> bool:
+    """Copy the rows of the given tables from a SQLite file into the connection's
+    database, with ATTACH and one INSERT ... SELECT per table.
+
+    The rows never go through Python, SQLite copies them from page to page. Tables
+    that already hold rows could conflict with the copied primary keys, so nothing
+    is copied unless all of them are empty.
+
+    Args:
+        conn (Connection): A (sync) connection to the mocked database.
+        path (Path): The SQLite file holding the rows, with the same schema.
+        alias (str): The schema name the file is attached as.
+        tables (Iterable[Table]): The tables to copy, in foreign key order.
+
+    Returns:
+        bool: Whether the rows were copied.
+    """
+    tables = list(tables)
+    if not tables_are_empty(conn, [table.name for table in tables]):
+        return False
+
+    attached = {row[1] for row in conn.exec_driver_sql("PRAGMA database_list")}
+    if alias not in attached:
+        try:
+            conn.exec_driver_sql(f"ATTACH DATABASE ? AS {quote(alias)}", (str(path),))
+        except OperationalError:
+            # e.g. too many attached databases
+            return False
+
+    for table in tables:
+        columns = ", ".join(quote(column.name) for column in table.columns)
+        conn.exec_driver_sql(
+            f"INSERT INTO main.{quote(table.name)} ({columns}) "
+            f"SELECT {columns} FROM {quote(alias)}.{quote(table.name)}"
+        )
+    return True
+
+
+def detach(conn: "Connection", alias: str):
+    """Detach the database attached by copy_tables.
+
+    SQLite cannot detach a database inside a transaction, e.g. on the pinned
+    connection of "savepoint" isolation. It then stays attached, and copy_tables
+    reuses it.
+    """
+    try:
+        conn.exec_driver_sql(f"DETACH DATABASE {quote(alias)}")
+    except OperationalError:
+        pass
+
+
+def describe_function(function: object) -> str:
+    module = getattr(function, "__module__", "")
+    name = getattr(function, "__qualname__", type(function).__qualname__)
+    code = getattr(function, "__code__", None)
+    if code is None:
+        return f"{module}.{name}"
+    # nested code objects are described by their address, which changes every run
+    constants = tuple(constant for constant in code.co_consts if not iscode(constant))
+    return f"{module}.{name}:{code.co_code.hex()}:{constants!r}"
+
+
+def describe_listener(listener: object) -> str:
+    """Describe an event listener for metadata_hash and mapper_hash: the statement of
+    a DDL element, or the qualified name, bytecode and constants of a function and of
+    the functions it wraps."""
+    if isinstance(listener, ExecutableDDLElement):
+        return str(listener)
+    if callable(listener):
+        listener = unwrap(listener)
+    description = describe_function(listener)
+    # SQLAlchemy wraps mapper event listeners in closures over the listeners
+    for cell in getattr(listener, "__closure__", None) or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:  # an empty cell
+            continue
+        if isfunction(contents):
+            description += f"({describe_function(contents)})"
+    return description
+
+
+def metadata_hash(metadata: "MetaData") -> str:
+    """Hash the SQLite DDL that init_database builds for the given metadata.
+
+    The versions of SQLAlchemy and SQLite, which compile and run the DDL, and the
+    listeners of the metadata's and tables' DDL events, which can add to it, are
+    hashed too.
+
+    Args:
+        metadata (MetaData): The SQLAlchemy metadata of the mocked schemas.
+
+    Returns:
+        str: A hex digest identifying the schema.
+    """
+    dialect = sqlite.dialect()
+    digest = hashlib.sha256(f"sqlamock-template-{TEMPLATE_VERSION}".encode())
+    digest.update(f"{sqlalchemy.__version__}:{sqlite3.sqlite_version}".encode())
+    for target in (metadata, *metadata.sorted_tables):
+        for event_name in ("before_create", "after_create"):
+            for listener in getattr(target.dispatch, event_name):
+                digest.update(f"{event_name}:{describe_listener(listener)}".encode())
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        # init_database swaps postgresql_where indexes for equivalent sqlite_where
+        # ones, so describe indexes in a way that is stable across that swap
+        indexes = set()
+        for index in table.indexes:
+            where = index.dialect_options["sqlite"].get("where")
+            if where is None:
+                where = index.dialect_options["postgresql"].get("where")
+            columns = tuple(column.name for column in index.columns)
+            indexes.add((index.name or "", index.unique, columns, str(where)))
+        digest.update(repr(sorted(indexes)).encode())
+    return digest.hexdigest()
+
+
+def mapper_hash(mappers: "Iterable[Mapper]") -> str:
+    """Hash the ORM code that seeding runs through for the given mappers.
+
+    Seed templates store the rows as the ORM inserted them, so the listeners of the
+    mappers' persistence and init events, their validators and the Python-side
+    defaults of their columns are hashed along with the schema, see
+    DBMockBase.seed_template.
+
+    Args:
+        mappers (Iterable[Mapper]): The mappers of the seeded ORM classes.
+
+    Returns:
+        str: A hex digest identifying the ORM code.
+    """
+    digest = hashlib.sha256()
+    for mapper in sorted(
+        mappers,
+        key=lambda mapper: (mapper.class_.__module__, mapper.class_.__qualname__),
+    ):
+        digest.update(f"mapper:{mapper.class_.__qualname__}".encode())
+        for event_name in PERSISTENCE_EVENTS:
+            for listener in getattr(mapper.dispatch, event_name):
+                digest.update(f"{event_name}:{describe_listener(listener)}".encode())
+        for listener in mapper.class_manager.dispatch.init:
+            digest.update(f"init:{describe_listener(listener)}".encode())
+        for key, (validator, _) in sorted(mapper.validators.items()):
+            digest.update(f"validates:{key}:{describe_listener(validator)}".encode())
+        for column in mapper.columns:
+            for default in (column.default, column.onupdate):
+                if not isinstance(default, ColumnDefault):
+                    continue
+                if default.is_callable:
+                    description = describe_listener(default.arg)
+                else:
+                    description = str(default.arg)
+                digest.update(f"default:{column.key}:{description}".encode())
+    return digest.hexdigest()
+
+
+class SchemaTemplate:
+    """The fully built, empty schema stored once as a SQLite file.
+
+    DBMock and AsyncDBMock build the schema with one DDL round trip per table and per
+    index. The result is saved as a template file keyed by a hash of the metadata, so
+    later providers, and later pytest processes, start from a page-level copy of the
+    template instead.
+
+    Not meant for public use.
+
+    Attributes:
+        metadata (MetaData): The SQLAlchemy metadata of the mocked schemas.
+        cache_dir (Path): The directory holding the template files.
+    """
+
+    if TYPE_CHECKING:
+        metadata: MetaData
+        cache_dir: Path
+
+    def __init__(self, metadata: "MetaData", cache_dir: "Path | str | None" = None):
+        """Initialize a new SchemaTemplate instance.
+
+        Args:
+            metadata (MetaData): The SQLAlchemy metadata of the mocked schemas.
+            cache_dir (Path | str | None): The directory holding the template files.
+                                           Defaults to a "sqlamock-<uid>" directory
+                                           in the system temporary directory. It is
+                                           ignored unless private, see is_private.
+        """
+        self.metadata = metadata
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+
+    @cached_property
+    def key(self) -> str:
+        # computed on first use, once init_database has adapted the metadata to SQLite
+        return metadata_hash(self.metadata)
+
+    @property
+    def path(self) -> Path:
+        return self.cache_dir / f"schema-{self.key}.sqlite"
+
+    def lock(self) -> "AbstractContextManager[None]":
+        """Lock the template across processes, while it is loaded or built."""
+        return file_lock(self.cache_dir / f"schema-{self.key}.lock")
+
+    def load(self, engine: "Engine") -> bool:
+        """Copy the template into the engine's database, if both exist and the
+        database has no tables yet.
+
+        Args:
+            engine (Engine): The (sync) engine of the mocked database.
+
+        Returns:
+            bool: Whether the template was loaded.
+        """
+        if not is_private(self.cache_dir) or not self.path.exists():
+            return False
+
+        with engine.connect() as conn:
+            dbapi_connection = sqlite_connection(conn)
+            has_tables = dbapi_connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1"
+            ).fetchone()
+            if has_tables:
+                return False
+
+            with closing(sqlite3.connect(self.path)) as template:
+                template.backup(dbapi_connection)
+        return True
+
+    def save(self, engine: "Engine"):
+        """Store the engine's database as the template.
+
+        Args:
+            engine (Engine): The (sync) engine of the freshly initialized database.
+        """
+        write_atomic(self.cache_dir, self.path, lambda name: backup_to(engine, name))
+
+
+class SeedTemplate:
+    """The database state seeded from a fixture file, stored as a SQLite file.
+
+    Session-level seed data is loaded once per pytest process, and with pytest-xdist
+    once per worker. The seeded database is saved with the primary keys of the seeded
+    rows, keyed by the schema and the content of the fixture file, so the first
+    worker seeds it and the other workers copy it with the backup API and load the
+    instances back by primary key.
+
+    Only a database without any row can start from a copy of a seed template.
+    Otherwise the template serves as the fixture file compiled into SQLite, and its
+    rows are copied next to the existing ones, see copy_rows and DBMock.from_file.
+
+    Not meant for public use.
+
+    Attributes:
+        schema_key (str): The key of the schema and ORM code, see metadata_hash and
+                          mapper_hash.
+        file_path (Path): The fixture file.
+        cache_dir (Path): The directory holding the template files.
+    """
+
+    if TYPE_CHECKING:
+        schema_key: str
+        file_path: Path
+        cache_dir: Path
+
+    def __init__(
+        self,
+        schema_key: str,
+        file_path: "Path | str",
+        cache_dir: "Path | str | None" = None,
+    ):
+        """Initialize a new SeedTemplate instance.
+
+        Args:
+            schema_key (str): The key of the schema and ORM code, see metadata_hash
+                              and mapper_hash.
+            file_path (Path | str): The fixture file.
+            cache_dir (Path | str | None): The directory holding the template files.
+        """
+        self.schema_key = schema_key
+        self.file_path = Path(file_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+
+    @cached_property
+    def key(self) -> str:
+        digest = hashlib.sha256(self.schema_key.encode())
+        digest.update(self.file_path.read_bytes())
+        return digest.hexdigest()
+
+    @property
+    def path(self) -> Path:
+        return self.cache_dir / f"seed-{self.key}.sqlite"
+
+    @property
+    def keys_path(self) -> Path:
+        return self.cache_dir / f"seed-{self.key}.json"
+
+    @property
+    def alias(self) -> str:
+        # the schema name of the template when copy_rows attaches it
+        return f"sqlamock_seed_{self.key[:16]}"
+
+    def lock(self) -> "AbstractContextManager[None]":
+        """Lock the template across processes, while it is loaded or seeded."""
+        return file_lock(self.cache_dir / f"seed-{self.key}.lock")
+
+    def read_keys(self) -> "dict[str, list[tuple]] | None":
+        """Read the primary keys of the seeded rows.
+
+        Returns:
+            dict[str, list[tuple]] | None: The primary keys of the seeded rows by table
+                                           name, or None when there is no template.
+        """
+        if not is_private(self.cache_dir):
+            return None
+        if not self.path.exists() or not self.keys_path.exists():
+            return None
+        # JSON holds the primary keys as lists
+        return {
+            table_name: [tuple(key) for key in table_keys]
+            for table_name, table_keys in json.loads(self.keys_path.read_text()).items()
+        }
+
+    def load(self, engine: "Engine") -> "dict[str, list[tuple]] | None":
+        """Copy the seeded database over the engine's database.
+
+        Args:
+            engine (Engine): The (sync) engine of the mocked database.
+
+        Returns:
+            dict[str, list[tuple]] | None: The primary keys of the seeded rows by table
+                                           name, or None when there is no template.
+        """
+        keys = self.read_keys()
+        if keys is not None:
+            restore_from(engine, self.path)
+        return keys
+
+    def copy_rows(
+        self, conn: "Connection", metadata: "MetaData"
+    ) -> "dict[str, list[tuple]] | None":
+        """Copy the seeded rows into the connection's database, next to its rows.
+
+        Unlike load, this works inside a transaction and keeps the rows of the other
+        tables, see copy_tables.
+
+        Args:
+            conn (Connection): A (sync) connection to the mocked database. The caller
+                               commits and detaches the template.
+            metadata (MetaData): The SQLAlchemy metadata of the mocked schemas.
+
+        Returns:
+            dict[str, list[tuple]] | None: The primary keys of the copied rows by table
+                                           name, or None when nothing was copied.
+        """
+        keys = self.read_keys()
+        if keys is None:
+            return None
+        tables = [table for table in metadata.sorted_tables if keys.get(table.name)]
+        if not copy_tables(conn, self.path, self.alias, tables):
+            return None
+        return keys
+
+    def save(self, engine: "Engine", keys: "dict[str, list[tuple]]"):
+        """Store the engine's freshly seeded database as the template.
+
+        Args:
+            engine (Engine): The (sync) engine of the seeded database.
+            keys (dict[str, list[tuple]]): The primary keys of the seeded rows by
+                                           table name.
+        """
+        try:
+            content = json.dumps(keys)
+        except (TypeError, ValueError):
+            # primary keys that do not round trip through JSON are not cached
+            return
+
+        # the database file is only moved into place once its keys are
+        if write_atomic(
+            self.cache_dir, self.keys_path, lambda name: Path(name).write_text(content)
+        ):
+            write_atomic(
+                self.cache_dir, self.path, lambda name: backup_to(engine, name)
+            )
@@ -1,5 +1,13 @@
-from typing import TypeVar
+from typing import Literal, TypeVar
 
 from sqlalchemy.orm import DeclarativeBase
 
 BaseType = TypeVar("BaseType", bound=DeclarativeBase)
+
+SnapshotStrategy = Literal["dump", "backup", "copy_on_write", "swap"]
+
+IsolationMode = Literal["snapshot", "savepoint"]
+
+PragmaProfile = Literal["fast"]
+
+NPlusOneAction = Literal["raise", "warn"]
@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import event, func, select
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet, Soulmates, Species
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+DATA_FILE = Path(__file__).parent.parent / "data" / "example_app.json"
+
+# children first, bulk mode inserts in foreign key order regardless
+DATA = {
+    "soulmates": [{"human_id": 1, "pet_id": 2}],
+    "pet": [
+        {"name": "Milo", "species": "DOG"},
+        {"name": "Luna", "species": Species.CAT},
+    ],
+    "human": [{"name": "John"}],
+}
+
+
+@pytest.fixture(scope="module")
+def db_mock_connection() -> "Iterator[MockConnectionProvider]":
+    provider = MockConnectionProvider()
+    yield provider
+    provider.reset()
+
+
+@pytest.fixture(scope="module")
+def db_mock(db_mock_connection: "MockConnectionProvider") -> "DBMock":
+    return DBMock(Base, db_mock_connection, Patches())
+
+
+def test_bulk_rows_get_their_generated_values(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_dict(DATA, bulk=True) as data:
+        assert [pet.id for pet in data[Pet]] == [1, 2]
+        assert data["pet"][1].species is Species.CAT
+        assert data[Human][0].id == 1
+        assert data[Soulmates][0].pet_id == 2
+
+        with db_mock_connection.get_session() as session:
+            soulmates = session.scalars(select(Soulmates)).one()
+            assert soulmates.pet.name == "Luna"
+
+    with db_mock_connection.get_session() as session:
+        assert session.scalar(select(func.count()).select_from(Pet)) == 0
+
+
+def test_bulk_from_file(db_mock: "DBMock"):
+    with db_mock.from_file(DATA_FILE, bulk=True) as data:
+        assert data[Human][0].name == "John"
+        assert data[Pet][0].species is Species.DOG
+
+
+def test_bulk_rejects_unknown_tables(db_mock: "DBMock"):
+    with pytest.raises(KeyError):
+        with db_mock.from_dict({"unknown": [{}]}, bulk=True):
+            pass
+
+
+def test_seeded_instances_are_reloaded_per_table(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    db_mock.init_database()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_mock_connection.get_engine()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with db_mock.from_orm(
+            [Pet(name=f"Pet {i}", species=Species.DOG) for i in range(50)]
+            + [Human(name="John")]
+        ) as data:
+            selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+            assert len(selects) == 2
+            assert data[Pet][49].id == 50
+            assert data[Human][0].name == "John"
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.mark.asyncio
+async def test_async_bulk_rows_get_their_generated_values(
+    make_async_provider, async_count_humans
+):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches())
+
+    async with db_mock.from_dict(DATA, bulk=True) as data:
+        assert [pet.id for pet in data[Pet]] == [1, 2]
+        assert data[Soulmates][0].human_id == data[Human][0].id
+
+    assert await async_count_humans(provider) == 0
+    await provider.get_async_engine().dispose()
@@ -0,0 +1,168 @@
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import Integer, String, func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from sqlamock import columnar
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.data_interface import LazyMockDataInterface
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet, Soulmates, Species
+from tests.index_tests.index_schemas import IndexBase, OrderItem, User
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class DefaultsBase(DeclarativeBase):
+    pass
+
+
+class Account(DefaultsBase):
+    __tablename__ = "account"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    status: Mapped[str] = mapped_column(String, server_default="open")
+
+
+DATA = {
+    "pet": [
+        {"name": "Milo", "species": "DOG"},
+        {"name": "Luna", "species": "CAT"},
+        {"name": "Zoë", "species": "CAT"},
+    ],
+    "human": [{"name": "John"}, {"name": "Jane"}],
+    "soulmates": [{"human_id": 2, "pet_id": 3}],
+}
+
+
+@pytest.fixture
+def fixture_file(tmp_path: "Path") -> "Path":
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps(DATA))
+    output_path = tmp_path / "data.sqlamock"
+    columnar.convert(json_path, output_path, Base)
+    return output_path
+
+
+def test_columnar_fixture_is_loaded_by_from_file(fixture_file: "Path", make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+
+    assert columnar.is_columnar(fixture_file)
+    with db_mock.from_file(fixture_file) as data:
+        assert isinstance(data, LazyMockDataInterface)
+        assert [pet.name for pet in data[Pet]] == ["Milo", "Luna", "Zoë"]
+        assert data[Pet][2].species is Species.CAT
+        assert [human.id for human in data["human"]] == [1, 2]
+        assert data[Soulmates][0].human.name == "Jane"
+
+    with provider.get_session() as session:
+        assert session.scalar(select(func.count()).select_from(Pet)) == 0
+
+
+def test_explicit_primary_keys_are_kept(tmp_path: "Path", make_provider):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps({"human": [{"id": 7, "name": "John"}]}))
+    output_path = tmp_path / "data.sqlamock"
+    columnar.convert(json_path, output_path, Base)
+
+    db_mock = DBMock(Base, make_provider(), Patches(), schema_template=False)
+    with db_mock.from_file(output_path) as data:
+        assert data.pending_keys == {"human": [(7,)]}
+        assert data[Human][0].name == "John"
+
+
+def test_nulls_defaults_and_composite_keys(tmp_path: "Path", make_provider):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(
+        json.dumps(
+            {
+                "user": [
+                    {"email": "a@example.com", "username": "a"},
+                    {"email": "b@example.com", "username": "b", "active": False},
+                ],
+                "order_item": [
+                    {"order_id": 1, "item_id": 2, "quantity": 3, "price": 4},
+                    {"id": 9, "order_id": 1, "item_id": 3, "quantity": 1, "price": 1},
+                ],
+            }
+        )
+    )
+    output_path = tmp_path / "data.sqlamock"
+    columnar.convert(json_path, output_path, IndexBase)
+
+    db_mock = DBMock(IndexBase, make_provider(), Patches(), schema_template=False)
+    with db_mock.from_file(output_path) as data:
+        assert [user.active for user in data[User]] == [True, False]
+        assert data.pending_keys["order_item"] == [(1, 2), (1, 3)]
+        assert [item.id for item in data[OrderItem]] == [None, 9]
+
+
+def convert_accounts(tmp_path: "Path", rows: list[dict]) -> "Path":
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps({"account": rows}))
+    output_path = tmp_path / "data.sqlamock"
+    columnar.convert(json_path, output_path, DefaultsBase)
+    return output_path
+
+
+def test_omitted_columns_take_their_server_default(tmp_path: "Path", make_provider):
+    output_path = convert_accounts(
+        tmp_path,
+        [{"name": "a"}, {"name": "b", "status": "closed"}, {"name": "c"}],
+    )
+
+    db_mock = DBMock(DefaultsBase, make_provider(), Patches(), schema_template=False)
+    with db_mock.from_file(output_path) as data:
+        assert [account.status for account in data[Account]] == [
+            "open",
+            "closed",
+            "open",
+        ]
+
+
+def test_given_and_generated_primary_keys_can_be_mixed(tmp_path: "Path", make_provider):
+    output_path = convert_accounts(
+        tmp_path,
+        [{"name": "a"}, {"id": 10, "name": "b"}, {"name": "c"}, {"id": 5, "name": "d"}],
+    )
+
+    db_mock = DBMock(DefaultsBase, make_provider(), Patches(), schema_template=False)
+    with db_mock.from_file(output_path) as data:
+        assert data.pending_keys == {"account": [(1,), (10,), (11,), (5,)]}
+        assert [account.name for account in data[Account]] == ["a", "b", "c", "d"]
+
+
+def test_mixed_column_values_are_rejected(tmp_path: "Path"):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps({"human": [{"name": "John"}, {"name": 1}]}))
+
+    with pytest.raises(ValueError, match="human.name mixes int, str values"):
+        columnar.convert(json_path, tmp_path / "data.sqlamock", Base)
+
+
+def test_columns_are_checked_against_the_schema(fixture_file: "Path", make_provider):
+    provider = make_provider()
+    DBMock(IndexBase, provider, Patches(), schema_template=False).init_database()
+
+    with provider.get_session() as session:
+        with pytest.raises(ValueError, match="Table human does not exist"):
+            columnar.load(session.connection(), fixture_file, IndexBase.metadata)
+
+
+@pytest.mark.asyncio
+async def test_async_db_mock_loads_columnar_fixtures(
+    fixture_file: "Path", make_async_provider
+):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), schema_template=False)
+
+    async with db_mock.from_file(fixture_file) as data:
+        assert [pet.id for pet in data[Pet]] == [1, 2, 3]
+
+    await provider.get_async_engine().dispose()
@@ -1,5 +1,16 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import func, select
+
+from sqlamock.async_connection_provider import MockAsyncConnectionProvider
 from sqlamock.async_fixtures import db_mock_async, db_mock_async_connection
+from sqlamock.connection_provider import MockConnectionProvider
 from sqlamock.fixtures import db_mock, db_mock_connection, db_mock_patches
+from tests.example_tests.example_schemas import Human
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
 
 __all__ = [
     "db_mock_async_connection",
@@ -8,3 +19,80 @@ __all__ = [
     "db_mock_connection",
     "db_mock",
 ]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_cache_dir(tmp_path_factory: pytest.TempPathFactory):
+    """Keep the templates of DBMocks built without a cache_dir out of the user's
+    real cache directory, for the whole session."""
+    cache_dir = tmp_path_factory.mktemp("sqlamock-cache")
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("sqlamock.template.default_cache_dir", lambda: cache_dir)
+        yield cache_dir
+
+
+@pytest.fixture
+def make_provider() -> "Iterator[Callable[..., MockConnectionProvider]]":
+    """Build the connection providers of a test, reset once it is over, passed or
+    failed, so that a failing assertion does not leak their databases.
+
+    Yields:
+        Callable[..., MockConnectionProvider]: Builds a provider of the given class,
+            MockConnectionProvider by default, with the given keyword arguments.
+    """
+    providers = []
+
+    def make(
+        provider_class: "type[MockConnectionProvider]" = MockConnectionProvider,
+        **kwargs,
+    ) -> "MockConnectionProvider":
+        provider = provider_class(**kwargs)
+        providers.append(provider)
+        return provider
+
+    yield make
+    for provider in providers:
+        provider.reset()
+
+
+@pytest.fixture
+async def make_async_provider() -> (
+    "AsyncIterator[Callable[..., MockAsyncConnectionProvider]]"
+):
+    """Async counterpart of make_provider, resetting the providers with
+    async_reset()."""
+    providers = []
+
+    def make(
+        provider_class: "type[MockAsyncConnectionProvider]" = MockAsyncConnectionProvider,
+        **kwargs,
+    ) -> "MockAsyncConnectionProvider":
+        provider = provider_class(**kwargs)
+        providers.append(provider)
+        return provider
+
+    yield make
+    for provider in providers:
+        await provider.async_reset()
+
+
+@pytest.fixture
+def count_humans() -> "Callable[[MockConnectionProvider], int]":
+    """Count the humans in the database of a connection provider."""
+
+    def count(provider: "MockConnectionProvider") -> int:
+        with provider.get_session() as session:
+            return session.scalar(select(func.count()).select_from(Human))
+
+    return count
+
+
+@pytest.fixture
+def async_count_humans() -> "Callable[[MockAsyncConnectionProvider], Awaitable[int]]":
+    """Count the humans in the database of an async connection provider."""
+
+    async def count(provider: "MockAsyncConnectionProvider") -> int:
+        async with provider.get_async_session() as session:
+            return await session.scalar(select(func.count()).select_from(Human))
+
+    return count
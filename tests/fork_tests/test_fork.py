@@ -0,0 +1,244 @@
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="--sqlamock-fork is Linux only"
+)
+
+pytest_plugins = ["pytester"]
+
+CONFTEST = """
+import os
+
+import pytest
+from sqlalchemy import func, select
+
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human
+
+PARENT_PID = os.getpid()
+SEEDS = []
+
+@pytest.fixture(scope="session")
+def provider():
+    return MockConnectionProvider(in_memory=True)
+
+@pytest.fixture(scope="session")
+def db_mock(provider):
+    return DBMock(Base, provider, Patches())
+
+@pytest.fixture(scope="session", autouse=True)
+def baseline(db_mock):
+    with db_mock.from_orm([Human(name="John")]) as data:
+        SEEDS.append(os.getpid())
+        yield data
+
+@pytest.fixture
+def count_humans(provider):
+    def count():
+        with provider.get_session() as session:
+            return session.scalar(select(func.count()).select_from(Human))
+    return count
+"""
+
+
+def run_forked(pytester: pytest.Pytester, test_file: str, *args: str):
+    pytester.makeconftest(CONFTEST)
+    pytester.makepyfile(test_file)
+    pytester.syspathinsert(pytester.path.parent)
+    return pytester.runpytest(
+        "-p", "sqlamock.pytest_plugin", "--sqlamock-fork", "-p", "no:asyncio", *args
+    )
+
+
+def test_tests_write_to_their_own_copy_of_the_baseline(pytester: pytest.Pytester):
+    result = run_forked(
+        pytester,
+        """
+        import os
+
+        import pytest
+
+        from conftest import PARENT_PID, SEEDS
+        from tests.example_tests.example_schemas import Human
+
+        @pytest.mark.parametrize("name", ["Jane", "Jack"])
+        def test_humans(provider, count_humans, name):
+            assert os.getpid() != PARENT_PID
+            assert SEEDS == [PARENT_PID]
+            with provider.get_session() as session:
+                session.add(Human(name=name))
+                session.commit()
+            assert count_humans() == 2
+
+        def test_failures_are_reported():
+            assert "forked" == "parent"
+        """,
+    )
+
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines(["*AssertionError: assert 'forked' == 'parent'*"])
+
+
+def test_crashed_children_fail_their_test(pytester: pytest.Pytester):
+    result = run_forked(
+        pytester,
+        """
+        import os
+
+        def test_crash():
+            os._exit(3)
+
+        def test_after_the_crash(count_humans):
+            assert count_humans() == 1
+        """,
+    )
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*exited with status 3 before reporting*"])
+
+
+def test_unreadable_reports_fail_their_test(pytester: pytest.Pytester):
+    result = run_forked(
+        pytester,
+        """
+        import pickle
+
+        def test_truncated_report():
+            pickle.dump = lambda obj, file: file.write(pickle.dumps(obj)[:10])
+
+        def test_after_the_truncated_report(count_humans):
+            assert count_humans() == 1
+        """,
+    )
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*exited with status 0 and an unreadable report*"])
+
+
+def test_children_failing_to_make_their_report_fail_their_test(
+    pytester: pytest.Pytester,
+):
+    pytester.makepyfile(
+        failing_report="""
+        import os
+
+        import pytest
+
+        PARENT_PID = os.getpid()
+
+        @pytest.hookimpl(tryfirst=True)
+        def pytest_runtest_makereport(item, call):
+            if call.when == "call" and os.getpid() != PARENT_PID:
+                if item.name == "test_unreported":
+                    raise RuntimeError("no report")
+        """
+    )
+    pytester.syspathinsert()
+    result = run_forked(
+        pytester,
+        """
+        def test_unreported():
+            pass
+
+        def test_after_the_missing_report(count_humans):
+            assert count_humans() == 1
+        """,
+        "-p",
+        "failing_report",
+    )
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*exited with status 1 before reporting*"])
+
+
+@pytest.mark.parametrize(
+    ("args", "outcomes"),
+    [
+        ((), {"xfailed": 1, "skipped": 1}),
+        (("--runxfail",), {"failed": 1, "skipped": 1}),
+    ],
+)
+def test_outcomes_go_through_the_standard_protocol(
+    pytester: pytest.Pytester, args: "tuple[str, ...]", outcomes: "dict[str, int]"
+):
+    result = run_forked(
+        pytester,
+        """
+        import pytest
+
+        @pytest.mark.xfail(reason="not yet")
+        def test_expected_failure():
+            assert False
+
+        def test_skipped_in_the_child():
+            pytest.skip("skipped in the child")
+        """,
+        *args,
+    )
+
+    result.assert_outcomes(**outcomes)
+
+
+def test_profiles_are_sent_back(pytester: pytest.Pytester):
+    result = run_forked(
+        pytester,
+        """
+        def test_humans(db_mock):
+            with db_mock.from_dict({"human": [{"name": "Jane"}]}):
+                pass
+        """,
+        "--sqlamock-profile",
+    )
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["* in test_*.py::test_humans: *rows=1 *"])
+
+
+def test_async_providers_reconnect_in_the_child(pytester: pytest.Pytester):
+    pytester.makeconftest(
+        """
+        import pytest
+        import pytest_asyncio
+
+        from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+        from sqlamock.async_db_mock import AsyncDBMock
+        from sqlamock.patches import Patches
+        from tests.example_tests.example_schemas import Base, Human
+
+        @pytest.fixture(scope="session")
+        def provider():
+            return MockAsyncConnectionProvider(in_memory=True)
+
+        @pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+        async def baseline(provider):
+            db_mock = AsyncDBMock(Base, provider, Patches())
+            async with db_mock.from_orm([Human(name="John")]) as data:
+                yield data
+        """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+        from sqlalchemy import func, select
+
+        from tests.example_tests.example_schemas import Human
+
+        @pytest.mark.asyncio(loop_scope="session")
+        @pytest.mark.parametrize("name", ["Jane", "Jack"])
+        async def test_humans(provider, name):
+            async with provider.get_async_session() as session:
+                session.add(Human(name=name))
+                await session.commit()
+                count = select(func.count()).select_from(Human)
+                assert await session.scalar(count) == 2
+        """
+    )
+    pytester.syspathinsert(pytester.path.parent)
+
+    result = pytester.runpytest("-p", "sqlamock.pytest_plugin", "--sqlamock-fork")
+
+    result.assert_outcomes(passed=2)
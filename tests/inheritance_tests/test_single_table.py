@@ -0,0 +1,56 @@
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+
+
+class InheritanceBase(DeclarativeBase):
+    pass
+
+
+class Employee(InheritanceBase):
+    __tablename__ = "employee"
+    __mapper_args__ = {"polymorphic_on": "kind", "polymorphic_identity": "employee"}
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+    kind: Mapped[str] = mapped_column(String)
+
+
+class Manager(Employee):
+    __mapper_args__ = {"polymorphic_identity": "manager"}
+
+    reports: Mapped[int | None] = mapped_column(nullable=True)
+
+
+class Engineer(Employee):
+    __mapper_args__ = {"polymorphic_identity": "engineer"}
+
+    manager_id: Mapped[int | None] = mapped_column(
+        ForeignKey("employee.id"), nullable=True
+    )
+
+
+def test_subclasses_sharing_a_table_are_seeded(make_provider):
+    db_mock = DBMock(InheritanceBase, make_provider(), Patches())
+
+    assert db_mock.orm_classes == {"employee": Employee}
+    with db_mock.from_orm(
+        [Employee(name="John"), Manager(name="Jane", reports=2), Engineer(name="Jim")]
+    ) as data:
+        assert [type(employee) for employee in data[Employee]] == [Employee]
+        assert [manager.reports for manager in data[Manager]] == [2]
+        assert [engineer.name for engineer in data[Engineer]] == ["Jim"]
+
+    with db_mock.from_dict({"employee": [{"name": "Jack"}]}) as data:
+        assert [employee.kind for employee in data["employee"]] == ["employee"]
+
+
+async def test_async_subclasses_sharing_a_table_are_seeded(make_async_provider):
+    db_mock = AsyncDBMock(InheritanceBase, make_async_provider(), Patches())
+
+    async with db_mock.from_orm([Manager(name="Jane"), Employee(name="John")]) as data:
+        assert [manager.name for manager in data[Manager]] == ["Jane"]
+        assert [employee.name for employee in data[Employee]] == ["John"]
@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human
+
+
+def test_factories_route_to_the_innermost_context(make_provider):
+    patches = Patches()
+    outer = DBMock(Base, make_provider(), patches)
+    inner = DBMock(Base, make_provider(), patches)
+
+    with pytest.raises(LookupError):
+        patches.get_session()
+
+    with outer.from_orm([Human(name="John")]):
+        with inner.from_orm([Human(name="Jane")]):
+            with patches.get_session() as session:
+                assert session.scalars(select(Human.name)).all() == ["Jane"]
+        assert patches.get_engine() is outer.connection_provider.get_engine()
+
+    assert patches.routes.get() == ()
+
+
+def test_async_factories_need_an_async_provider(make_provider):
+    patches = Patches()
+    db_mock = DBMock(Base, make_provider(), patches)
+    with db_mock.from_orm([]):
+        with pytest.raises(TypeError, match="MockAsyncConnectionProvider"):
+            patches.get_async_session()
+        with pytest.raises(TypeError, match="MockAsyncConnectionProvider"):
+            patches.get_async_engine()
+
+
+def test_threads_route_to_the_context_they_run_in(make_provider):
+    patches = Patches()
+    db_mock = DBMock(Base, make_provider(), patches)
+    names = []
+    errors = []
+
+    def query():
+        try:
+            with patches.get_session() as session:
+                names.extend(session.scalars(select(Human.name)))
+        except LookupError as e:
+            errors.append(e)
+
+    with db_mock.from_orm([Human(name="John")]):
+        threads = [
+            threading.Thread(target=query),
+            threading.Thread(target=contextvars.copy_context().run, args=(query,)),
+        ]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+    assert names == ["John"]
+    assert len(errors) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_route_to_their_own_context(make_async_provider):
+    patches = Patches()
+    db_mocks = [AsyncDBMock(Base, make_async_provider(), patches) for _ in range(3)]
+
+    async def run_test(db_mock: "AsyncDBMock", name: str) -> list[str]:
+        async with db_mock.from_orm([Human(name=name)]):
+            await asyncio.sleep(0)
+            async with patches.get_async_session() as session:
+                return list(await session.scalars(select(Human.name)))
+
+    results = await asyncio.gather(
+        *(
+            run_test(db_mock, name)
+            for db_mock, name in zip(db_mocks, "ABC", strict=True)
+        )
+    )
+
+    assert results == [["A"], ["B"], ["C"]]
+    assert patches.counter == 0
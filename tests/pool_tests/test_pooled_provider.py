@@ -0,0 +1,94 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import func, select
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.async_pooled_connection_provider import PooledAsyncConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.pooled_connection_provider import PooledConnectionProvider
+from tests.example_tests.example_schemas import Base, Human
+
+
+def human_names(provider: "PooledConnectionProvider") -> list[str]:
+    with provider.get_session() as session:
+        return list(session.scalars(select(Human.name).order_by(Human.id)))
+
+
+def test_threads_run_on_their_own_database(make_provider):
+    provider = make_provider(PooledConnectionProvider)
+    db_mock = DBMock(Base, provider, Patches())
+    barrier = threading.Barrier(4)
+
+    def run_test(name: str) -> tuple[str, list[str]]:
+        with provider.worker() as worker:
+            with db_mock.from_orm([Human(name=name)]):
+                # every thread is inside its context at the same time
+                barrier.wait()
+                return worker.get_engine().url.database, human_names(provider)
+
+    with db_mock.from_orm([Human(name="John")]):
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(run_test, ["A", "B", "C", "D"]))
+
+        assert human_names(provider) == ["John"]
+
+    assert len({database for database, _ in results}) == 4
+    assert [names for _, names in results] == [
+        ["John", "A"],
+        ["John", "B"],
+        ["John", "C"],
+        ["John", "D"],
+    ]
+
+
+def test_pooled_databases_are_reused(make_provider):
+    provider = make_provider(PooledConnectionProvider)
+    db_mock = DBMock(Base, provider, Patches())
+
+    for name in ("A", "B"):
+        with provider.worker():
+            with db_mock.from_orm([Human(name=name)]):
+                assert human_names(provider) == [name]
+            assert human_names(provider) == []
+
+    assert len(provider.idle) == 1
+
+
+def test_reused_databases_follow_the_template(make_provider):
+    provider = make_provider(PooledConnectionProvider)
+    db_mock = DBMock(Base, provider, Patches())
+
+    with provider.worker():
+        with db_mock.from_orm([Human(name="A")]):
+            assert human_names(provider) == ["A"]
+
+    with db_mock.from_orm([Human(name="John")]):
+        with provider.worker():
+            assert human_names(provider) == ["John"]
+            with db_mock.from_orm([Human(name="B")]):
+                assert human_names(provider) == ["John", "B"]
+
+    with provider.worker():
+        assert human_names(provider) == []
+
+    assert len(provider.idle) == 1
+
+
+@pytest.mark.asyncio
+async def test_tasks_run_on_their_own_database(make_async_provider):
+    provider = make_async_provider(PooledAsyncConnectionProvider)
+    db_mock = AsyncDBMock(Base, provider, Patches())
+
+    async def run_test(name: str) -> int:
+        with provider.worker():
+            async with db_mock.from_orm([Human(name=name)]):
+                await asyncio.sleep(0)
+                async with provider.get_async_session() as session:
+                    return await session.scalar(select(func.count()).select_from(Human))
+
+    assert await asyncio.gather(*(run_test(name) for name in "ABC")) == [1, 1, 1]
+    assert len(provider.idle) == 3
@@ -0,0 +1,46 @@
+import pytest
+
+from sqlamock.connection_provider import MockConnectionProvider
+
+
+def read_pragmas(provider: "MockConnectionProvider") -> dict:
+    with provider.get_engine().connect() as conn:
+        return {
+            name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in ("journal_mode", "synchronous", "cache_size", "temp_store")
+        }
+
+
+def test_fast_profile_is_applied_by_default(make_provider):
+    pragmas = read_pragmas(make_provider())
+
+    assert pragmas == {
+        "journal_mode": "memory",
+        "synchronous": 0,
+        "cache_size": -64000,
+        "temp_store": 2,
+    }
+
+
+def test_pragmas_can_be_disabled(make_provider):
+    pragmas = read_pragmas(make_provider(pragmas=None))
+
+    assert pragmas["journal_mode"] == "delete"
+    assert pragmas["synchronous"] == 2
+
+
+def test_custom_pragmas_are_applied_as_is(make_provider):
+    provider = make_provider(pragmas={"synchronous": "NORMAL"})
+    pragmas = read_pragmas(provider)
+
+    assert pragmas["synchronous"] == 1
+    assert pragmas["journal_mode"] == "delete"
+
+
+@pytest.mark.asyncio
+async def test_async_engine_applies_the_profile(make_async_provider):
+    provider = make_async_provider()
+    async with provider.get_async_engine().connect() as conn:
+        result = await conn.exec_driver_sql("PRAGMA synchronous")
+        assert result.scalar() == 0
+    await provider.get_async_engine().dispose()
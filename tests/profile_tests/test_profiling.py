@@ -0,0 +1,108 @@
+import pytest
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human
+
+pytest_plugins = ["pytester"]
+
+PHASES = {"init", "snapshot", "seed", "refresh", "restore"}
+
+
+def test_on_profile_reports_each_context(make_provider):
+    profiles = []
+    db_mock = DBMock(Base, make_provider(), Patches(), on_profile=profiles.append)
+
+    with db_mock.from_orm([Human(name="John"), Human(name="Jack")]):
+        with db_mock.from_dict({"human": [{"name": "Jane"}]}, bulk=True):
+            pass
+
+    inner, outer = profiles
+    assert (outer.label, outer.rows) == ("from_orm", 2)
+    assert (inner.label, inner.rows) == ("from_dict", 1)
+    assert set(outer.phases) == PHASES
+    # bulk inserts return their generated values, nothing is refreshed
+    assert set(inner.phases) == PHASES - {"refresh"}
+    assert inner.snapshot_bytes >= outer.snapshot_bytes > 0
+    assert outer.total == pytest.approx(sum(outer.phases.values()))
+
+
+def test_savepoint_contexts_have_no_snapshot_size(make_provider):
+    profiles = []
+    db_mock = DBMock(
+        Base,
+        make_provider(isolation="savepoint"),
+        Patches(),
+        on_profile=profiles.append,
+    )
+
+    with db_mock.from_orm([Human(name="John")]):
+        pass
+
+    [profile] = profiles
+    assert set(profile.phases) == PHASES
+    assert profile.snapshot_bytes == 0
+
+
+async def test_async_on_profile_reports_each_context(make_async_provider):
+    profiles = []
+    db_mock = AsyncDBMock(
+        Base, make_async_provider(), Patches(), on_profile=profiles.append
+    )
+
+    async with db_mock.from_orm([Human(name="John")]):
+        pass
+
+    [profile] = profiles
+    assert (profile.label, profile.rows) == ("from_orm", 1)
+    assert set(profile.phases) == PHASES
+    assert profile.snapshot_bytes > 0
+
+
+def test_plugin_reports_the_slowest_contexts(pytester: pytest.Pytester):
+    pytester.makeconftest(
+        """
+        import pytest
+
+        from sqlamock.connection_provider import MockConnectionProvider
+        from sqlamock.db_mock import DBMock
+        from sqlamock.patches import Patches
+        from tests.example_tests.example_schemas import Base, Human
+
+        @pytest.fixture(scope="session")
+        def db_mock():
+            return DBMock(Base, MockConnectionProvider(), Patches())
+
+        @pytest.fixture
+        def john(db_mock):
+            with db_mock.from_orm([Human(name="John")]) as data:
+                yield data
+        """
+    )
+    pytester.makepyfile(
+        """
+        from tests.example_tests.example_schemas import Human
+
+        def test_humans(db_mock, john):
+            with db_mock.from_dict({"human": [{"name": "Jane"}]}):
+                pass
+        """
+    )
+    pytester.syspathinsert(pytester.path.parent)
+
+    result = pytester.runpytest(
+        "-p", "sqlamock.pytest_plugin", "--sqlamock-profile", "-p", "no:asyncio"
+    )
+
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*sqlamock profile*",
+            "2 contexts, *",
+            "*slowest 10 contexts*",
+            "*from_orm in john (fixture): init=*",
+            "*slowest 10 tests and fixtures*",
+        ]
+    )
+    result.stdout.fnmatch_lines(["*from_orm in test_*.py::test_humans: *"])
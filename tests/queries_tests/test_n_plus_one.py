@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import ForeignKey, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.n_plus_one import NPlusOneError, NPlusOneWarning
+from sqlamock.patches import Patches
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Author(Base):
+    __tablename__ = "author"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+class Book(Base):
+    __tablename__ = "book"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("author.id"))
+    author: Mapped[Author] = relationship(Author)
+
+
+def books(count: int) -> list:
+    return [Book(author=Author(name=f"Author {index}")) for index in range(count)]
+
+
+def list_authors(session) -> list[str]:
+    return [book.author.name for book in session.scalars(select(Book))]
+
+
+def test_lazy_loads_in_a_loop_raise(make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+
+    with pytest.raises(NPlusOneError, match=r"4 x 'SELECT author.*test_n_plus_one.py:"):
+        with db_mock.from_orm(books(4), n_plus_one=3):
+            with provider.get_session() as session:
+                list_authors(session)
+
+    # the seed of the context itself is never flagged
+    with db_mock.from_orm(books(4), n_plus_one=3):
+        with provider.get_session() as session:
+            session.scalars(select(Book)).all()
+
+
+def test_patches_enable_the_detection_globally(make_provider):
+    patches = Patches()
+    patches.detect_n_plus_one(threshold=2, action="warn")
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, patches, schema_template=False)
+
+    with pytest.warns(NPlusOneWarning, match="3 x"):
+        with db_mock.from_dict({"author": [{"name": "John"}]}):
+            with db_mock.from_orm(books(3)):
+                with provider.get_session() as session:
+                    list_authors(session)
+
+    # contexts can raise their threshold
+    with db_mock.from_orm(books(3), n_plus_one=3) as data:
+        with provider.get_session() as session:
+            list_authors(session)
+    assert data.queries.count == 4
+
+
+async def test_async_lazy_loads_are_traced_to_their_call_site(make_async_provider):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), schema_template=False)
+
+    with pytest.raises(NPlusOneError, match=r"test_n_plus_one.py:\d+"):
+        async with db_mock.from_orm(books(2), n_plus_one=1):
+            async with provider.get_async_session() as session:
+                await session.run_sync(list_authors)
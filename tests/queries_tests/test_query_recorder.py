@@ -0,0 +1,110 @@
+from sqlalchemy import select, update
+from sqlalchemy.engine.cursor import FullyBufferedCursorFetchStrategy
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.queries import QueryRecorder, normalize
+from tests.example_tests.example_schemas import Base, Human
+
+
+def test_normalize_collapses_parameters_and_literals():
+    assert normalize(
+        "SELECT *\n  FROM human WHERE id IN (?, ?, ?) AND name = 'Jo''e'"
+    ) == ("SELECT * FROM human WHERE id IN (?) AND name = ?")
+    assert normalize("INSERT INTO t_1 (a, b) VALUES (?, ?), (?, ?) RETURNING id") == (
+        "INSERT INTO t_1 (a, b) VALUES (?) RETURNING id"
+    )
+
+
+def test_contexts_record_the_queries_run_within(make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), record_queries=True)
+
+    with db_mock.from_orm([Human(name="John"), Human(name="Jane")]) as outer:
+        with db_mock.from_dict({"human": [{"name": "Jack"}]}) as inner:
+            with provider.get_session() as session:
+                for name in ("John", "Jane", "Jim"):
+                    session.scalars(select(Human).where(Human.name == name)).all()
+                session.execute(update(Human).values(name="Joe"))
+                session.commit()
+
+    # the seed of the inner context is not part of the outer one
+    assert outer.queries.count == inner.queries.count == 4
+    [selects, updates] = inner.queries.statements.values()
+    assert selects.statement.startswith("SELECT human.name, human.id FROM human")
+    assert (selects.count, selects.rows) == (3, 2)
+    assert (updates.count, updates.rows) == (1, 3)
+    assert inner.queries.duration > 0
+
+
+def test_queries_are_recorded_on_the_pinned_connection(make_provider):
+    provider = make_provider(isolation="savepoint")
+    db_mock = DBMock(Base, provider, Patches())
+
+    with db_mock.from_orm([Human(name="John")]) as data:
+        with provider.record_queries() as queries:
+            with provider.get_session() as session:
+                assert session.scalars(select(Human.name)).all() == ["John"]
+
+    assert data.queries is None
+    # the session runs in a SAVEPOINT of the pinned connection
+    assert queries.statements["SELECT human.name FROM human"].rows == 1
+    assert queries.count == 3
+
+
+def test_selects_are_buffered_to_count_their_rows(make_provider):
+    # fails on SQLAlchemy upgrades that change how results are fetched, see
+    # queries.buffer_rows
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches())
+
+    with db_mock.from_dict({"human": [{"name": "John"}, {"name": "Jane"}]}):
+        with provider.record_queries() as queries:
+            with provider.get_engine().connect() as conn:
+                result = conn.execute(select(Human.name).order_by(Human.name))
+                assert isinstance(
+                    result.cursor_strategy, FullyBufferedCursorFetchStrategy
+                )
+                assert result.scalars().all() == ["Jane", "John"]
+
+    assert queries.rows == 2
+
+
+def test_selects_are_left_unbuffered_unless_rows_are_counted(make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches())
+
+    with db_mock.from_dict({"human": [{"name": "John"}, {"name": "Jane"}]}):
+        with provider.record_queries(QueryRecorder(count_rows=False)) as queries:
+            with provider.get_engine().connect() as conn:
+                result = conn.execute(select(Human.name))
+                assert not isinstance(
+                    result.cursor_strategy, FullyBufferedCursorFetchStrategy
+                )
+                assert len(result.all()) == 2
+
+        # results streamed with yield_per are not buffered to count their rows
+        with provider.record_queries() as counted:
+            with provider.get_engine().connect() as conn:
+                streamed = conn.execution_options(yield_per=1).execute(
+                    select(Human.name)
+                )
+                assert not isinstance(
+                    streamed.cursor_strategy, FullyBufferedCursorFetchStrategy
+                )
+                assert len(streamed.all()) == 2
+
+    assert (queries.count, queries.rows) == (1, 0)
+    assert (counted.count, counted.rows) == (1, 0)
+
+
+async def test_async_contexts_record_the_queries_run_within(make_async_provider):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), record_queries=True)
+
+    async with db_mock.from_orm([Human(name="John")]) as data:
+        async with provider.get_async_session() as session:
+            assert (await session.scalars(select(Human.name))).all() == ["John"]
+
+    assert (data.queries.count, data.queries.rows) == (1, 1)
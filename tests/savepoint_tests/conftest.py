@@ -0,0 +1,45 @@
+import asyncio
+from collections.abc import Generator
+
+import pytest
+
+from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base
+
+
+@pytest.fixture(scope="session")
+def db_mock_connection() -> "MockConnectionProvider":
+    return MockConnectionProvider(isolation="savepoint")
+
+
+@pytest.fixture(scope="session")
+def db_mock_patches() -> "Patches":
+    return Patches()
+
+
+@pytest.fixture(scope="session")
+def db_mock(
+    db_mock_connection: "MockConnectionProvider",
+    db_mock_patches: "Patches",
+) -> "DBMock":
+    return DBMock(Base, db_mock_connection, db_mock_patches)
+
+
+@pytest.fixture(scope="session")
+def db_mock_async_connection() -> "Generator[MockAsyncConnectionProvider, None, None]":
+    provider = MockAsyncConnectionProvider(isolation="savepoint")
+    yield provider
+    # the pinned async connection outlives the per-test event loops
+    asyncio.run(provider.async_reset())
+
+
+@pytest.fixture(scope="session")
+def db_mock_async(
+    db_mock_async_connection: "MockAsyncConnectionProvider",
+    db_mock_patches: "Patches",
+) -> "AsyncDBMock":
+    return AsyncDBMock(Base, db_mock_async_connection, db_mock_patches)
@@ -0,0 +1,79 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from tests.example_tests.example_schemas import Human, Pet, Soulmates, Species
+
+if TYPE_CHECKING:
+    from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+    from sqlamock.async_db_mock import AsyncDBMock
+    from sqlamock.connection_provider import MockConnectionProvider
+    from sqlamock.db_mock import DBMock
+
+
+def count(db_mock_connection: "MockConnectionProvider", model) -> int:
+    with db_mock_connection.get_session() as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def test_nested_contexts_roll_back_to_their_savepoint(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_orm(
+        [Human(name="John"), Pet(name="Milo", species=Species.DOG)]
+    ) as mocked_data:
+        with db_mock.from_orm(
+            [
+                Soulmates(
+                    human_id=mocked_data[Human][0].id, pet_id=mocked_data[Pet][0].id
+                )
+            ]
+        ):
+            assert count(db_mock_connection, Soulmates) == 1
+            assert count(db_mock_connection, Human) == 1
+
+        assert count(db_mock_connection, Soulmates) == 0
+        assert count(db_mock_connection, Human) == 1
+
+    assert count(db_mock_connection, Human) == 0
+
+
+def test_sessions_commits_are_rolled_back_on_exit(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_orm([Human(name="John")]):
+        with db_mock_connection.get_session() as session:
+            session.add(Human(name="Jane"))
+            session.commit()
+
+        assert count(db_mock_connection, Human) == 2
+
+    assert count(db_mock_connection, Human) == 0
+
+
+def test_failed_seed_leaves_outer_context_intact(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_orm([Human(name="John")]):
+        with pytest.raises(IntegrityError):
+            with db_mock.from_dict({"pet": [{"name": "Milo"}]}):
+                pass
+
+        assert count(db_mock_connection, Human) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_nested_contexts_roll_back_to_their_savepoint(
+    db_mock_async: "AsyncDBMock",
+    db_mock_async_connection: "MockAsyncConnectionProvider",
+    async_count_humans,
+):
+    async with db_mock_async.from_orm([Human(name="John")]):
+        async with db_mock_async.from_orm([Human(name="Jane")]):
+            assert await async_count_humans(db_mock_async_connection) == 2
+
+        assert await async_count_humans(db_mock_async_connection) == 1
+
+    assert await async_count_humans(db_mock_async_connection) == 0
@@ -0,0 +1,101 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.seed_cache import SeedCache, seed_hash
+from tests.example_tests.example_schemas import Base, Human, Pet
+
+BASELINE = {
+    "human": [{"name": "John"}, {"name": "Jane"}],
+    "pet": [{"name": "Rex", "species": "DOG"}],
+}
+
+
+def test_seed_hash_ignores_column_order():
+    assert seed_hash("schema", {"human": [{"id": 1, "name": "John"}]}) == seed_hash(
+        "schema", {"human": [{"name": "John", "id": 1}]}
+    )
+    assert seed_hash("schema", BASELINE) != seed_hash("other", BASELINE)
+
+
+def test_seed_hash_encodes_values_by_type():
+    moment = datetime(2024, 1, 2, 3, 4, 5)
+    assert seed_hash("schema", {"human": [{"born": moment}]}) == seed_hash(
+        "schema", {"human": [{"born": datetime(2024, 1, 2, 3, 4, 5)}]}
+    )
+    assert seed_hash("schema", {"human": [{"born": moment}]}) != seed_hash(
+        "schema", {"human": [{"born": str(moment)}]}
+    )
+    assert seed_hash("schema", {"human": [{"weight": Decimal("1.0")}]}) != seed_hash(
+        "schema", {"human": [{"weight": Decimal("1.00")}]}
+    )
+
+    with pytest.raises(TypeError, match="cached=False"):
+        seed_hash("schema", {"human": [{"name": object()}]})
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_identical_seeds_copy_the_cached_state(bulk: bool, make_provider, count_humans):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+    with db_mock.from_dict(BASELINE, bulk=bulk, cached=True) as data:
+        seeded = [(human.id, human.name) for human in data[Human]]
+
+    with (
+        patch.object(db_mock, "build_and_seed", side_effect=AssertionError("seed")),
+        patch.object(db_mock, "bulk_seed", side_effect=AssertionError("seed")),
+    ):
+        with db_mock.from_dict(BASELINE, bulk=bulk, cached=True) as data:
+            assert [(human.id, human.name) for human in data[Human]] == seeded
+            assert [pet.name for pet in data[Pet]] == ["Rex"]
+            assert count_humans(provider) == 2
+
+    assert count_humans(provider) == 0
+    assert len(db_mock.seed_cache.states) == 1
+
+
+def test_non_empty_databases_seed_as_usual(make_provider, count_humans):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+    with db_mock.from_orm([Human(name="Jack")]):
+        with db_mock.from_dict(BASELINE, cached=True):
+            assert count_humans(provider) == 3
+
+    assert not db_mock.seed_cache.states
+
+
+def test_least_recently_used_states_are_evicted(make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+    db_mock.init_database()
+    engine = provider.get_engine()
+    cache = SeedCache()
+    cache.save("first", engine, {})
+    cache.budget = cache.size * 2
+    cache.save("second", engine, {})
+    assert cache.get("first") is not None
+
+    cache.save("third", engine, {})
+    assert list(cache.states) == ["first", "third"]
+    cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_async_identical_seeds_copy_the_cached_state(
+    make_async_provider, async_count_humans
+):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), schema_template=False)
+    async with db_mock.from_dict(BASELINE, cached=True) as data:
+        seeded = [human.id for human in data[Human]]
+
+    with patch.object(db_mock, "build_and_seed", side_effect=AssertionError("seed")):
+        async with db_mock.from_dict(BASELINE, cached=True) as data:
+            assert [human.id for human in data[Human]] == seeded
+
+    assert await async_count_humans(provider) == 0
@@ -0,0 +1,66 @@
+from typing import TYPE_CHECKING
+
+import pytest
+
+from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base
+
+if TYPE_CHECKING:
+    from sqlamock.types import SnapshotStrategy
+
+
+@pytest.fixture(scope="session", params=["backup", "dump", "copy_on_write", "swap"])
+def snapshot_strategy(request) -> "SnapshotStrategy":
+    return request.param
+
+
+@pytest.fixture(scope="session", params=[False, True], ids=["file", "memory"])
+def in_memory(request) -> bool:
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def db_mock_connection(
+    snapshot_strategy: "SnapshotStrategy", in_memory: bool
+) -> "MockConnectionProvider":
+    if in_memory and snapshot_strategy == "swap":
+        pytest.skip("swap snapshots need file databases")
+    return MockConnectionProvider(
+        snapshot_strategy=snapshot_strategy, in_memory=in_memory
+    )
+
+
+@pytest.fixture(scope="session")
+def db_mock_patches() -> "Patches":
+    return Patches()
+
+
+@pytest.fixture(scope="session")
+def db_mock(
+    db_mock_connection: "MockConnectionProvider",
+    db_mock_patches: "Patches",
+) -> "DBMock":
+    return DBMock(Base, db_mock_connection, db_mock_patches)
+
+
+@pytest.fixture(scope="session")
+def db_mock_async_connection(
+    snapshot_strategy: "SnapshotStrategy", in_memory: bool
+) -> "MockAsyncConnectionProvider":
+    if in_memory and snapshot_strategy == "swap":
+        pytest.skip("swap snapshots need file databases")
+    return MockAsyncConnectionProvider(
+        snapshot_strategy=snapshot_strategy, in_memory=in_memory
+    )
+
+
+@pytest.fixture(scope="session")
+def db_mock_async(
+    db_mock_async_connection: "MockAsyncConnectionProvider",
+    db_mock_patches: "Patches",
+) -> "AsyncDBMock":
+    return AsyncDBMock(Base, db_mock_async_connection, db_mock_patches)
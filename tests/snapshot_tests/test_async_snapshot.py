@@ -0,0 +1,43 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.async_snapshot import AsyncSnapshot
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("strategy", ["backup", "copy_on_write"])
+async def test_snapshot_restores_in_place_on_async_connections(
+    strategy: str, make_async_provider, async_count_humans
+):
+    provider = make_async_provider(snapshot_strategy=strategy)
+    db_mock = AsyncDBMock(Base, provider, Patches())
+    hops = []
+    to_thread = asyncio.to_thread
+
+    async def record_hop(func, *args, **kwargs):
+        hops.append(func.__name__)
+        return await to_thread(func, *args, **kwargs)
+
+    async with db_mock.from_orm([Human(name="John")]):
+        engine = provider.get_async_engine()
+        with (
+            patch("asyncio.to_thread", new=record_hop),
+            patch.object(provider, "async_reset", side_effect=AssertionError("reset")),
+        ):
+            async with AsyncSnapshot(provider):
+                async with provider.get_async_session() as session:
+                    session.add(Human(name="Jane"))
+                    await session.commit()
+                assert await async_count_humans(provider) == 2
+
+        assert await async_count_humans(provider) == 1
+        assert provider.get_async_engine() is engine
+        # the watcher connection is an aiosqlite one too
+        assert hops == []
+
+    assert await async_count_humans(provider) == 0
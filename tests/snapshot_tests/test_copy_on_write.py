@@ -0,0 +1,82 @@
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import select, text
+
+from sqlamock import copy_on_write
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet, Species
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+
+
+@pytest.fixture
+def cow_connection() -> "Generator[MockConnectionProvider, None, None]":
+    provider = MockConnectionProvider(snapshot_strategy="copy_on_write")
+    yield provider
+    provider.get_engine().dispose()
+
+
+@pytest.fixture
+def cow_db_mock(cow_connection: "MockConnectionProvider") -> "DBMock":
+    return DBMock(Base, cow_connection, Patches())
+
+
+def dirty_tables(provider: "MockConnectionProvider") -> set[str]:
+    with provider.get_engine().connect() as conn:
+        return set(
+            conn.exec_driver_sql(
+                f"SELECT tbl FROM {copy_on_write.SCHEMA}.{copy_on_write.DIRTY_TABLE}"
+            ).scalars()
+        )
+
+
+def test_only_written_tables_are_tracked(
+    cow_db_mock: "DBMock", cow_connection: "MockConnectionProvider"
+):
+    with cow_db_mock.from_orm([Human(name="John")]):
+        assert dirty_tables(cow_connection) == {"human"}
+
+        with cow_db_mock.from_orm([Pet(name="Milo", species=Species.DOG)]):
+            assert dirty_tables(cow_connection) == {"human", "pet"}
+
+        assert dirty_tables(cow_connection) == {"human"}
+
+    assert dirty_tables(cow_connection) == set()
+
+
+def test_inner_layer_restores_the_parent_rows(
+    cow_db_mock: "DBMock", cow_connection: "MockConnectionProvider"
+):
+    with cow_db_mock.from_orm([Human(name="John")]):
+        with cow_db_mock.from_orm([Human(name="Jane")]):
+            with cow_connection.get_session() as session:
+                session.execute(text("UPDATE human SET name = 'Renamed'"))
+                session.commit()
+
+        with cow_connection.get_session() as session:
+            assert session.scalars(select(Human.name)).all() == ["John"]
+
+    with cow_connection.get_session() as session:
+        assert session.scalars(select(Human)).all() == []
+
+
+def test_bookkeeping_stays_out_of_the_database(
+    cow_db_mock: "DBMock", cow_connection: "MockConnectionProvider"
+):
+    with cow_db_mock.from_orm([Human(name="John")]):
+        watcher = cow_connection.get_watcher_connection()
+        names = {name for (name,) in watcher.execute("SELECT name FROM sqlite_master")}
+        assert not any(name.startswith(copy_on_write.PREFIX) for name in names)
+
+        with cow_db_mock.from_orm([]):
+            # every connection tracks the writes with TEMP triggers of its own
+            with cow_connection.get_engine().connect() as conn:
+                conn.execute(text("UPDATE human SET name = 'Renamed'"))
+                conn.commit()
+
+        with cow_connection.get_session() as session:
+            assert session.scalars(select(Human.name)).all() == ["John"]
@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+from tests.example_tests.example_schemas import Human
+
+
+def test_in_memory_database_is_shared_by_every_pooled_connection(make_provider):
+    provider = make_provider(in_memory=True)
+    engine = provider.get_engine()
+
+    assert engine.url.query["mode"] == "memory"
+    with engine.connect() as first, engine.connect() as second:
+        first.exec_driver_sql("CREATE TABLE shared (id INTEGER)")
+        first.commit()
+        assert second.exec_driver_sql("SELECT count(*) FROM shared").scalar() == 0
+
+    # the keeper connection holds the database while the pool is empty
+    engine.dispose()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM shared").scalar() == 0
+
+
+def test_reset_frees_the_in_memory_database(make_provider):
+    provider = make_provider(in_memory=True)
+    database = provider.get_engine().url.database
+    with provider.get_engine().connect() as conn:
+        conn.exec_driver_sql("CREATE TABLE dropped (id INTEGER)")
+        conn.commit()
+
+    provider.reset()
+
+    assert provider.get_engine().url.database != database
+    with sqlite3.connect(f"{database}?mode=memory&cache=shared", uri=True) as conn:
+        assert conn.execute("SELECT count(*) FROM sqlite_master").fetchone() == (0,)
+
+
+@pytest.mark.asyncio
+async def test_async_engine_opens_the_same_in_memory_database(
+    make_async_provider, async_count_humans
+):
+    provider = make_async_provider(in_memory=True)
+    with provider.get_session() as session:
+        session.connection().exec_driver_sql(
+            f"CREATE TABLE {Human.__tablename__} (id INTEGER, name TEXT)"
+        )
+        session.execute(Human.__table__.insert().values(id=1, name="John"))
+        session.commit()
+
+    assert await async_count_humans(provider) == 1
@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.snapshot import Snapshot
+from tests.example_tests.example_schemas import Base, Human, Pet, Soulmates, Species
+
+
+def add_human(provider: "MockConnectionProvider", name: str):
+    with provider.get_session() as session:
+        session.add(Human(name=name))
+        session.commit()
+
+
+@pytest.mark.parametrize(
+    "strategy, isolation",
+    [
+        ("backup", "snapshot"),
+        ("dump", "snapshot"),
+        ("copy_on_write", "snapshot"),
+        ("backup", "savepoint"),
+    ],
+)
+def test_writes_fail_in_read_only_contexts(
+    strategy: str, isolation: str, make_provider, count_humans
+):
+    provider = make_provider(snapshot_strategy=strategy, isolation=isolation)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")], read_only=True):
+        assert count_humans(provider) == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            add_human(provider, "Jane")
+
+    assert count_humans(provider) == 0
+    add_human(provider, "Jane")
+    assert count_humans(provider) == 1
+
+
+@pytest.mark.parametrize("strategy", ["backup", "dump"])
+def test_read_only_contexts_take_no_snapshot(
+    strategy: str, make_provider, count_humans
+):
+    provider = make_provider(snapshot_strategy=strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with (
+        patch.object(Snapshot, "_backup", side_effect=AssertionError("backup")),
+        patch.object(Snapshot, "_dump", side_effect=AssertionError("dump")),
+    ):
+        for _ in range(2):
+            with db_mock.from_dict(
+                {"human": [{"name": "John"}, {"name": "Jane"}]}, read_only=True
+            ) as data:
+                assert [human.id for human in data["human"]] == [1, 2]
+
+    assert count_humans(provider) == 0
+
+
+@pytest.mark.parametrize("strategy", ["backup", "dump"])
+def test_read_only_seeds_updating_existing_rows_are_restored(
+    strategy: str, make_provider
+):
+    provider = make_provider(snapshot_strategy=strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")]) as data:
+        [john] = data[Human]
+        john.name = "Changed"
+        with db_mock.from_orm(
+            [Soulmates(human=john, pet=Pet(name="Rex", species=Species.DOG))],
+            read_only=True,
+        ):
+            with provider.get_session() as session:
+                assert session.scalar(select(Human.name)) == "Changed"
+            with pytest.raises(OperationalError, match="readonly"):
+                add_human(provider, "Jane")
+
+        with provider.get_session() as session:
+            assert session.scalars(select(Human.name)).all() == ["John"]
+            assert session.scalar(select(func.count()).select_from(Soulmates)) == 0
+
+
+def test_nested_contexts_are_writable_again(make_provider, count_humans):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")], read_only=True):
+        with db_mock.from_orm([Human(name="Jane")]):
+            add_human(provider, "Jack")
+            assert count_humans(provider) == 3
+
+        assert count_humans(provider) == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            add_human(provider, "Jack")
+
+    assert count_humans(provider) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("isolation", ["snapshot", "savepoint"])
+async def test_writes_fail_in_async_read_only_contexts(
+    isolation: str, make_async_provider, async_count_humans
+):
+    provider = make_async_provider(isolation=isolation)
+    db_mock = AsyncDBMock(Base, provider, Patches())
+    async with db_mock.from_orm([Human(name="John")], read_only=True):
+        async with provider.get_async_session() as session:
+            session.add(Human(name="Jane"))
+            with pytest.raises(OperationalError, match="readonly"):
+                await session.commit()
+
+    assert await async_count_humans(provider) == 0
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import Integer, String, func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from sqlamock import revert
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.snapshot import Snapshot
+from tests.example_tests.example_schemas import Base, Human, Pet, Soulmates, Species
+
+
+class SequenceBase(DeclarativeBase):
+    pass
+
+
+class Ticket(SequenceBase):
+    __tablename__ = "ticket"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    title: Mapped[str] = mapped_column(String)
+
+
+@pytest.fixture(params=["backup", "dump"])
+def restores(request):
+    method = f"_restore_{request.param}"
+    with patch.object(
+        Snapshot, method, autospec=True, side_effect=getattr(Snapshot, method)
+    ) as restore:
+        restore.strategy = request.param
+        yield restore
+
+
+def test_unwritten_contexts_skip_the_restore(restores, make_provider, count_humans):
+    provider = make_provider(snapshot_strategy=restores.strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")]):
+        with db_mock.from_orm([]):
+            assert count_humans(provider) == 1
+        assert count_humans(provider) == 1
+
+    assert count_humans(provider) == 0
+    assert restores.call_count == 0
+
+
+def test_written_contexts_are_restored(restores, make_provider, count_humans):
+    provider = make_provider(snapshot_strategy=restores.strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")]):
+        with provider.get_session() as session:
+            session.add(Human(name="Jane"))
+            session.commit()
+
+    assert count_humans(provider) == 0
+    assert restores.call_count == 1
+
+
+def test_seeded_inserts_are_reverted_with_their_sequences(make_provider):
+    provider = make_provider()
+    db_mock = DBMock(SequenceBase, provider, Patches())
+    for _ in range(2):
+        with db_mock.from_orm([Ticket(title="first"), Ticket(title="second")]) as data:
+            assert [ticket.id for ticket in data[Ticket]] == [1, 2]
+
+    with provider.get_session() as session:
+        assert session.scalar(select(func.count()).select_from(Ticket)) == 0
+
+
+def test_seeds_appending_rows_are_reverted(restores, make_provider):
+    provider = make_provider(snapshot_strategy=restores.strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(id=1, name="John"), Human(id=3, name="Jane")]):
+        with db_mock.from_orm([Human(name="Jim")]):
+            pass
+        assert restores.call_count == 0
+
+        # a row inserted below the highest rowid is not told apart by the marks
+        with db_mock.from_orm([Human(id=2, name="Jim")]):
+            pass
+        assert restores.call_count == 1
+
+        with provider.get_session() as session:
+            assert session.scalars(select(Human.id).order_by(Human.id)).all() == [1, 3]
+
+
+@pytest.mark.parametrize("strategy", ["backup", "dump"])
+def test_seeds_updating_existing_rows_are_restored(strategy, make_provider):
+    provider = make_provider(snapshot_strategy=strategy)
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")]) as data:
+        [john] = data[Human]
+        john.name = "Changed"
+        with db_mock.from_orm(
+            [Soulmates(human=john, pet=Pet(name="Rex", species=Species.DOG))]
+        ):
+            with provider.get_session() as session:
+                assert session.scalar(select(Human.name)) == "Changed"
+
+        with provider.get_session() as session:
+            assert session.scalars(select(Human.name)).all() == ["John"]
+            assert session.scalar(select(func.count()).select_from(Soulmates)) == 0
+
+
+@pytest.mark.asyncio
+async def test_async_contexts_skip_the_restore(make_async_provider, async_count_humans):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches())
+    async with db_mock.from_orm([Human(name="John")]):
+        async with db_mock.from_orm([]):
+            pass
+        async with provider.get_async_session() as session:
+            session.add(Human(name="Jane"))
+            await session.commit()
+
+    assert await async_count_humans(provider) == 0
+
+
+@pytest.mark.asyncio
+async def test_async_seeded_inserts_are_reverted_on_the_watcher(make_async_provider):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(SequenceBase, provider, Patches())
+    with patch("sqlamock.revert.async_revert", wraps=revert.async_revert) as reverts:
+        for _ in range(2):
+            async with db_mock.from_orm(
+                [Ticket(title="first"), Ticket(title="second")]
+            ) as data:
+                assert [ticket.id for ticket in data[Ticket]] == [1, 2]
+
+    assert reverts.await_count == 2
+    async with provider.get_async_session() as session:
+        assert await session.scalar(select(func.count()).select_from(Ticket)) == 0
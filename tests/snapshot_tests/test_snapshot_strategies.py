@@ -0,0 +1,146 @@
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+from sqlalchemy import func, select
+
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet, Species
+
+if TYPE_CHECKING:
+    from sqlamock.async_connection_provider import MockAsyncConnectionProvider
+    from sqlamock.async_db_mock import AsyncDBMock
+
+
+def test_nested_contexts_restore_each_layer(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider", count_humans
+):
+    with db_mock.from_orm([Human(name="John")]):
+        with db_mock.from_orm([Human(name="Jane"), Human(name="Jim")]):
+            assert count_humans(db_mock_connection) == 3
+
+        assert count_humans(db_mock_connection) == 1
+
+    assert count_humans(db_mock_connection) == 0
+
+
+def test_restore_discards_writes_made_inside_the_context(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_orm([Human(name="John")]) as mocked_data:
+        with db_mock_connection.get_session() as session:
+            session.add(Pet(name="Milo", species=Species.DOG))
+            session.commit()
+
+        assert mocked_data[Human][0].id == 1
+
+    with db_mock.from_orm([Human(name="Jane")]) as mocked_data:
+        assert mocked_data[Human][0].id == 1
+        with db_mock_connection.get_session() as session:
+            assert session.scalars(select(Pet)).all() == []
+
+
+def test_contexts_keep_the_engine(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider"
+):
+    with db_mock.from_orm([Human(name="John")]):
+        engine = db_mock_connection.get_engine()
+        with db_mock.from_orm([Human(name="Jane")]):
+            pass
+
+    assert db_mock_connection.get_engine() is engine
+
+
+def test_reset_only_drops_its_own_engine(
+    db_mock: "DBMock",
+    db_mock_connection: "MockConnectionProvider",
+    make_provider,
+    count_humans,
+):
+    with db_mock.from_orm([Human(name="John")]):
+        other = make_provider(in_memory=db_mock_connection.in_memory)
+        other.get_engine()
+        other.reset()
+
+        assert count_humans(db_mock_connection) == 1
+
+
+def test_sessions_left_open_with_pending_writes_do_not_block_the_restore(
+    db_mock: "DBMock", db_mock_connection: "MockConnectionProvider", count_humans
+):
+    if (
+        db_mock_connection.in_memory
+        and db_mock_connection.snapshot_strategy == "copy_on_write"
+    ):
+        pytest.skip("copy_on_write cannot restore a write-locked in-memory database")
+
+    started = time.monotonic()
+    with db_mock.from_orm([Human(name="John")]):
+        session = db_mock_connection.get_session()
+        with db_mock.from_orm([Human(name="Jane")]):
+            session.add(Human(name="Jim"))
+            session.flush()
+        assert count_humans(db_mock_connection) == 1
+        session.close()
+
+    assert count_humans(db_mock_connection) == 0
+    assert time.monotonic() - started < 2
+
+
+def test_write_locked_in_memory_copy_on_write_databases_fail_the_restore(make_provider):
+    provider = make_provider(snapshot_strategy="copy_on_write", in_memory=True)
+    db_mock = DBMock(Base, provider, Patches())
+    session = provider.get_session()
+    try:
+        with pytest.raises(RuntimeError, match="pending write"):
+            with db_mock.from_orm([Human(name="John")]):
+                session.add(Human(name="Jim"))
+                session.flush()
+    finally:
+        session.close()
+
+
+@pytest.mark.asyncio
+async def test_async_nested_contexts_restore_each_layer(
+    db_mock_async: "AsyncDBMock",
+    db_mock_async_connection: "MockAsyncConnectionProvider",
+):
+    async def count() -> int:
+        async with db_mock_async_connection.get_async_session() as session:
+            return await session.scalar(select(func.count()).select_from(Human))
+
+    async with db_mock_async.from_orm([Human(name="John")]):
+        async with db_mock_async.from_orm([Human(name="Jane")]):
+            assert await count() == 2
+
+        assert await count() == 1
+
+    assert await count() == 0
+
+
+@pytest.mark.asyncio
+async def test_async_sessions_left_open_do_not_block_the_restore(
+    db_mock_async: "AsyncDBMock",
+    db_mock_async_connection: "MockAsyncConnectionProvider",
+):
+    if (
+        db_mock_async_connection.in_memory
+        and db_mock_async_connection.snapshot_strategy == "copy_on_write"
+    ):
+        pytest.skip("copy_on_write cannot restore a write-locked in-memory database")
+
+    async def count() -> int:
+        async with db_mock_async_connection.get_async_session() as session:
+            return await session.scalar(select(func.count()).select_from(Human))
+
+    async with db_mock_async.from_orm([Human(name="John")]):
+        session = db_mock_async_connection.get_async_session()
+        async with db_mock_async.from_orm([Human(name="Jane")]):
+            session.add(Human(name="Jim"))
+            await session.flush()
+        assert await count() == 1
+        await session.close()
+
+    assert await count() == 0
@@ -0,0 +1,52 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.snapshot import Snapshot
+from tests.example_tests.example_schemas import Base, Human
+
+
+def test_swap_needs_file_databases():
+    with pytest.raises(ValueError, match="file databases"):
+        MockConnectionProvider(snapshot_strategy="swap", in_memory=True)
+
+
+def test_exit_swaps_the_standby_database_in(make_provider, count_humans):
+    provider = make_provider(snapshot_strategy="swap")
+    db_mock = DBMock(Base, provider, Patches())
+    db_mock.init_database()
+    engine = provider.get_engine()
+    inode = os.stat(engine.url.database).st_ino
+
+    with patch.object(
+        Snapshot, "_restore_backup", side_effect=AssertionError("restore")
+    ):
+        with db_mock.from_orm([Human(name="John")]):
+            assert count_humans(provider) == 1
+
+    assert count_humans(provider) == 0
+    assert provider.get_engine() is engine
+    assert os.stat(engine.url.database).st_ino != inode
+    assert not [
+        name
+        for name in os.listdir(os.path.dirname(engine.url.database))
+        if name.endswith(".standby")
+    ]
+
+
+def test_unwritten_contexts_keep_the_database_file(make_provider, count_humans):
+    provider = make_provider(snapshot_strategy="swap")
+    db_mock = DBMock(Base, provider, Patches())
+    with db_mock.from_orm([Human(name="John")]):
+        database = provider.get_engine().url.database
+        inode = os.stat(database).st_ino
+        with db_mock.from_orm([]):
+            pass
+        assert os.stat(database).st_ino == inode
+        assert count_humans(provider) == 1
+
+    assert count_humans(provider) == 0
@@ -0,0 +1,64 @@
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from sqlamock.json_stream import batched_rows, iter_rows
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+DATA = {
+    "human": [{"name": 'John "Jack" Doe'}, {"name": "Jane", "tags": [1, 2.5, None]}],
+    "empty": [],
+    "pet": [{"name": "Milo", "species": "DOG", "meta": {"age": 12345}}],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_rows_are_read_in_file_order(tmp_path: "Path", chunk_size: int):
+    file_path = tmp_path / "data.json"
+    file_path.write_text(json.dumps(DATA, indent=4))
+
+    rows = list(iter_rows(file_path, chunk_size))
+
+    assert rows == [
+        (table_name, row) for table_name, table in DATA.items() for row in table
+    ]
+
+
+def test_empty_file_has_no_rows(tmp_path: "Path"):
+    file_path = tmp_path / "data.json"
+    file_path.write_text(" { } ")
+
+    assert list(iter_rows(file_path)) == []
+
+
+def test_truncated_file_raises(tmp_path: "Path"):
+    file_path = tmp_path / "data.json"
+    file_path.write_text(json.dumps(DATA)[:-10])
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_rows(file_path, chunk_size=8))
+
+
+def test_rows_that_are_not_objects_raise(tmp_path: "Path"):
+    file_path = tmp_path / "data.json"
+    file_path.write_text('{"human": [{"name": "John"}, 1]}')
+
+    with pytest.raises(json.JSONDecodeError, match="Expecting a row object"):
+        list(iter_rows(file_path))
+
+
+def test_rows_are_batched_per_table():
+    rows = [("a", {"i": 1}), ("a", {"i": 2}), ("a", {"i": 3}), ("b", {"i": 4})]
+
+    assert list(batched_rows(rows, 2)) == [
+        ("a", [{"i": 1}, {"i": 2}]),
+        ("a", [{"i": 3}]),
+        ("b", [{"i": 4}]),
+    ]
+
+
+def test_no_rows_make_no_batches():
+    assert list(batched_rows([], 2)) == []
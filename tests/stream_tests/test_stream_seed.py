@@ -0,0 +1,97 @@
+import json
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.data_interface import LazyMockDataInterface
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet, Soulmates, Species
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def data_file(tmp_path: "Path") -> "Path":
+    file_path = tmp_path / "data.json"
+    # children first, foreign keys are checked on commit
+    file_path.write_text(
+        json.dumps(
+            {
+                "soulmates": [{"human_id": 1, "pet_id": 3}],
+                "pet": [{"name": f"Pet {i}", "species": "CAT"} for i in range(1, 4)],
+                "human": [{"name": "John"}],
+            }
+        )
+    )
+    return file_path
+
+
+def count(provider: "MockConnectionProvider", orm_class: type) -> int:
+    with provider.get_session() as session:
+        return session.scalar(select(func.count()).select_from(orm_class))
+
+
+def test_streamed_rows_are_loaded_on_access(data_file: "Path", make_provider):
+    provider = make_provider(pragmas={"foreign_keys": "ON"})
+    db_mock = DBMock(Base, provider, Patches(), schema_template=False)
+
+    with patch("sqlamock.db_mock.STREAM_BATCH_SIZE", 2):
+        with db_mock.from_file(data_file, stream=True) as data:
+            assert isinstance(data, LazyMockDataInterface)
+            assert data.pending_keys["pet"] == [(1,), (2,), (3,)]
+            assert count(provider, Pet) == 3
+
+            assert [pet.name for pet in data[Pet]] == ["Pet 1", "Pet 2", "Pet 3"]
+            assert data["pet"][2].species is Species.CAT
+            assert "pet" not in data.pending_keys
+            assert data[Soulmates][0].pet.name == "Pet 3"
+            assert data["human"][0].name == "John"
+
+    assert count(provider, Pet) == 0
+
+
+def test_streamed_seed_template_is_loaded_lazily(
+    data_file: "Path", tmp_path: "Path", make_provider
+):
+    first = DBMock(Base, make_provider(), Patches(), cache_dir=tmp_path)
+    with first.from_file(data_file, cached=True, stream=True):
+        pass
+
+    provider = make_provider()
+    second = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+    with patch.object(DBMock, "stream_seed", side_effect=AssertionError("streamed")):
+        with second.from_file(data_file, cached=True, stream=True) as data:
+            assert data.pending_keys["human"] == [(1,)]
+            assert data[Human][0].name == "John"
+
+
+@pytest.mark.asyncio
+async def test_async_streamed_rows_are_loaded_on_access(
+    data_file: "Path", make_async_provider
+):
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), schema_template=False)
+
+    async with db_mock.from_file(data_file, stream=True) as data:
+        assert isinstance(data, LazyMockDataInterface)
+        assert [pet.id for pet in data[Pet]] == [1, 2, 3]
+
+    await provider.get_async_engine().dispose()
+
+
+@pytest.mark.asyncio
+async def test_async_stream_loads_eagerly_in_savepoint_isolation(
+    data_file: "Path", make_async_provider
+):
+    provider = make_async_provider(isolation="savepoint")
+    db_mock = AsyncDBMock(Base, provider, Patches(), schema_template=False)
+
+    async with db_mock.from_file(data_file, stream=True) as data:
+        assert not isinstance(data, LazyMockDataInterface)
+        assert data[Soulmates][0].human.name == "John"
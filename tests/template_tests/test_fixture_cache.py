@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.connection_provider import MockConnectionProvider
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from tests.example_tests.example_schemas import Base, Human, Pet
+
+DATA_FILE = Path(__file__).parent.parent / "data" / "example_app.json"
+
+
+def not_seeded():
+    return patch.object(
+        Session, "add_all", side_effect=AssertionError("data was seeded")
+    )
+
+
+def count(provider: "MockConnectionProvider", orm_class: type) -> int:
+    with provider.get_session() as session:
+        return session.scalar(select(func.count()).select_from(orm_class))
+
+
+def test_fixture_is_compiled_once_and_copied_in_savepoint_isolation(
+    tmp_path: "Path", make_provider
+):
+    first = DBMock(
+        Base,
+        make_provider(isolation="savepoint"),
+        Patches(),
+        cache_dir=tmp_path,
+    )
+    with first.from_file(DATA_FILE, cached=True) as data:
+        assert data[Human][0].name == "John"
+
+    assert len(list(tmp_path.glob("seed-*.sqlite"))) == 1
+
+    provider = make_provider(isolation="savepoint")
+    second = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+    for _ in range(2):
+        with not_seeded(), second.from_file(DATA_FILE, cached=True) as data:
+            assert data[Pet][0].name == "Milo"
+            assert count(provider, Human) == 1
+        assert count(provider, Human) == 0
+
+
+def test_fixture_rows_are_copied_next_to_other_tables(tmp_path: "Path", make_provider):
+    pets_file = tmp_path / "pets.json"
+    pets_file.write_text(json.dumps({"pet": [{"name": "Rex", "species": "DOG"}]}))
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+
+    with db_mock.from_orm([Human(name="Jane")]):
+        with db_mock.from_file(pets_file, cached=True):
+            pass
+        with not_seeded(), db_mock.from_file(pets_file, cached=True) as data:
+            assert data[Pet][0].name == "Rex"
+            assert count(provider, Human) == 1
+            assert count(provider, Pet) == 1
+        assert count(provider, Pet) == 0
+
+
+def test_fixture_is_seeded_when_its_tables_hold_rows(tmp_path: "Path", make_provider):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+
+    with db_mock.from_orm([Human(name="Jane")]):
+        with db_mock.from_file(DATA_FILE, cached=True) as data:
+            assert data[Human][0].name == "John"
+            assert count(provider, Human) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_db_mock_copies_the_compiled_fixture(
+    tmp_path: "Path", make_async_provider
+):
+    provider = make_async_provider(isolation="savepoint")
+    db_mock = AsyncDBMock(Base, provider, Patches(), cache_dir=tmp_path)
+
+    async with db_mock.from_file(DATA_FILE, cached=True):
+        pass
+    with not_seeded():
+        async with db_mock.from_file(DATA_FILE, cached=True) as data:
+            assert data[Human][0].name == "John"
+            assert data[Pet][0].name == "Milo"
@@ -0,0 +1,112 @@
+import os
+import stat
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import DDL, Column, Integer, MetaData, Table, event, inspect
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.template import default_cache_dir, is_private, metadata_hash
+from tests.example_tests.example_schemas import Base
+from tests.index_tests.index_schemas import IndexBase, User
+
+
+def test_schema_is_saved_once_and_copied_afterwards(tmp_path: "Path", make_provider):
+    first = DBMock(IndexBase, make_provider(), Patches(), cache_dir=tmp_path)
+    first.init_database()
+
+    assert first.schema_template.path.exists()
+
+    provider = make_provider()
+    second = DBMock(IndexBase, provider, Patches(), cache_dir=tmp_path)
+    with patch.object(Table, "create", side_effect=AssertionError("DDL was emitted")):
+        second.init_database()
+
+    inspection = inspect(provider.get_engine())
+    assert inspection.has_table("user")
+    index_names = {index["name"] for index in inspection.get_indexes("user")}
+    assert {"idx_username", "idx_active_users"} <= index_names
+
+    with second.from_orm([User(email="test@example.com", username="testuser")]):
+        pass
+
+
+def test_schema_template_can_be_disabled(tmp_path: "Path", make_provider):
+    db_mock = DBMock(
+        Base,
+        make_provider(),
+        Patches(),
+        schema_template=False,
+        cache_dir=tmp_path,
+    )
+    db_mock.init_database()
+
+    assert db_mock.schema_template is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_templates_are_keyed_by_metadata():
+    assert metadata_hash(Base.metadata) != metadata_hash(IndexBase.metadata)
+    assert metadata_hash(Base.metadata) == metadata_hash(Base.metadata)
+
+
+def test_templates_are_keyed_by_versions_and_ddl_listeners():
+    metadata = MetaData()
+    table = Table("ticket", metadata, Column("id", Integer, primary_key=True))
+    key = metadata_hash(metadata)
+
+    with patch("sqlite3.sqlite_version", "0.0.0"):
+        assert metadata_hash(metadata) != key
+
+    event.listen(table, "after_create", DDL("CREATE INDEX ix_ticket ON ticket (id)"))
+    assert metadata_hash(metadata) != key
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_default_cache_dir_is_private_to_the_user(
+    tmp_path: "Path", monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(tempfile, "gettempdir", lambda: str(tmp_path))
+    # the tests' isolated_cache_dir replaces the module attribute, not this import
+    cache_dir = default_cache_dir()
+    assert cache_dir == tmp_path / f"sqlamock-{os.getuid()}"
+
+    assert is_private(cache_dir)
+    info = cache_dir.lstat()
+    assert info.st_uid == os.getuid()
+    assert stat.S_IMODE(info.st_mode) & 0o077 == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_cache_dirs_writable_by_others_are_ignored(tmp_path: "Path", make_provider):
+    cache_dir = tmp_path / "shared"
+    cache_dir.mkdir()
+    cache_dir.chmod(0o777)
+    db_mock = DBMock(Base, make_provider(), Patches(), cache_dir=cache_dir)
+
+    with pytest.warns(UserWarning, match="writable by others"):
+        db_mock.init_database()
+
+    assert list(cache_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_async_db_mock_loads_the_template(
+    tmp_path: "Path", make_provider, make_async_provider
+):
+    DBMock(Base, make_provider(), Patches(), cache_dir=tmp_path).init_database()
+
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), cache_dir=tmp_path)
+    await db_mock.init_database()
+
+    async with provider.get_async_engine().connect() as conn:
+        table_names = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_table_names()
+        )
+    assert {"human", "pet", "soulmates"} <= set(table_names)
+    await provider.get_async_engine().dispose()
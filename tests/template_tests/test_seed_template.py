@@ -0,0 +1,108 @@
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from sqlamock.async_db_mock import AsyncDBMock
+from sqlamock.db_mock import DBMock
+from sqlamock.patches import Patches
+from sqlamock.template import file_lock
+from tests.example_tests.example_schemas import Base, Human, Pet
+
+DATA_FILE = Path(__file__).parent.parent / "data" / "example_app.json"
+
+
+def test_seeded_state_is_saved_once_and_copied_afterwards(
+    tmp_path: "Path", make_provider, count_humans
+):
+    first = DBMock(Base, make_provider(), Patches(), cache_dir=tmp_path)
+    with first.from_file(DATA_FILE, cached=True) as data:
+        seeded_ids = [human.id for human in data[Human]]
+
+    assert len(list(tmp_path.glob("seed-*.sqlite"))) == 1
+
+    provider = make_provider()
+    second = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+    with patch.object(
+        Session, "add_all", side_effect=AssertionError("data was seeded")
+    ):
+        with second.from_file(DATA_FILE, cached=True) as data:
+            assert [human.id for human in data[Human]] == seeded_ids
+            assert data["pet"][0].name == "Milo"
+            assert count_humans(provider) == 1
+
+    assert count_humans(provider) == 0
+
+
+def test_nested_contexts_do_not_use_the_seed_template(
+    tmp_path: "Path", make_provider, count_humans
+):
+    provider = make_provider()
+    db_mock = DBMock(Base, provider, Patches(), cache_dir=tmp_path)
+
+    with db_mock.from_orm([Human(name="Jane")]):
+        with db_mock.from_file(DATA_FILE, cached=True) as data:
+            assert data[Pet][0].name == "Milo"
+            assert count_humans(provider) == 2
+
+
+def test_seed_templates_are_keyed_by_orm_code(tmp_path: "Path", make_provider):
+    class LocalBase(DeclarativeBase):
+        pass
+
+    class Ticket(LocalBase):
+        __tablename__ = "ticket"
+
+        id: Mapped[int] = mapped_column(primary_key=True)
+        title: Mapped[str] = mapped_column(default=lambda: "untitled")
+
+    db_mock = DBMock(LocalBase, make_provider(), Patches(), cache_dir=tmp_path)
+    key = db_mock.seed_template(DATA_FILE).key
+    assert db_mock.seed_template(DATA_FILE).key == key
+
+    def stamp(mapper, connection, target):
+        target.title = "stamped"
+
+    event.listen(Ticket, "before_insert", stamp)
+    assert db_mock.seed_template(DATA_FILE).key != key
+
+
+def test_file_lock_is_exclusive(tmp_path: "Path"):
+    lock_path = tmp_path / "test.lock"
+    events = []
+
+    def contend():
+        with file_lock(lock_path):
+            events.append("second")
+
+    with file_lock(lock_path):
+        thread = threading.Thread(target=contend)
+        thread.start()
+        time.sleep(0.05)
+        events.append("first")
+    thread.join()
+
+    assert events == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_async_db_mock_loads_the_seed_template(
+    tmp_path: "Path", make_provider, make_async_provider
+):
+    sync_db_mock = DBMock(Base, make_provider(), Patches(), cache_dir=tmp_path)
+    with sync_db_mock.from_file(DATA_FILE, cached=True):
+        pass
+
+    provider = make_async_provider()
+    db_mock = AsyncDBMock(Base, provider, Patches(), cache_dir=tmp_path)
+    with patch.object(
+        Session, "add_all", side_effect=AssertionError("data was seeded")
+    ):
+        async with db_mock.from_file(DATA_FILE, cached=True) as data:
+            assert data[Human][0].name == "John"
+            assert data[Pet][0].name == "Milo"
+    await provider.get_async_engine().dispose()